@@ -861,6 +861,94 @@ arising from the use of this program.
                 ru="Недоступно"
             ),
 
+            "ping_live_progress": Translation(
+                en="[{checked}/{total}] checked, {found} reachable — best so far:",
+                ru="[{checked}/{total}] проверено, {found} доступно — лучшие на данный момент:"
+            ),
+            "ping_deep_progress": Translation(
+                en="Probing finalists in depth: [{checked}/{total}] — best so far:",
+                ru="Углублённая проверка финалистов: [{checked}/{total}] — лучшие на данный момент:"
+            ),
+            "ping_rate_limited": Translation(
+                en="Rate limited or denied by the server (Kiss-o'-Death): {count} — not queried until the backoff expires",
+                ru="Ограничили или запретили запросы (Kiss-o'-Death): {count} — не опрашиваются до окончания паузы"
+            ),
+            "ping_falsetickers": Translation(
+                en="Falsetickers (time disagrees with the consensus of {agreeing} servers by more than "
+                   "{tolerance:.1f} s, moved below the other reachable servers): {count}",
+                ru="Неверное время (расходится с консенсусом {agreeing} серверов больше чем на "
+                   "{tolerance:.1f} с, перемещены ниже остальных доступных): {count}"
+            ),
+            "ping_falseticker_row": Translation(
+                en="{server}: offset {offset:+.3f} s, {deviation:.3f} s outside the consensus",
+                ru="{server}: смещение {offset:+.3f} с, {deviation:.3f} с вне консенсуса"
+            ),
+            "probe_metrics_title": Translation(
+                en="Probe metrics ({label}, {seconds:.1f}s):",
+                ru="Метрики проверки ({label}, {seconds:.1f} с):"
+            ),
+            "probe_metrics_counters": Translation(
+                en="Servers: {servers}, DNS lookups: {dns_lookups} (cached: {dns_cached}, failed: {dns_failures}), "
+                   "queries: {queries}, replies: {replies}, timeouts: {timeouts}, protocol errors: {protocol_errors}, "
+                   "socket errors: {socket_errors}, unsynchronized: {unsynced}, KoD: {kod}, "
+                   "skipped by backoff: {backoff_skipped}, answered by a shared address probe: {shared_probes}",
+                ru="Серверов: {servers}, DNS-запросов: {dns_lookups} (из кэша: {dns_cached}, ошибок: {dns_failures}), "
+                   "запросов: {queries}, ответов: {replies}, таймаутов: {timeouts}, ошибок протокола: {protocol_errors}, "
+                   "ошибок сокета: {socket_errors}, несинхронизированных: {unsynced}, KoD: {kod}, "
+                   "пропущено из-за паузы: {backoff_skipped}, ответов из общей проверки адреса: {shared_probes}"
+            ),
+            "probe_metrics_latency": Translation(
+                en="{stage:<10} n={count:<6} p50 {p50} ms, p90 {p90} ms, p99 {p99} ms, max {max} ms",
+                ru="{stage:<10} n={count:<6} p50 {p50} мс, p90 {p90} мс, p99 {p99} мс, макс {max} мс"
+            ),
+            "probe_metrics_stage_dns": Translation(
+                en="DNS",
+                ru="DNS"
+            ),
+            "probe_metrics_stage_pace": Translation(
+                en="Pacing",
+                ru="Темп"
+            ),
+            "probe_metrics_stage_send": Translation(
+                en="Send",
+                ru="Отправка"
+            ),
+            "probe_metrics_stage_reply": Translation(
+                en="Reply",
+                ru="Ответ"
+            ),
+            "probe_metrics_slowest": Translation(
+                en="Slowest replies (p90):",
+                ru="Самые медленные ответы (p90):"
+            ),
+            "probe_metrics_exported": Translation(
+                en="Metrics saved to {path}",
+                ru="Метрики сохранены в {path}"
+            ),
+            "ping_dual_stack_title": Translation(
+                en="Servers with IPv4 and IPv6 addresses — the winning family and the address to pin:",
+                ru="Серверы с адресами IPv4 и IPv6 — семейство-победитель и адрес для закрепления:"
+            ),
+            "ping_history_skipped": Translation(
+                en="Skipped: {count} (no response in the last {failures} runs on this network; rechecked every {hours:.0f} h)",
+                ru="Пропущено: {count} (не отвечали в последних {failures} запусках в этой сети; перепроверка раз в {hours:.0f} ч)"
+            ),
+            "ping_deep_summary": Translation(
+                en="Probed in depth ({count} attempts): {finalists}; others — single quick probe",
+                ru="Проверено углублённо ({count} попыток): {finalists}; остальные — одним быстрым запросом"
+            ),
+            "ping_elapsed": Translation(
+                en="Elapsed: {seconds:.1f} s",
+                ru="Затрачено: {seconds:.1f} с"
+            ),
+            "ping_dns_summary": Translation(
+                en="DNS: {resolved} resolved (avg {avg:.0f} ms, max {max:.0f} ms), {cached} from cache — not included in RTT",
+                ru="DNS: разрешено {resolved} (в среднем {avg:.0f} мс, макс. {max:.0f} мс), {cached} из кэша — не входит в RTT"
+            ),
+            "ping_pool_best_ips": Translation(
+                en="Best individual addresses of multi-address servers (can be pinned instead of the name):",
+                ru="Лучшие отдельные адреса серверов с несколькими IP (можно закрепить вместо имени):"
+            ),
             "ping_ntp_servers_start": Translation(
                 en="Checking NTP server connectivity (may take time)...",
                 ru="Проверка доступности NTP-серверов (может занять время)..."
@@ -1156,6 +1244,14 @@ vn: Вьетнам
                 en="Subnet {network} contains {hosts} hosts and may take a long time. Continue? (y/n): ",
                 ru="Подсеть {network} содержит {hosts} хостов и может сканироваться долго. Продолжить? (y/n): "
             ),
+            "scan_ipv6_start": Translation(
+                en="Probing IPv6 neighbors on {interfaces} for ADB port 5555...",
+                ru="Проверка IPv6-соседей на {interfaces} на открытый порт ADB 5555..."
+            ),
+            "scan_ipv6_result": Translation(
+                en="  IPv6 neighbors checked: {checked}, with ADB: {found}",
+                ru="  Проверено IPv6-соседей: {checked}, с ADB: {found}"
+            ),
             "scan_firewall_hint": Translation(
                 en="Hint: Make sure this program is allowed through your firewall (Windows Defender, iptables, etc.).",
                 ru="Подсказка: Убедитесь, что программа добавлена в исключения файрвола (Брандмауэр Windows, iptables и т.д.)."
@@ -1212,6 +1308,10 @@ vn: Вьетнам
                 en="  PC time     : {time}",
                 ru="  Время ПК        : {time}"
             ),
+            "consensus_time": Translation(
+                en="  Exact time  : {time} (consensus of {agreeing}/{total} NTP servers)",
+                ru="  Точное время    : {time} (консенсус {agreeing}/{total} NTP-серверов)"
+            ),
             "time_in_sync": Translation(
                 en="  Status: Synchronized (difference < 60 sec)",
                 ru="  Статус: Синхронизировано (разница < 60 сек)"
@@ -1281,6 +1381,18 @@ vn: Вьетнам
                 en="Verifying NTP server time sync (3 attempts)...",
                 ru="Проверка синхронизации времени NTP-сервера (3 попытки)..."
             ),
+            "ntp_verify_cached": Translation(
+                en="Using the check result from {seconds} s ago on this network",
+                ru="Используется результат проверки {seconds} с назад в этой сети"
+            ),
+            "ntp_verify_prefetched": Translation(
+                en="Using the check made while connecting to the device ({seconds} s ago)",
+                ru="Используется проверка, выполненная во время подключения к устройству ({seconds} с назад)"
+            ),
+            "ntp_verify_prefetch_wait": Translation(
+                en="Waiting for the check started while connecting to the device...",
+                ru="Ожидание проверки, начатой во время подключения к устройству..."
+            ),
             "ntp_verify_detailed": Translation(
                 en="NTP server {server} is working correctly:\n  RTT: {rtt:.1f}ms | Success: {success:.0f}% | Offset: {offset:.3f}s",
                 ru="NTP-сервер {server} работает корректно:\n  RTT: {rtt:.1f}мс | Успех: {success:.0f}% | Смещение: {offset:.3f}с"
@@ -1289,6 +1401,14 @@ vn: Вьетнам
                 en="Warning: NTP server {server} is not reachable as a time server. It will not be added.",
                 ru="Предупреждение: NTP-сервер {server} недоступен как сервер времени. Он не будет добавлен."
             ),
+            "ntp_verify_consensus_mismatch": Translation(
+                en="Warning: NTP server {server} disagrees with the consensus of {agreeing} servers by {deviation:.3f}s. It will not be added.",
+                ru="Предупреждение: время NTP-сервера {server} расходится с консенсусом {agreeing} серверов на {deviation:.3f}с. Он не будет добавлен."
+            ),
+            "ntp_verify_pc_clock_off": Translation(
+                en="Note: the PC clock is off by {offset:+.1f}s from the consensus of {agreeing}/{total} NTP servers",
+                ru="Примечание: часы ПК отличаются от консенсуса {agreeing}/{total} NTP-серверов на {offset:+.1f}с"
+            ),
             "ntp_verify_bad_offset": Translation(
                 en="Warning: NTP server {server} responds but time offset is too large ({offset:.1f}s). It will not be added.",
                 ru="Предупреждение: NTP-сервер {server} отвечает, но смещение времени слишком большое ({offset:.1f}с). Он не будет добавлен."
@@ -1327,6 +1447,46 @@ vn: Вьетнам
                 en="Ping NTP servers",
                 ru="Пинговать NTP-серверы"
             ),
+            "monitor_ntp_menu": Translation(
+                en="Monitor NTP servers continuously",
+                ru="Непрерывный мониторинг NTP-серверов"
+            ),
+            "monitor_interval_prompt": Translation(
+                en="Probe interval in seconds (Enter — 60, minimum 15): ",
+                ru="Интервал опроса в секундах (Enter — 60, минимум 15): "
+            ),
+            "monitor_no_servers": Translation(
+                en="No servers to monitor.",
+                ru="Нет серверов для мониторинга."
+            ),
+            "monitor_status": Translation(
+                en="Monitoring {count} servers every {interval:.0f} s — round {rounds}, window {window:.0f} min (Ctrl+C to stop)",
+                ru="Мониторинг {count} серверов каждые {interval:.0f} с — раунд {rounds}, окно {window:.0f} мин (Ctrl+C — остановить)"
+            ),
+            "monitor_stopped": Translation(
+                en="Monitoring stopped after {rounds} rounds.",
+                ru="Мониторинг остановлен после {rounds} раундов."
+            ),
+            "monitor_no_hourly": Translation(
+                en="No hourly statistics for this network yet.",
+                ru="Почасовой статистики для этой сети пока нет."
+            ),
+            "monitor_hourly_title": Translation(
+                en="Server quality by hour of day (all monitoring sessions on this network):",
+                ru="Качество серверов по часам суток (все сеансы мониторинга в этой сети):"
+            ),
+            "monitor_hourly_legend": Translation(
+                en="  '.' no data, '-' normal, '+' RTT 1.5x above usual, '!' loss above 5%",
+                ru="  '.' нет данных, '-' норма, '+' RTT в 1.5+ раза выше обычного, '!' потери больше 5%"
+            ),
+            "monitor_degraded_title": Translation(
+                en="Degraded hours:",
+                ru="Часы ухудшения:"
+            ),
+            "monitor_degraded_row": Translation(
+                en="{server} at {hour:02d}:00 — loss {loss:.0f}%, RTT {rtt} ms (usual {typical} ms)",
+                ru="{server} в {hour:02d}:00 — потери {loss:.0f}%, RTT {rtt} мс (обычно {typical} мс)"
+            ),
 
             # ─── Country code format hints ────────────────────────────
             "country_code_format_hint": Translation(
@@ -1353,6 +1513,22 @@ vn: Вьетнам
                 en="[Auto] Found {count} device(s). Connecting to {ip}...",
                 ru="[Авто] Найдено {count} устройств. Подключение к {ip}..."
             ),
+            "auto_early_connect": Translation(
+                en="[Auto] Device {ip} found, connecting while the scan continues "
+                   "(confirm the connection on the TV if prompted)",
+                ru="[Авто] Найдено устройство {ip}, подключение идёт, пока продолжается сканирование "
+                   "(подтвердите подключение на ТВ, если появится запрос)"
+            ),
+            "auto_connected": Translation(
+                en="[Auto] Connected to {ip}",
+                ru="[Авто] Подключено к {ip}"
+            ),
+            "auto_pipeline_ready": Translation(
+                en="[Auto] Device connected and NTP servers checked in {seconds:.1f} s "
+                   "(server selection {selection:.1f} s, in parallel; suitable servers: {count})",
+                ru="[Авто] Устройство подключено и NTP-серверы проверены за {seconds:.1f} с "
+                   "(выбор сервера {selection:.1f} с, параллельно; подходящих серверов: {count})"
+            ),
             "auto_select_device": Translation(
                 en="[Auto] Multiple devices found. Select device number: ",
                 ru="[Авто] Найдено несколько устройств. Выберите номер устройства: "
@@ -1369,6 +1545,16 @@ vn: Вьетнам
                 en="[Auto] Quick-testing NTP servers to find the best one for you...",
                 ru="[Авто] Быстрая проверка NTP-серверов для выбора оптимального..."
             ),
+            "auto_profile_known": Translation(
+                en="[Auto] Known network {subnet}: recommending from its profile ({count} servers, "
+                   "checked {hours:.1f}h ago); re-checking in the background",
+                ru="[Авто] Известная сеть {subnet}: рекомендация из её профиля ({count} серверов, "
+                   "проверка {hours:.1f} ч назад); перепроверка идёт в фоне"
+            ),
+            "auto_profile_unknown": Translation(
+                en="[Auto] New network {subnet}: full check, the result will be saved as its profile",
+                ru="[Авто] Новая сеть {subnet}: полная проверка, результат сохранится как её профиль"
+            ),
             "auto_best_server": Translation(
                 en="[Auto] Recommended server: {server} (RTT: {rtt:.1f}ms)",
                 ru="[Авто] Рекомендуемый сервер: {server} (RTT: {rtt:.1f}мс)"
@@ -1394,13 +1580,65 @@ vn: Вьетнам
                 ru="[Авто] Не найдено доступных NTP-серверов. Проверьте подключение к интернету."
             ),
             "auto_choose_from_top": Translation(
-                en="[Auto] Enter server number from the list (or Enter for recommended #1): ",
-                ru="[Авто] Введите номер сервера из списка (или Enter для рекомендуемого №1): "
+                en="[Auto] Enter server number from the list (or Enter for recommended #1, add 'p' to pin the best IP, e.g. 1p): ",
+                ru="[Авто] Введите номер сервера из списка (или Enter для рекомендуемого №1, добавьте 'p' чтобы закрепить лучший IP, напр. 1p): "
+            ),
+            "auto_best_ip": Translation(
+                en="best IP: {ip} ({rtt:.1f}ms), spread across pool addresses: {spread:.1f}ms",
+                ru="лучший IP: {ip} ({rtt:.1f}мс), разброс по адресам пула: {spread:.1f}мс"
             ),
             "auto_checking_progress": Translation(
                 en="  [{checked}/{total}] checked, {found} reachable",
                 ru="  [{checked}/{total}] проверено, {found} доступно"
             ),
+            "auto_deep_probe": Translation(
+                en="[Auto] {finalists} fastest servers probed in depth ({attempts} attempts each)",
+                ru="[Авто] {finalists} самых быстрых серверов проверено углублённо (по {attempts} попытки)"
+            ),
+            "auto_family_winner": Translation(
+                en="{family} answers better ({stats}); for pinning use {ip} (answer with the 'p' suffix)",
+                ru="{family} отвечает лучше ({stats}); для закрепления используйте {ip} (ответ с суффиксом 'p')"
+            ),
+            "auto_device_probe": Translation(
+                en="Checking the top {count} servers from the TV itself...",
+                ru="Проверка {count} лучших серверов с самого телевизора..."
+            ),
+            "auto_device_probe_summary": Translation(
+                en="Reachable from the TV: {reachable} of {total} ({method})",
+                ru="Доступны с телевизора: {reachable} из {total} ({method})"
+            ),
+            "auto_device_unreachable": Translation(
+                en="{server} answers this PC but not the TV: {error}",
+                ru="{server} отвечает этому ПК, но не телевизору: {error}"
+            ),
+            "auto_device_probe_none": Translation(
+                en="None of the candidates answered the TV — its network may block NTP; ranking by the PC check",
+                ru="Телевизору не ответил ни один кандидат — возможно, его сеть блокирует NTP; порядок по проверке с ПК"
+            ),
+            "auto_device_probe_failed": Translation(
+                en="Could not check servers from the TV; ranking by the PC check only",
+                ru="Не удалось проверить серверы с телевизора; порядок только по проверке с ПК"
+            ),
+            "auto_device_result_rtt": Translation(
+                en="From the TV: {rtt:.1f}ms ({method})",
+                ru="С телевизора: {rtt:.1f} мс ({method})"
+            ),
+            "auto_device_result_reachable": Translation(
+                en="From the TV: reachable ({method})",
+                ru="С телевизора: доступен ({method})"
+            ),
+            "auto_device_result_unreachable": Translation(
+                en="From the TV: unreachable ({error})",
+                ru="С телевизора: недоступен ({error})"
+            ),
+            "auto_race_stopped": Translation(
+                en="[Auto] Top servers confirmed after {seconds:.1f} s; {skipped} slower checks stopped early",
+                ru="[Авто] Лучшие серверы определены за {seconds:.1f} с; {skipped} более медленных проверок остановлено досрочно"
+            ),
+            "auto_server_score": Translation(
+                en="Score",
+                ru="Оценка"
+            ),
             "auto_server_success": Translation(
                 en="Success",
                 ru="Успех"
@@ -45,7 +45,6 @@ packages = [
     'threading', 
     'adb_shell.adb_device', 
     'adb_shell.auth.sign_pythonrsa',
-    'ntplib', 
     'psutil'
 ]
 
@@ -105,6 +104,9 @@ else:  # linux
 # Добавляем платформо-зависимые данные
 datas.extend(platform_data)
 
+# Каталог NTP-серверов
+datas.append((os.path.join(SRC_PATH, 'ntp_catalog.json'), '.'))
+
 a = Analysis(
     [os.path.join(SRC_PATH, 'android_time_fixer.py')],
     pathex=[BASEPATH],
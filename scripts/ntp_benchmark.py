@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк NTP-части приложения на локальной ферме scripts/ntp_simulator.py.
+
+Для каждого размера каталога (по умолчанию 100, 1000, 10000 серверов) ферма запускается
+отдельным процессом, а каждый замер — в своём дочернем процессе с чистым рабочим каталогом
+(кэши DNS, история, паузы KoD не переходят между замерами). Замеры:
+  test_server   — _test_ntp_server для одного сервера;
+  catalog_sweep — полная двухэтапная проверка каталога (как пункт меню 6);
+  auto_select   — этап выбора сервера автонастройки (как пункт меню 9).
+Для каждого замера пишутся время, число отправленных пакетов, пик потоков и пик RSS.
+
+    python scripts/ntp_benchmark.py run --output ntp_baseline.json
+    python scripts/ntp_benchmark.py run --sizes 100,1000 --output current.json --compare ntp_baseline.json
+    python scripts/ntp_benchmark.py compare ntp_baseline.json current.json --threshold 0.2
+"""
+
+import argparse
+import atexit
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+ROOT = Path(__file__).resolve().parent.parent
+SIMULATOR = ROOT / 'scripts' / 'ntp_simulator.py'
+CASES = ('test_server', 'catalog_sweep', 'auto_select')
+# Метрики, для которых рост — регрессия
+METRICS = ('wall_s', 'packets', 'peak_threads', 'peak_rss_mb')
+# Популяция фермы: в основном здоровые серверы с небольшой долей проблемных
+FARM_ARGS = ['--delay', '1,50', '--jitter', '0.05', '--loss', '0.02', '--dead', '0.02',
+             '--unsynced', '0.01', '--falsetickers', '0.01']
+
+
+class ResourceSampler(threading.Thread):
+    """Фоновый поток, отслеживающий пик RSS и числа потоков процесса"""
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop_event = threading.Event()
+
+    def sample(self) -> None:
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        # Сам сэмплер в число потоков приложения не входит
+        self.peak_threads = max(self.peak_threads, self.process.num_threads() - 1)
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+
+def make_fixer():
+    """Экземпляр приложения без ADB: бенчмарк затрагивает только NTP-часть"""
+    sys.path.insert(0, str(ROOT))
+    sys.path.insert(0, str(ROOT / 'src'))
+    import android_time_fixer
+
+    class BenchmarkFixer(android_time_fixer.AndroidTVTimeFixer):
+        def get_adb_path(self) -> str:
+            return ''
+
+    fixer = BenchmarkFixer()
+    # Не трогаем adb-сервер пользователя при выходе и не перехватываем Ctrl+C
+    atexit.unregister(fixer.process_manager.terminate_adb_processes)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    fixer.logger.setLevel(logging.WARNING)
+    return fixer
+
+
+def run_case(name: str) -> dict:
+    """Выполняет один замер в текущем процессе (рабочий каталог и каталог серверов заданы заранее)"""
+    fixer = make_fixer()
+    servers = fixer._default_probe_servers()
+    sampler = ResourceSampler()
+    sampler.start()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with fixer._probe_metrics_run('benchmark') as probe_run:
+            if name == 'test_server':
+                results = [fixer._test_ntp_server(servers[0])]
+            elif name == 'catalog_sweep':
+                sweep, deep = fixer._probe_ntp_servers_tiered(servers)
+                results = sweep + deep
+            elif name == 'auto_select':
+                results = fixer._auto_select_ntp_servers([])
+            else:
+                raise ValueError(f"unknown case {name!r}")
+    wall = time.perf_counter() - started
+    sampler.stop()
+    return {
+        'wall_s': wall,
+        'packets': probe_run.totals().counters['queries'],
+        'peak_threads': sampler.peak_threads,
+        'peak_rss_mb': sampler.peak_rss / 2 ** 20,
+        'servers': len(servers),
+        'reachable': sum(1 for r in results if r['status'] == 'Reachable'),
+    }
+
+
+def start_farm(count: int, catalog: Path, seed: int, base_port: int) -> subprocess.Popen:
+    farm = subprocess.Popen(
+        [sys.executable, str(SIMULATOR), '--count', str(count), '--seed', str(seed),
+         '--base-port', str(base_port), '--catalog', str(catalog), *FARM_ARGS],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = farm.stdout.readline()
+    if not line.startswith('READY'):
+        farm.kill()
+        raise RuntimeError(f"NTP farm did not start: {line.strip() or 'no output'}")
+    return farm
+
+
+def measure(case: str, catalog: Path, repeat: int, timeout: float) -> dict:
+    """Повторяет замер repeat раз в дочерних процессах: время — медиана, пики — максимум"""
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix='ntp_bench_') as workdir:
+            env = dict(os.environ, ANDROID_TV_TIME_FIXER_NTP_CATALOG=str(catalog))
+            completed = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), 'case', case],
+                cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout
+            )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith('RESULT ')]
+        if completed.returncode or not lines:
+            raise RuntimeError(f"case {case} failed:\n{completed.stderr.strip()}")
+        runs.append(json.loads(lines[-1][len('RESULT '):]))
+    return {
+        'wall_s': statistics.median(r['wall_s'] for r in runs),
+        'wall_min_s': min(r['wall_s'] for r in runs),
+        'packets': statistics.median(r['packets'] for r in runs),
+        'peak_threads': max(r['peak_threads'] for r in runs),
+        'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+        'servers': runs[0]['servers'],
+        'reachable': statistics.median(r['reachable'] for r in runs),
+        'repeat': repeat,
+    }
+
+
+def run_suite(sizes, cases, repeat: int, seed: int, base_port: int, timeout: float) -> dict:
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix='ntp_farm_') as farm_dir:
+            catalog = Path(farm_dir) / 'catalog.json'
+            farm = start_farm(size, catalog, seed, base_port)
+            try:
+                for case in cases:
+                    print(f"[{size} servers] {case} ...", end='', flush=True)
+                    metrics = measure(case, catalog, repeat, timeout)
+                    results.setdefault(str(size), {})[case] = metrics
+                    print(f" {metrics['wall_s']:.3f}s, {metrics['packets']:.0f} packets, "
+                          f"{metrics['peak_threads']} threads, {metrics['peak_rss_mb']:.1f} MB")
+            finally:
+                farm.terminate()
+                farm.wait()
+    return {
+        'version': 1,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'config': {'seed': seed, 'repeat': repeat, 'farm_args': FARM_ARGS},
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Печатает сравнение и возвращает True, если есть регрессии больше threshold (доля)"""
+    regressions = False
+    print(f"{'Size':<7} {'Case':<14} {'Metric':<13} {'Baseline':>10} {'Current':>10} {'Change':>9}")
+    for size, cases in current.get('results', {}).items():
+        for case, metrics in cases.items():
+            base = baseline.get('results', {}).get(size, {}).get(case)
+            if not base:
+                continue
+            for metric in METRICS:
+                old, new = base.get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+                flag = change > threshold
+                regressions |= flag
+                print(f"{size:<7} {case:<14} {metric:<13} {old:>10.3f} {new:>10.3f} {change:>+8.1%}"
+                      + ("  REGRESSION" if flag else ""))
+    return regressions
+
+
+def main():
+    """Точка входа: run — прогон и запись результатов, compare — сравнение с базой"""
+    parser = argparse.ArgumentParser(description="NTP probing benchmark against a local SNTP farm")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the suite and write results as JSON")
+    run_parser.add_argument('--sizes', default='100,1000,10000', help="comma-separated catalog sizes")
+    run_parser.add_argument('--cases', default=','.join(CASES), help="comma-separated cases")
+    run_parser.add_argument('--repeat', type=int, default=3, help="runs per case (median wall time)")
+    run_parser.add_argument('--seed', type=int, default=1, help="farm population seed")
+    run_parser.add_argument('--base-port', type=int, default=12300, help="port of the first farm server")
+    run_parser.add_argument('--timeout', type=float, default=900, help="time limit for one run, s")
+    run_parser.add_argument('--output', default='ntp_benchmark.json', help="results file")
+    run_parser.add_argument('--compare', help="baseline file to compare the results with")
+    run_parser.add_argument('--threshold', type=float, default=0.2, help="allowed growth, fraction")
+
+    compare_parser = commands.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help="allowed growth, fraction")
+
+    case_parser = commands.add_parser('case', help=argparse.SUPPRESS)
+    case_parser.add_argument('name', choices=CASES)
+
+    args = parser.parse_args()
+
+    if args.command == 'case':
+        print('RESULT ' + json.dumps(run_case(args.name)), flush=True)
+        return
+
+    if args.command == 'run':
+        cases = [case for case in args.cases.split(',') if case]
+        unknown = set(cases) - set(CASES)
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+        sizes = [int(size) for size in args.sizes.split(',') if size]
+        current = run_suite(sizes, cases, args.repeat, args.seed, args.base_port, args.timeout)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to {args.output}")
+        if not args.compare:
+            return
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        threshold = args.threshold
+    else:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        threshold = args.threshold
+
+    if compare(baseline, current, threshold):
+        print(f"Regressions beyond {threshold:.0%} found")
+        sys.exit(1)
+    print(f"No regressions beyond {threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
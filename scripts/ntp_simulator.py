@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Локальная ферма фейковых SNTP-серверов для офлайн-проверки кода опроса NTP.
+
+Каждый сервер фермы слушает свой UDP-порт на loopback и ведёт себя по заданной
+спецификации: распределение задержки, потери пакетов, смещение часов, stratum,
+leap, Kiss-o'-Death (постоянный или при превышении частоты запросов).
+Задержка симметрична: половина — «до» сервера (до метки T2), половина — «после» (после T3),
+поэтому ожидаемые RTT и смещение известны заранее и результаты проверки можно сверять.
+
+Ферма записывает каталог серверов; приложение подхватывает его из переменной окружения:
+
+    python scripts/ntp_simulator.py --count 200 --catalog sim_catalog.json
+    ANDROID_TV_TIME_FIXER_NTP_CATALOG=sim_catalog.json python src/android_time_fixer.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import struct
+import sys
+import time
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, List, Optional
+
+NTP_EPOCH_DELTA = 2208988800
+NTP_PACKET = struct.Struct('!BBbbII4sQQQQ')
+CATALOG_ENV = 'ANDROID_TV_TIME_FIXER_NTP_CATALOG'
+KOD_CODES = ('RATE', 'DENY', 'RSTR')
+
+
+@dataclass
+class ResponderSpec:
+    """Поведение одного фейкового сервера"""
+    name: str
+    port: int
+    host: str = '127.0.0.1'
+    delay_ms: float = 10.0           # медиана полной задержки (туда и обратно)
+    jitter_ms: float = 0.5           # разброс задержки
+    distribution: str = 'normal'     # normal | lognormal | uniform
+    loss: float = 0.0                # вероятность потерять запрос
+    offset: float = 0.0              # смещение часов сервера, с
+    stratum: int = 2
+    leap: int = 0
+    root_delay_ms: float = 5.0
+    root_dispersion_ms: float = 5.0
+    kod: Optional[str] = None        # всегда отвечать этим Kiss-o'-Death кодом
+    rate_limit: float = 0.0          # минимальный интервал запросов одного клиента, чаще — KoD RATE
+    dead: bool = False               # не отвечать вовсе
+
+    @property
+    def target(self) -> str:
+        host = f"[{self.host}]" if ':' in self.host else self.host
+        return f"{host}:{self.port}"
+
+
+def _to_ntp(timestamp: float) -> int:
+    return int((timestamp + NTP_EPOCH_DELTA) * 2 ** 32) & 0xFFFFFFFFFFFFFFFF
+
+
+def _short(milliseconds: float) -> int:
+    """Формат 16.16 для root delay / root dispersion"""
+    return min(0xFFFFFFFF, int(milliseconds / 1000 * 2 ** 16))
+
+
+class _Responder(asyncio.DatagramProtocol):
+    def __init__(self, spec: ResponderSpec, farm: 'NTPFarm', rng: random.Random):
+        self.spec = spec
+        self.farm = farm
+        self.rng = rng
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self._last_request: Dict[str, float] = {}
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def _sample_delay(self) -> float:
+        spec = self.spec
+        if spec.distribution == 'uniform':
+            delay = self.rng.uniform(spec.delay_ms - spec.jitter_ms, spec.delay_ms + spec.jitter_ms)
+        elif spec.distribution == 'lognormal' and spec.delay_ms > 0:
+            delay = spec.delay_ms * self.rng.lognormvariate(0, spec.jitter_ms / spec.delay_ms)
+        else:
+            delay = self.rng.gauss(spec.delay_ms, spec.jitter_ms)
+        return max(0.0, delay) / 1000
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        self.farm.stats['received'] += 1
+        if self.spec.dead or len(data) < NTP_PACKET.size or self.rng.random() < self.spec.loss:
+            self.farm.stats['dropped'] += 1
+            return
+        half = self._sample_delay() / 2
+        asyncio.get_running_loop().call_later(half, self._reply, data, addr, half)
+
+    def _reply(self, data: bytes, addr: tuple, half: float) -> None:
+        spec = self.spec
+        monotonic = time.monotonic()
+        previous = self._last_request.get(addr[0])
+        self._last_request[addr[0]] = monotonic
+
+        kod = spec.kod
+        if not kod and spec.rate_limit and previous is not None and monotonic - previous < spec.rate_limit:
+            kod = 'RATE'
+
+        version = (data[0] >> 3) & 0x7 or 3
+        now = time.time() + spec.offset
+        if kod:
+            self.farm.stats['kod'] += 1
+            stratum, ref_id = 0, kod.encode('ascii')[:4].ljust(4, b'\0')
+        else:
+            stratum = spec.stratum
+            ref_id = b'GPS\0' if stratum <= 1 else bytes([10, 0, 0, 1])
+        packet = NTP_PACKET.pack(
+            (spec.leap << 6) | (version << 3) | 4, stratum, data[2], -20,
+            _short(spec.root_delay_ms), _short(spec.root_dispersion_ms), ref_id,
+            _to_ntp(now - 16), int.from_bytes(data[40:48], 'big'), _to_ntp(now), _to_ntp(now)
+        )
+        asyncio.get_running_loop().call_later(half, self._send, packet, addr)
+
+    def _send(self, packet: bytes, addr: tuple) -> None:
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.sendto(packet, addr)
+            self.farm.stats['answered'] += 1
+
+
+class NTPFarm:
+    """Набор фейковых серверов в одном событийном цикле"""
+
+    def __init__(self, specs: List[ResponderSpec], seed: int = 0):
+        self.specs = specs
+        self.seed = seed
+        self.stats = {'received': 0, 'answered': 0, 'dropped': 0, 'kod': 0}
+        self._transports: List[asyncio.DatagramTransport] = []
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        for index, spec in enumerate(self.specs):
+            rng = random.Random(self.seed * 1_000_003 + index)
+            transport, _protocol = await loop.create_datagram_endpoint(
+                lambda spec=spec, rng=rng: _Responder(spec, self, rng), local_addr=(spec.host, spec.port)
+            )
+            self._transports.append(transport)
+
+    def close(self) -> None:
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+    def catalog(self) -> dict:
+        """Каталог для ANDROID_TV_TIME_FIXER_NTP_CATALOG; specs — эталон для сверки результатов"""
+        return {
+            'version': 1,
+            'countries': {},
+            'servers': [
+                {'host': spec.target, 'region': 'global', 'tags': ['default', 'simulator', spec.name]}
+                for spec in self.specs
+            ],
+            'specs': [asdict(spec) for spec in self.specs],
+        }
+
+
+def generate_specs(count: int, host: str = '127.0.0.1', base_port: int = 12300, seed: int = 0,
+                   delay_range=(2.0, 200.0), jitter: float = 0.05, distribution: str = 'normal',
+                   max_loss: float = 0.0, offset_spread: float = 0.002, falseticker_fraction: float = 0.0,
+                   unsynced_fraction: float = 0.0, kod_fraction: float = 0.0,
+                   rate_limit_fraction: float = 0.0, dead_fraction: float = 0.0) -> List[ResponderSpec]:
+    """Детерминированная (по seed) популяция серверов с заданными долями проблемных"""
+    rng = random.Random(seed)
+    specs = []
+    for index in range(count):
+        delay = rng.uniform(*delay_range)
+        spec = ResponderSpec(
+            name=f"sim{index:05d}",
+            port=base_port + index,
+            host=host,
+            delay_ms=round(delay, 3),
+            jitter_ms=round(delay * jitter, 3),
+            distribution=distribution,
+            loss=round(rng.uniform(0, max_loss), 4) if max_loss else 0.0,
+            offset=round(rng.gauss(0, offset_spread), 6),
+            stratum=rng.choice((1, 2, 2, 2, 3)),
+            root_delay_ms=round(rng.uniform(0.5, 20), 3),
+            root_dispersion_ms=round(rng.uniform(0.5, 20), 3),
+        )
+        roll = rng.random()
+        if roll < dead_fraction:
+            spec.dead = True
+        elif roll < dead_fraction + falseticker_fraction:
+            spec.offset += rng.choice((-1, 1)) * 120
+        elif roll < dead_fraction + falseticker_fraction + unsynced_fraction:
+            spec.stratum = 16
+        elif roll < dead_fraction + falseticker_fraction + unsynced_fraction + kod_fraction:
+            spec.kod = rng.choice(KOD_CODES)
+        elif roll < (dead_fraction + falseticker_fraction + unsynced_fraction + kod_fraction
+                     + rate_limit_fraction):
+            spec.rate_limit = 2.0
+        specs.append(spec)
+    return specs
+
+
+def load_specs(path: str) -> List[ResponderSpec]:
+    """Спецификации из JSON: список объектов с полями ResponderSpec"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('specs', [])
+    known = {field.name for field in fields(ResponderSpec)}
+    return [ResponderSpec(**{key: value for key, value in item.items() if key in known}) for item in data]
+
+
+def raise_open_files_limit(needed: int) -> None:
+    """Каждому серверу нужен свой сокет: при необходимости поднимаем мягкий лимит файлов"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+async def serve(farm: NTPFarm, catalog_path: Optional[str], duration: Optional[float]) -> None:
+    await farm.start()
+    if catalog_path:
+        with open(catalog_path, 'w', encoding='utf-8') as f:
+            json.dump(farm.catalog(), f, indent=1)
+    # Строка готовности — для скриптов, запускающих ферму как подпроцесс
+    print(f"READY {len(farm.specs)} servers" + (f", catalog: {catalog_path}" if catalog_path else ""), flush=True)
+    try:
+        if duration:
+            await asyncio.sleep(duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        farm.close()
+
+
+def main():
+    """Запускает ферму по параметрам командной строки"""
+    parser = argparse.ArgumentParser(description="Local fake SNTP server farm")
+    parser.add_argument('--count', type=int, default=100, help="number of servers")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--base-port', type=int, default=12300, help="port of the first server")
+    parser.add_argument('--seed', type=int, default=1, help="seed for the population and per-packet randomness")
+    parser.add_argument('--delay', default='2,200', help="min,max median delay in ms")
+    parser.add_argument('--jitter', type=float, default=0.05, help="delay spread as a fraction of the median")
+    parser.add_argument('--distribution', choices=('normal', 'lognormal', 'uniform'), default='normal')
+    parser.add_argument('--loss', type=float, default=0.0, help="max per-server packet loss probability")
+    parser.add_argument('--offset-spread', type=float, default=0.002, help="stddev of server clock offsets, s")
+    parser.add_argument('--falsetickers', type=float, default=0.0, help="fraction of servers off by 120 s")
+    parser.add_argument('--unsynced', type=float, default=0.0, help="fraction of stratum 16 servers")
+    parser.add_argument('--kod', type=float, default=0.0, help="fraction of servers always sending KoD")
+    parser.add_argument('--rate-limited', type=float, default=0.0,
+                        help="fraction of servers sending KoD RATE to clients polling faster than every 2 s")
+    parser.add_argument('--dead', type=float, default=0.0, help="fraction of servers that never answer")
+    parser.add_argument('--specs', help="JSON file with explicit server specs (overrides the population)")
+    parser.add_argument('--catalog', help="write the catalog for " + CATALOG_ENV + " here")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    if args.specs:
+        specs = load_specs(args.specs)
+    else:
+        low, high = (float(value) for value in args.delay.split(','))
+        specs = generate_specs(
+            args.count, host=args.host, base_port=args.base_port, seed=args.seed,
+            delay_range=(low, high), jitter=args.jitter, distribution=args.distribution,
+            max_loss=args.loss, offset_spread=args.offset_spread, falseticker_fraction=args.falsetickers,
+            unsynced_fraction=args.unsynced, kod_fraction=args.kod,
+            rate_limit_fraction=args.rate_limited, dead_fraction=args.dead,
+        )
+    raise_open_files_limit(len(specs) + 64)
+
+    farm = NTPFarm(specs, seed=args.seed)
+    try:
+        asyncio.run(serve(farm, args.catalog, args.duration))
+    except KeyboardInterrupt:
+        pass
+    print(f"Requests: {farm.stats['received']}, answered: {farm.stats['answered']}, "
+          f"dropped: {farm.stats['dropped']}, KoD: {farm.stats['kod']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,11 +13,20 @@ import psutil
 import atexit
 import signal
 import subprocess
+import struct
+import asyncio
+import threading
+import statistics
+import sqlite3
+import tempfile
+import math
 from subprocess import Popen, PIPE
 from pathlib import Path
-from typing import Optional, Tuple, List
-from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
-import ntplib
+from array import array
+from dataclasses import dataclass
+from typing import Optional, Tuple, List, Dict, Callable
+from contextlib import closing, contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import pyperclip
 import colorama
 from colorama import Fore, Style, init
@@ -254,10 +263,1495 @@ class ADBProcessManager:
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
 
+
+class ADBConnectionPool:
+    """
+    Пул ADB-соединений (AdbDeviceTcp) по ключу host:port: повторное обращение к устройству
+    не требует нового TCP-подключения и RSA-авторизации.
+    Соединение, простаивающее дольше idle_timeout, закрывается; при переполнении закрывается
+    самое давно использованное. Закреплённое (текущее) соединение не вытесняется.
+    Перед выдачей соединение, простаивавшее дольше liveness_interval, проверяется командой echo.
+    """
+
+    def __init__(self, max_size: int = 8, idle_timeout: float = 900, liveness_interval: float = 10):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.liveness_interval = liveness_interval
+        self.pinned: Optional[str] = None
+        self.logger = logging.getLogger(__name__)
+        # key -> [устройство, время последнего использования]; порядок — от давно использованных
+        self._connections: Dict[str, list] = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._connections
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def get(self, key: str) -> Optional[AdbDeviceTcp]:
+        """Соединение из пула или None, если его нет или оно больше не работает"""
+        with self._lock:
+            self._evict_idle()
+            entry = self._connections.pop(key, None)
+        if entry is None:
+            return None
+        device, last_used = entry
+        if not self._is_alive(device, time.time() - last_used):
+            self.logger.info(f"Pooled ADB connection to {key} is dead, dropping it")
+            with self._lock:
+                if self.pinned == key:
+                    self.pinned = None
+            self._close(key, device)
+            return None
+        with self._lock:
+            self._connections[key] = [device, time.time()]
+        self.logger.debug(f"Reusing pooled ADB connection to {key}")
+        return device
+
+    def put(self, key: str, device: AdbDeviceTcp) -> None:
+        """Добавляет соединение (заменяя прежнее соединение с тем же устройством)"""
+        with self._lock:
+            previous = self._connections.pop(key, None)
+            self._connections[key] = [device, time.time()]
+            self._evict_idle()
+            # Переполнение: закрываются давно использованные, кроме только что добавленного
+            for old_key in list(self._connections):
+                if len(self._connections) <= self.max_size:
+                    break
+                if old_key not in (key, self.pinned):
+                    self._close(old_key, self._connections.pop(old_key)[0])
+        if previous and previous[0] is not device:
+            self._close(key, previous[0])
+
+    def discard(self, key: str) -> None:
+        """Закрывает и удаляет соединение (например, после ошибки команды)"""
+        with self._lock:
+            entry = self._connections.pop(key, None)
+            if self.pinned == key:
+                self.pinned = None
+        if entry:
+            self._close(key, entry[0])
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, {}
+            self.pinned = None
+        for key, (device, _last_used) in connections.items():
+            self._close(key, device)
+
+    def _evict_idle(self) -> None:
+        cutoff = time.time() - self.idle_timeout
+        for key, (device, last_used) in list(self._connections.items()):
+            if last_used < cutoff and key != self.pinned:
+                del self._connections[key]
+                self.logger.info(f"Closing ADB connection to {key} after {self.idle_timeout:.0f} s idle")
+                self._close(key, device)
+
+    def _is_alive(self, device: AdbDeviceTcp, idle: float) -> bool:
+        """Дешёвая проверка: флаг транспорта всегда, команда echo — только после простоя"""
+        if not device.available:
+            return False
+        if idle < self.liveness_interval:
+            return True
+        try:
+            return device.shell('echo ok', transport_timeout_s=3, read_timeout_s=3).strip() == 'ok'
+        except Exception:
+            return False
+
+    def _close(self, key: str, device: AdbDeviceTcp) -> None:
+        try:
+            device.close()
+        except Exception as e:
+            self.logger.debug(f"Error closing ADB connection to {key}: {e}")
+
+
 class AndroidTVTimeFixerError(Exception):
     """Базовый класс исключений для AndroidTVTimeFixer"""
     pass
 
+# ──────────────────────────────────────────────────────────
+# SNTP client (RFC 4330)
+# ──────────────────────────────────────────────────────────
+
+NTP_PORT = 123
+# Секунды между эпохой NTP (1900-01-01) и эпохой Unix (1970-01-01)
+NTP_EPOCH_DELTA = 2208988800
+# LI/VN/Mode, stratum, poll, precision, root delay, root dispersion, ref id, 4 временные метки
+_NTP_PACKET = struct.Struct('!BBbbII4sQQQQ')
+# Linux: отметка времени получения датаграммы ядром (struct timespec в управляющем сообщении)
+_SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+_TIMESPEC = struct.Struct('@ll')
+
+
+class SNTPError(Exception):
+    """Ошибка протокола SNTP (некорректный или неожиданный ответ)"""
+    pass
+
+
+def split_ntp_target(server: str) -> Tuple[str, int]:
+    """Разбирает адрес сервера: 'host', 'host:port', '[v6]:port' или голый IPv6 → (host, port).
+    Нестандартный порт нужен, например, для локальной фермы scripts/ntp_simulator.py."""
+    server = server.strip()
+    if server.startswith('['):
+        host, _, rest = server[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else ''
+    elif server.count(':') == 1:
+        host, _, port = server.partition(':')
+    else:
+        host, port = server, ''
+    return host, int(port) if port.isdigit() else NTP_PORT
+
+
+def format_ntp_target(host: str, port: int = NTP_PORT) -> str:
+    """Обратное к split_ntp_target: порт 123 не указывается"""
+    if port == NTP_PORT:
+        return host
+    return f"[{host}]:{port}" if ':' in host else f"{host}:{port}"
+
+
+@dataclass
+class SNTPResponse:
+    """Разобранный ответ NTP-сервера. Временные метки — в секундах Unix."""
+    leap: int
+    version: int
+    mode: int
+    stratum: int
+    poll: int
+    precision: int
+    root_delay: float
+    root_dispersion: float
+    ref_id: bytes
+    ref_time: float
+    orig_time: float
+    recv_time: float
+    tx_time: float
+
+
+def _ntp_to_unix(value: int) -> float:
+    return value / 2 ** 32 - NTP_EPOCH_DELTA
+
+
+def _unix_to_ntp(timestamp: float) -> int:
+    return int((timestamp + NTP_EPOCH_DELTA) * 2 ** 32) & 0xFFFFFFFFFFFFFFFF
+
+
+def encode_sntp_request(transmit: int, version: int = 3) -> bytes:
+    """Собирает клиентский запрос (mode 3). transmit — сырая 64-битная метка,
+    которую сервер вернёт в поле origin: по ней ответ сопоставляется с запросом."""
+    return _NTP_PACKET.pack((version << 3) | 3, 0, 0, 0, 0, 0, b'\0' * 4, 0, 0, 0, transmit)
+
+
+def decode_sntp_packet(data: bytes) -> SNTPResponse:
+    """Разбирает ответ сервера, SNTPError если пакет не является ответом NTP-сервера."""
+    if len(data) < _NTP_PACKET.size:
+        raise SNTPError(f"short packet ({len(data)} bytes)")
+    (first, stratum, poll, precision, root_delay, root_dispersion, ref_id,
+     ref_time, orig_time, recv_time, tx_time) = _NTP_PACKET.unpack_from(data)
+    mode = first & 0x7
+    if mode not in (4, 5):
+        raise SNTPError(f"unexpected mode {mode}")
+    if not tx_time:
+        raise SNTPError("empty transmit timestamp")
+    return SNTPResponse(
+        leap=first >> 6,
+        version=(first >> 3) & 0x7,
+        mode=mode,
+        stratum=stratum,
+        poll=poll,
+        precision=precision,
+        root_delay=root_delay / 2 ** 16,
+        root_dispersion=root_dispersion / 2 ** 16,
+        ref_id=ref_id,
+        ref_time=_ntp_to_unix(ref_time) if ref_time else 0.0,
+        orig_time=_ntp_to_unix(orig_time),
+        recv_time=_ntp_to_unix(recv_time),
+        tx_time=_ntp_to_unix(tx_time),
+    )
+
+
+def ntp_delay_offset(response: SNTPResponse, t1: float, t4: float) -> Tuple[float, float]:
+    """Задержка и смещение по четырём меткам NTP (RFC 5905):
+    delay = (T4 - T1) - (T3 - T2), offset = ((T2 - T1) + (T3 - T4)) / 2.
+    Время обработки запроса сервером (T3 - T2) в задержку не входит. Результат в секундах."""
+    delay = (t4 - t1) - (response.tx_time - response.recv_time)
+    offset = ((response.recv_time - t1) + (response.tx_time - t4)) / 2
+    return max(0.0, delay), offset
+
+
+@dataclass
+class TimeConsensus:
+    """Оценка точного времени по согласованным ответам нескольких серверов.
+    Смещения — относительно часов ПК в момент измерения, в секундах."""
+    offset: float
+    low: float
+    high: float
+    agreeing: int
+    total: int
+    servers: List[str]
+    measured_at: float
+
+
+def marzullo_intersection(intervals: List[Tuple[float, float]]) -> Tuple[int, float, float]:
+    """Алгоритм Марзулло: наибольшее число интервалов [low, high], имеющих общую точку,
+    и границы их пересечения. Возвращает (число интервалов, low, high)."""
+    # При равных значениях начало интервала идёт раньше конца: касающиеся интервалы пересекаются
+    edges = sorted([(low, -1) for low, _high in intervals] + [(high, 1) for _low, high in intervals])
+    best = 0
+    best_low = best_high = 0.0
+    overlapping = 0
+    for index, (value, kind) in enumerate(edges):
+        overlapping -= kind
+        if overlapping > best:
+            best = overlapping
+            best_low = value
+            best_high = edges[index + 1][0]
+    return best, best_low, best_high
+
+
+def build_time_consensus(results: List[dict], min_sources: int = 3) -> Optional[TimeConsensus]:
+    """Консенсус по результатам проверки серверов: интервал правильности каждого сервера —
+    offset ± корневое расстояние; точное время — середина пересечения интервалов большинства.
+    Серверы с одним и тем же адресом учитываются один раз. None, если независимых
+    источников меньше min_sources или большинство не согласовано."""
+    sources: Dict[str, dict] = {}
+    for result in results:
+        if (result['status'] == 'Reachable' and result.get('offset') is not None
+                and result.get('root_distance') is not None):
+            sources.setdefault(result.get('address') or result['server'], result)
+    if len(sources) < min_sources:
+        return None
+
+    measured = list(sources.values())
+    intervals = [(r['offset'] - r['root_distance'] / 1000, r['offset'] + r['root_distance'] / 1000)
+                 for r in measured]
+    agreeing, low, high = marzullo_intersection(intervals)
+    if agreeing * 2 <= len(intervals):
+        return None
+    now = time.time()
+    return TimeConsensus(
+        offset=(low + high) / 2,
+        low=low,
+        high=high,
+        agreeing=agreeing,
+        total=len(intervals),
+        servers=[r['server'] for r, (lo, hi) in zip(measured, intervals) if lo <= high and hi >= low],
+        measured_at=min(r.get('checked_at', now) for r in measured),
+    )
+
+
+def format_ref_id(ref_id: bytes, stratum: int) -> str:
+    """Reference ID: код источника (GPS, PPS) для stratum 0-1, IPv4 вышестоящего сервера
+    для stratum 2+ (для IPv6-источников это хэш адреса — выводится как hex)."""
+    if stratum <= 1:
+        return ref_id.rstrip(b'\0').decode('ascii', errors='replace')
+    if ref_id[0] in (0, 127) or ref_id[0] >= 224:
+        return ref_id.hex()
+    return '.'.join(str(b) for b in ref_id)
+
+
+def write_file_atomic(path: Path, text: str) -> None:
+    """Записывает файл через временный файл рядом и os.replace: читатель и параллельная запись
+    из другого потока видят либо старое, либо новое содержимое целиком, но не обрезанное"""
+    fd, tmp_name = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+# Kiss-o'-Death коды (RFC 5905, 7.4), при которых сервер просит прекратить или замедлить запросы
+KOD_RATE = 'RATE'
+KOD_CODES = ('RATE', 'DENY', 'RSTR')
+# Код паузы адреса, подряд не ответившего на несколько запросов (не KoD — сервер молчит)
+BACKOFF_TIMEOUT = 'TIMEOUT'
+
+
+class NTPPacer:
+    """
+    Вежливый темп SNTP-запросов: общий token bucket на все запросы (rate в секунду,
+    burst подряд), минимальный интервал между запросами к одному адресу и экспоненциальная
+    пауза для адресов, приславших Kiss-o'-Death или timeout_limit раз подряд не ответивших.
+    Паузы сохраняются между запусками, чтобы повторные запуски из одной сети не продолжали
+    нагружать ограничивший нас сервер.
+
+    Интервал к адресу общий для всех проверок процесса: глубокая проверка финалистов ждёт
+    min_interval после запроса быстрого прохода. ntpd по умолчанию (discard minimum)
+    отвечает KoD RATE на запросы одного клиента чаще раза в 2 с; запас сверху покрывает
+    разброс задержки сети между соседними запросами.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, rate: float = 50.0, burst: int = 20,
+                 min_interval: float = 2.5, base_backoff: float = 64.0, max_backoff: float = 86400.0,
+                 timeout_limit: int = 3):
+        self.cache_file = cache_file
+        self.rate = rate
+        self.burst = burst
+        self.min_interval = min_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout_limit = timeout_limit
+        self.logger = logging.getLogger(__name__)
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        # Время (monotonic), раньше которого адрес не опрашивается; запрос бронирует его заранее
+        self._last_sent: Dict[str, float] = {}
+        self._backoff: Dict[str, dict] = {}
+        # Серии таймаутов подряд: адрес -> (число, время последнего по monotonic)
+        self._timeouts: Dict[str, Tuple[int, float]] = {}
+        # Размер _last_sent, после которого из него удаляются устаревшие записи
+        self._prune_at = 1024
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            now = time.time()
+            self._backoff = {
+                address: entry for address, entry in data.get('backoff', {}).items()
+                if entry.get('until', 0) > now
+            }
+        except Exception as e:
+            self.logger.warning(f"Could not load NTP backoff state: {e}")
+
+    def _take_token(self) -> float:
+        """Забирает токен; возвращает 0 или сколько секунд ждать до следующего"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire(self, address: str) -> None:
+        """Ждёт, пока запрос к address можно отправить, не нарушая темп.
+        Очередь к адресу бронируется сразу, поэтому одновременные запросы к нему
+        (из разных потоков или проверок) тоже расходятся на min_interval."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._last_sent.get(address, float('-inf')) + self.min_interval)
+            self._last_sent[address] = slot
+            if len(self._last_sent) >= self._prune_at:
+                self._prune()
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        while True:
+            wait = self._take_token()
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        with self._lock:
+            self._last_sent[address] = max(self._last_sent.get(address, 0.0), time.monotonic())
+
+    def _prune(self) -> None:
+        """Удаляет отметки отправки старше min_interval (они больше не задерживают запросы),
+        истёкшие паузы и давние серии таймаутов: память не растёт при долгом мониторинге.
+        Вызывается под _lock; порог удваивается от оставшегося размера, поэтому в среднем
+        очистка дешёвая."""
+        monotonic = time.monotonic()
+        cutoff = monotonic - self.min_interval
+        self._last_sent = {address: sent for address, sent in self._last_sent.items() if sent > cutoff}
+        self._timeouts = {address: streak for address, streak in self._timeouts.items()
+                          if streak[1] > monotonic - self.max_backoff}
+        now = time.time()
+        self._backoff = {address: e for address, e in self._backoff.items() if e['until'] > now}
+        self._prune_at = max(1024, 2 * len(self._last_sent))
+
+    def blocked(self, address: str) -> Optional[dict]:
+        """Действующая пауза адреса ({'code', 'until', 'interval'}) или None"""
+        with self._lock:
+            entry = self._backoff.get(address)
+        if entry and entry['until'] > time.time():
+            return dict(entry)
+        return None
+
+    def kiss(self, address: str, code: str) -> dict:
+        """Учитывает Kiss-o'-Death: RATE удваивает паузу адреса, DENY/RSTR — сразу максимальная"""
+        with self._lock:
+            return self._pause(address, code)
+
+    def _pause(self, address: str, code: str) -> dict:
+        """Ставит адрес на паузу (под _lock): повтор того же кода удваивает прошлую паузу"""
+        previous = self._backoff.get(address)
+        if code not in (KOD_RATE, BACKOFF_TIMEOUT):
+            interval = self.max_backoff
+        elif previous and previous['code'] == code:
+            interval = min(self.max_backoff, previous['interval'] * 2)
+        else:
+            interval = self.base_backoff
+        entry = self._backoff[address] = {'code': code, 'until': time.time() + interval, 'interval': interval}
+        return dict(entry)
+
+    def timed_out(self, address: str) -> Optional[dict]:
+        """Учитывает запрос без ответа. После timeout_limit таймаутов подряд адрес ставится
+        на паузу, как при KoD RATE; возвращает её ({'code', 'until', 'interval'}) или None"""
+        with self._lock:
+            streak = self._timeouts.get(address, (0, 0.0))[0] + 1
+            if streak < self.timeout_limit:
+                self._timeouts[address] = (streak, time.monotonic())
+                return None
+            self._timeouts.pop(address, None)
+            return self._pause(address, BACKOFF_TIMEOUT)
+
+    def clear(self, address: str) -> None:
+        """Обычный ответ сервера снимает накопленную паузу и серию таймаутов"""
+        with self._lock:
+            self._backoff.pop(address, None)
+            self._timeouts.pop(address, None)
+
+    def save(self) -> None:
+        if not self.cache_file:
+            return
+        with self._lock:
+            self._prune()
+            snapshot = json.dumps({'version': 1, 'backoff': self._backoff})
+        try:
+            write_file_atomic(self.cache_file, snapshot)
+        except Exception as e:
+            self.logger.warning(f"Could not save NTP backoff state: {e}")
+
+
+class _SNTPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client: 'AsyncSNTPClient'):
+        self.client = client
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        self.client._on_datagram(data, addr, time.perf_counter_ns())
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP-ошибки на несвязанном сокете не привязаны к конкретному запросу —
+        # такие запросы просто завершатся по таймауту
+        pass
+
+
+class AsyncSNTPClient:
+    """
+    Асинхронный SNTP-клиент: все запросы уходят через один UDP-сокет на семейство
+    адресов, ответы сопоставляются с запросами по origin timestamp.
+    Позволяет опрашивать весь каталог серверов параллельно из одного потока.
+
+    Интервал между отправкой и получением измеряется по perf_counter_ns (не зависит от
+    перевода системных часов). На Linux момент получения берётся из отметки ядра
+    (SO_TIMESTAMPNS), поэтому задержка в очереди событийного цикла в RTT не попадает.
+    Если передан pacer, каждый запрос ждёт своей очереди по его темпу.
+    """
+
+    def __init__(self, version: int = 3, kernel_timestamps: bool = True, pacer: Optional[NTPPacer] = None):
+        self.version = version
+        self.pacer = pacer
+        self.packets_sent = 0
+        self.kernel_timestamps = kernel_timestamps and sys.platform.startswith('linux')
+        self._transports: Dict[int, asyncio.DatagramTransport] = {}
+        self._sockets: Dict[int, socket.socket] = {}
+        self._pending: Dict[int, Tuple[asyncio.Future, tuple]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = 0
+        # Ожидание темпа по адресам (host:port): завершённое суммарно (с) и текущее (начало, perf_counter)
+        self._paced: Dict[str, float] = {}
+        self._pacing: Dict[str, float] = {}
+
+    async def _open(self, family: int) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if family in self._sockets or family in self._transports:
+                return
+            self._loop = asyncio.get_running_loop()
+            local_addr = ('::', 0) if family == socket.AF_INET6 else ('0.0.0.0', 0)
+            if self.kernel_timestamps:
+                try:
+                    self._sockets[family] = self._open_timestamped_socket(family, local_addr)
+                    return
+                except (OSError, NotImplementedError):
+                    # Нет поддержки SO_TIMESTAMPNS или add_reader — обычный датаграммный endpoint
+                    self.kernel_timestamps = False
+            transport, _protocol = await self._loop.create_datagram_endpoint(
+                lambda: _SNTPProtocol(self), local_addr=local_addr, family=family
+            )
+            self._transports[family] = transport
+
+    def _open_timestamped_socket(self, family: int, local_addr: tuple) -> socket.socket:
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, _SO_TIMESTAMPNS, 1)
+            sock.setblocking(False)
+            sock.bind(local_addr)
+            self._loop.add_reader(sock.fileno(), self._on_readable, sock)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def _on_readable(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                data, ancdata, _flags, addr = sock.recvmsg(512, socket.CMSG_SPACE(_TIMESPEC.size))
+            except OSError:
+                # BlockingIOError — очередь сокета пуста
+                return
+            received_ns = time.perf_counter_ns()
+            for level, kind, cdata in ancdata:
+                if level == socket.SOL_SOCKET and kind == _SO_TIMESTAMPNS and len(cdata) >= _TIMESPEC.size:
+                    sec, nsec = _TIMESPEC.unpack_from(cdata)
+                    # Отметка ядра — по CLOCK_REALTIME: сдвигаем показание perf_counter
+                    # назад на время, которое датаграмма пролежала в очереди сокета
+                    queued_ns = time.time_ns() - (sec * 1_000_000_000 + nsec)
+                    if 0 <= queued_ns < 1_000_000_000:
+                        received_ns -= queued_ns
+            self._on_datagram(data, addr, received_ns)
+
+    def pace_wait(self, target: str) -> float:
+        """Сколько секунд запросы к target (host:port) провели в ожидании темпа, включая текущее"""
+        started = self._pacing.get(target)
+        current = time.perf_counter() - started if started is not None else 0.0
+        return self._paced.get(target, 0.0) + current
+
+    def _next_token(self, timestamp: float) -> int:
+        # Младшие 16 бит дробной части (~15 мкс) заменяются счётчиком,
+        # чтобы метки одновременных запросов гарантированно различались
+        while True:
+            self._seq = (self._seq + 1) & 0xFFFF
+            token = (_unix_to_ntp(timestamp) & ~0xFFFF) | self._seq
+            if token not in self._pending:
+                return token
+
+    async def query(self, family: int, sockaddr: tuple, timeout: float,
+                    metrics: Optional['ProbeMetrics'] = None) -> Tuple[SNTPResponse, float, float]:
+        """Отправляет один запрос. Возвращает (ответ, t1 отправки, t4 получения) в секундах Unix;
+        t4 отсчитывается от t1 по монотонным часам. В metrics (если передан) пишутся
+        ожидание темпа, время до отправки и время ожидания ответа.
+        Raises: asyncio.TimeoutError, SNTPError, OSError"""
+        called_ns = time.perf_counter_ns()
+        if self.pacer is not None:
+            target = format_ntp_target(*sockaddr[:2])
+            self._pacing[target] = called_ns / 1e9
+            try:
+                await self.pacer.acquire(target)
+            finally:
+                self._pacing.pop(target, None)
+            paced_ns = time.perf_counter_ns()
+            self._paced[target] = self._paced.get(target, 0.0) + (paced_ns - called_ns) / 1e9
+            if metrics is not None:
+                metrics.observe('pace', (paced_ns - called_ns) / 1e6)
+            called_ns = paced_ns
+        await self._open(family)
+        future = asyncio.get_running_loop().create_future()
+        t1 = time.time()
+        token = self._next_token(t1)
+        self._pending[token] = (future, sockaddr)
+        packet = encode_sntp_request(token, self.version)
+        try:
+            sock = self._sockets.get(family)
+            sent_ns = time.perf_counter_ns()
+            if sock is not None:
+                try:
+                    sock.sendto(packet, sockaddr)
+                except BlockingIOError:
+                    await self._loop.sock_sendto(sock, packet, sockaddr)
+                    sent_ns = time.perf_counter_ns()
+            else:
+                self._transports[family].sendto(packet, sockaddr)
+            self.packets_sent += 1
+            if metrics is not None:
+                metrics.incr('queries')
+                metrics.observe('send', (time.perf_counter_ns() - called_ns) / 1e6)
+            response, received_ns = await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(token, None)
+        if metrics is not None:
+            metrics.incr('replies')
+            metrics.observe('reply', (received_ns - sent_ns) / 1e6)
+        return response, t1, t1 + (received_ns - sent_ns) / 1e9
+
+    def _on_datagram(self, data: bytes, addr: tuple, received_ns: int) -> None:
+        if len(data) < _NTP_PACKET.size:
+            return
+        entry = self._pending.get(int.from_bytes(data[24:32], 'big'))
+        if entry is None:
+            return
+        future, expected = entry
+        # Ответ принимается только от адреса и порта, которым был отправлен запрос
+        if (future.done() or addr[1] != expected[1]
+                or addr[0].partition('%')[0] != expected[0].partition('%')[0]):
+            return
+        try:
+            future.set_result((decode_sntp_packet(data), received_ns))
+        except SNTPError as e:
+            future.set_exception(e)
+
+    def close(self) -> None:
+        for transport in self._transports.values():
+            transport.close()
+        self._transports.clear()
+        for sock in self._sockets.values():
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.remove_reader(sock.fileno())
+            sock.close()
+        self._sockets.clear()
+
+
+class SharedAddressProbe:
+    """
+    Проверка одного адреса (IP, порт), общая для всех имён, которые в него разрешились
+    в рамках одного запуска: региональные и страновые пулы пересекаются, а anycast-имена
+    разных производителей могут совпадать. Каждый адрес опрашивается один раз,
+    результат получают все имена. Проверка отменяется, только когда её перестали ждать все.
+    """
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+    async def wait(self) -> dict:
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        except asyncio.CancelledError:
+            if self.waiters == 1 and not self.task.done():
+                self.task.cancel()
+            raise
+        finally:
+            self.waiters -= 1
+
+
+# ──────────────────────────────────────────────────────────
+# DNS resolver cache for NTP hostnames
+# ──────────────────────────────────────────────────────────
+
+@dataclass
+class ResolvedHost:
+    """Результат разрешения имени: адреса [(family, ip)] или ошибка"""
+    host: str
+    addresses: List[Tuple[int, str]]
+    error: Optional[str]
+    expires: float
+    dns_ms: float = 0.0
+    cached: bool = False
+    literal: bool = False
+
+
+class NTPResolver:
+    """
+    Кэш разрешения имён NTP-серверов в памяти и на диске.
+    Успешные ответы живут ttl секунд, ошибки (NXDOMAIN, таймаут DNS) — negative_ttl,
+    чтобы заблокированные имена не тормозили каждую проверку.
+    getaddrinfo не сообщает TTL записей, поэтому сроки задаются фиксированно.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, ttl: float = 300, negative_ttl: float = 60,
+                 max_workers: int = 64):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+        self._entries: Dict[str, ResolvedHost] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            now = time.time()
+            for host, entry in data.get('entries', {}).items():
+                if entry.get('expires', 0) <= now:
+                    continue
+                self._entries[host] = ResolvedHost(
+                    host=host,
+                    addresses=[(int(family), ip) for family, ip in entry.get('addresses', [])],
+                    error=entry.get('error'),
+                    expires=entry['expires'],
+                )
+        except Exception as e:
+            self.logger.warning(f"Could not load DNS cache: {e}")
+
+    def save(self) -> None:
+        """Сохраняет непросроченные записи на диск (только если были изменения)"""
+        if not self.cache_file or not self._dirty:
+            return
+        now = time.time()
+        with self._lock:
+            entries = {
+                host: {'addresses': entry.addresses, 'error': entry.error, 'expires': entry.expires}
+                for host, entry in self._entries.items() if entry.expires > now
+            }
+            snapshot = json.dumps({'version': 1, 'entries': entries})
+            self._dirty = False
+        try:
+            write_file_atomic(self.cache_file, snapshot)
+        except Exception as e:
+            self.logger.warning(f"Could not save DNS cache: {e}")
+
+    @staticmethod
+    def _literal_address(host: str) -> Optional[Tuple[int, str]]:
+        try:
+            parsed = ipaddress.ip_address(host.partition('%')[0])
+        except ValueError:
+            return None
+        return (socket.AF_INET6 if parsed.version == 6 else socket.AF_INET), host
+
+    def resolve(self, host: str) -> ResolvedHost:
+        """Разрешает имя с учётом кэша. Потокобезопасно."""
+        literal = self._literal_address(host)
+        if literal:
+            return ResolvedHost(host=host, addresses=[literal], error=None, expires=float('inf'),
+                                cached=True, literal=True)
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry and entry.expires > now:
+            return ResolvedHost(host=host, addresses=entry.addresses, error=entry.error,
+                                expires=entry.expires, cached=True)
+
+        started = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, NTP_PORT, type=socket.SOCK_DGRAM)
+            addresses = list(dict.fromkeys(
+                (family, sockaddr[0]) for family, _type, _proto, _name, sockaddr in infos
+                if family in (socket.AF_INET, socket.AF_INET6)
+            ))
+            error = None if addresses else "DNS Resolution Error"
+        except (socket.gaierror, UnicodeError):
+            addresses, error = [], "DNS Resolution Error"
+        dns_ms = (time.perf_counter() - started) * 1000
+
+        entry = ResolvedHost(
+            host=host,
+            addresses=addresses,
+            error=error,
+            expires=time.time() + (self.negative_ttl if error else self.ttl),
+            dns_ms=dns_ms,
+        )
+        with self._lock:
+            self._entries[host] = entry
+            self._dirty = True
+        return entry
+
+    def resolve_many(self, hosts: List[str]) -> Dict[str, ResolvedHost]:
+        """Параллельно разрешает список имён (кэшированные возвращаются сразу)"""
+        unique = list(dict.fromkeys(hosts))
+        if not unique:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique))) as executor:
+            return dict(zip(unique, executor.map(self.resolve, unique)))
+
+
+# ──────────────────────────────────────────────────────────
+# NTP probe result cache
+# ──────────────────────────────────────────────────────────
+
+class NTPProbeCache:
+    """
+    Кэш результатов проверки NTP-серверов в памяти и на диске, ключ — (локальная сеть, сервер).
+    Результат моложе ttl считается свежим; более старый отдаётся сразу, но вызывающий код
+    должен обновить его в фоне (stale-while-revalidate). Записи старше max_age удаляются.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, ttl: float = 600, max_age: float = 86400):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_age = max_age
+        self.logger = logging.getLogger(__name__)
+        self._networks: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            self._networks = data.get('networks', {})
+        except Exception as e:
+            self.logger.warning(f"Could not load NTP probe cache: {e}")
+
+    def get(self, network_key: str, server: str) -> Tuple[Optional[dict], bool]:
+        """Возвращает (результат или None, свежий ли он)"""
+        with self._lock:
+            result = self._networks.get(network_key, {}).get(server)
+        if not result:
+            return None, False
+        age = time.time() - result.get('checked_at', 0)
+        if age > self.max_age:
+            return None, False
+        return dict(result), age <= self.ttl
+
+    def fresh_results(self, network_key: str) -> List[dict]:
+        """Все свежие (моложе ttl) результаты сети"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            return [dict(r) for r in self._networks.get(network_key, {}).values() if r.get('checked_at', 0) > cutoff]
+
+    def put(self, network_key: str, result: dict) -> None:
+        entry = dict(result)
+        entry.setdefault('checked_at', time.time())
+        with self._lock:
+            self._networks.setdefault(network_key, {})[result['server']] = entry
+
+    def save(self) -> None:
+        if not self.cache_file:
+            return
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            networks = {
+                key: {server: r for server, r in servers.items() if r.get('checked_at', 0) > cutoff}
+                for key, servers in self._networks.items()
+            }
+            self._networks = {key: servers for key, servers in networks.items() if servers}
+            snapshot = json.dumps({'version': 1, 'networks': self._networks})
+        try:
+            write_file_atomic(self.cache_file, snapshot)
+        except Exception as e:
+            self.logger.warning(f"Could not save NTP probe cache: {e}")
+
+
+class NTPHistoryStore:
+    """
+    История проверок NTP-серверов в SQLite, ключ — (локальная сеть, сервер).
+    Таблица probes хранит последние history_size исходов каждого сервера (для трендов),
+    server_stats — сводку: число проверок и успехов, длину текущей серии неудач.
+    """
+
+    def __init__(self, db_file: Optional[Path] = None, history_size: int = 20,
+                 max_failures: int = 3, recheck_interval: float = 86400):
+        self.db_file = db_file
+        self.history_size = history_size
+        # Сервер, не ответивший max_failures раз подряд, пропускается до перепроверки
+        self.max_failures = max_failures
+        self.recheck_interval = recheck_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_file), timeout=5)
+
+    def _init_db(self) -> None:
+        if not self.db_file:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS probes (
+                        network TEXT NOT NULL,
+                        server TEXT NOT NULL,
+                        checked_at REAL NOT NULL,
+                        ok INTEGER NOT NULL,
+                        avg_rtt REAL,
+                        score REAL
+                    );
+                    CREATE INDEX IF NOT EXISTS probes_by_server ON probes (network, server, checked_at);
+                    CREATE TABLE IF NOT EXISTS hourly (
+                        network TEXT NOT NULL,
+                        server TEXT NOT NULL,
+                        hour INTEGER NOT NULL,
+                        samples INTEGER NOT NULL,
+                        lost INTEGER NOT NULL,
+                        rtt_sum REAL NOT NULL,
+                        PRIMARY KEY (network, server, hour)
+                    );
+                    CREATE TABLE IF NOT EXISTS server_stats (
+                        network TEXT NOT NULL,
+                        server TEXT NOT NULL,
+                        runs INTEGER NOT NULL DEFAULT 0,
+                        successes INTEGER NOT NULL DEFAULT 0,
+                        fail_streak INTEGER NOT NULL DEFAULT 0,
+                        last_checked REAL,
+                        last_success REAL,
+                        PRIMARY KEY (network, server)
+                    );
+                """)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not open NTP history store: {e}")
+            self.db_file = None
+
+    def record(self, network_key: str, results: List[dict], checked_at: Optional[float] = None) -> None:
+        """Сохраняет исходы проверок одной транзакцией"""
+        if not self.db_file or not results:
+            return
+        checked_at = checked_at or time.time()
+        rows = [
+            (network_key, r['server'], checked_at, int(r['status'] == 'Reachable'), r['avg_rtt'], r.get('score'))
+            for r in results
+        ]
+        try:
+            with self._lock, closing(self._connect()) as conn, conn:
+                conn.executemany("INSERT INTO probes VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.executemany("""
+                    INSERT INTO server_stats (network, server, runs, successes, fail_streak, last_checked, last_success)
+                    VALUES (?1, ?2, 1, ?4, 1 - ?4, ?3, CASE WHEN ?4 THEN ?3 END)
+                    ON CONFLICT (network, server) DO UPDATE SET
+                        runs = runs + 1,
+                        successes = successes + ?4,
+                        fail_streak = CASE WHEN ?4 THEN 0 ELSE fail_streak + 1 END,
+                        last_checked = ?3,
+                        last_success = CASE WHEN ?4 THEN ?3 ELSE last_success END
+                """, [row[:4] for row in rows])
+                # Храним только последние history_size исходов каждого сервера этой сети
+                conn.execute("""
+                    DELETE FROM probes WHERE network = ? AND rowid NOT IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, ROW_NUMBER() OVER (PARTITION BY server ORDER BY checked_at DESC) AS n
+                            FROM probes WHERE network = ?
+                        ) WHERE n <= ?
+                    )
+                """, (network_key, network_key, self.history_size))
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not save NTP history: {e}")
+
+    def stats(self, network_key: str) -> Dict[str, dict]:
+        """Сводка по серверам сети: runs, successes, fail_streak, last_checked и
+        rtts — RTT успешных проверок, от новых к старым"""
+        if not self.db_file:
+            return {}
+        try:
+            with self._lock, closing(self._connect()) as conn:
+                stats = {
+                    server: {'runs': runs, 'successes': successes, 'fail_streak': fail_streak,
+                             'last_checked': last_checked, 'rtts': []}
+                    for server, runs, successes, fail_streak, last_checked in conn.execute(
+                        "SELECT server, runs, successes, fail_streak, last_checked "
+                        "FROM server_stats WHERE network = ?", (network_key,)
+                    )
+                }
+                for server, avg_rtt in conn.execute(
+                    "SELECT server, avg_rtt FROM probes WHERE network = ? AND ok = 1 "
+                    "ORDER BY checked_at DESC", (network_key,)
+                ):
+                    if server in stats:
+                        stats[server]['rtts'].append(avg_rtt)
+                return stats
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not read NTP history: {e}")
+            return {}
+
+    def add_hourly(self, network_key: str, rows: List[Tuple[str, int, int, int, float]]) -> None:
+        """Прибавляет к почасовой статистике строки (server, hour, samples, lost, rtt_sum)"""
+        if not self.db_file or not rows:
+            return
+        try:
+            with self._lock, closing(self._connect()) as conn, conn:
+                conn.executemany("""
+                    INSERT INTO hourly VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (network, server, hour) DO UPDATE SET
+                        samples = samples + excluded.samples,
+                        lost = lost + excluded.lost,
+                        rtt_sum = rtt_sum + excluded.rtt_sum
+                """, [(network_key,) + tuple(row) for row in rows])
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not save hourly NTP statistics: {e}")
+
+    def hourly(self, network_key: str) -> Dict[str, Dict[int, Tuple[int, int, float]]]:
+        """Почасовая статистика сети: {server: {hour: (samples, lost, rtt_sum)}}"""
+        if not self.db_file:
+            return {}
+        try:
+            with self._lock, closing(self._connect()) as conn:
+                hourly: Dict[str, Dict[int, Tuple[int, int, float]]] = {}
+                for server, hour, samples, lost, rtt_sum in conn.execute(
+                    "SELECT server, hour, samples, lost, rtt_sum FROM hourly WHERE network = ?", (network_key,)
+                ):
+                    hourly.setdefault(server, {})[hour] = (samples, lost, rtt_sum)
+                return hourly
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not read hourly NTP statistics: {e}")
+            return {}
+
+    def plan(self, servers: List[str], stats: Dict[str, dict],
+             now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """Порядок проверки по истории: сначала серверы, отвечавшие раньше (по медиане RTT),
+        затем новые, затем давно не отвечающие, которым пора на перепроверку.
+        Возвращает (серверы для проверки, пропущенные серверы)."""
+        now = now or time.time()
+        ordered = []
+        skipped = []
+        for index, server in enumerate(servers):
+            entry = stats.get(server)
+            if entry is None:
+                ordered.append(((1, 0.0, index), server))
+            elif entry['fail_streak'] >= self.max_failures:
+                if now - (entry['last_checked'] or 0) < self.recheck_interval:
+                    skipped.append(server)
+                else:
+                    ordered.append(((2, 0.0, index), server))
+            elif entry['rtts']:
+                ordered.append(((0, statistics.median(entry['rtts']), index), server))
+            else:
+                ordered.append(((1, 0.0, index), server))
+        ordered.sort()
+        return [server for _key, server in ordered], skipped
+
+
+# ──────────────────────────────────────────────────────────
+# Per-network NTP recommendation profiles
+# ──────────────────────────────────────────────────────────
+
+class NTPNetworkProfiles:
+    """
+    Профили рекомендаций NTP-серверов по отпечатку сети (подсеть, интерфейс и MAC шлюза
+    основного маршрута): лучшие серверы последней полной проверки в этой сети, лучшие первыми.
+    Профиль старше max_age не используется; хранится не больше max_profiles последних сетей.
+    """
+
+    def __init__(self, profiles_file: Optional[Path] = None, size: int = 10,
+                 max_age: float = 30 * 86400, max_profiles: int = 50):
+        self.profiles_file = profiles_file
+        self.size = size
+        self.max_age = max_age
+        self.max_profiles = max_profiles
+        self.logger = logging.getLogger(__name__)
+        self._profiles: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.profiles_file or not self.profiles_file.exists():
+            return
+        try:
+            with open(self.profiles_file, 'r') as f:
+                data = json.load(f)
+            self._profiles = data.get('profiles', {})
+        except Exception as e:
+            self.logger.warning(f"Could not load NTP network profiles: {e}")
+
+    def get(self, fingerprint: dict) -> Optional[dict]:
+        """Профиль сети или None, если сеть неизвестна или профиль устарел"""
+        with self._lock:
+            profile = self._profiles.get(fingerprint['key'])
+        if not profile or not profile.get('servers'):
+            return None
+        if time.time() - profile.get('updated_at', 0) > self.max_age:
+            return None
+        return {**profile, 'servers': [dict(r) for r in profile['servers']]}
+
+    def put(self, fingerprint: dict, results: List[dict]) -> None:
+        """Сохраняет ранжированные результаты полной проверки как профиль сети"""
+        if not results:
+            return
+        servers = []
+        for result in results[:self.size]:
+            # Проверка с устройства относится к конкретному ТВ и повторяется при каждой настройке
+            entry = dict(result)
+            entry.pop('device', None)
+            servers.append(entry)
+        with self._lock:
+            previous = self._profiles.get(fingerprint['key'], {})
+            self._profiles[fingerprint['key']] = {
+                'fingerprint': fingerprint,
+                'updated_at': time.time(),
+                'uses': previous.get('uses', 0),
+                'servers': servers,
+            }
+
+    def touch(self, fingerprint: dict) -> None:
+        """Отмечает использование профиля (редко используемые вытесняются первыми)"""
+        with self._lock:
+            profile = self._profiles.get(fingerprint['key'])
+            if profile:
+                profile['uses'] = profile.get('uses', 0) + 1
+                profile['used_at'] = time.time()
+
+    def save(self) -> None:
+        if not self.profiles_file:
+            return
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            profiles = sorted(
+                ((key, profile) for key, profile in self._profiles.items() if profile.get('updated_at', 0) > cutoff),
+                key=lambda item: max(item[1].get('used_at', 0), item[1]['updated_at']),
+                reverse=True
+            )
+            self._profiles = dict(profiles[:self.max_profiles])
+            snapshot = json.dumps({'version': 1, 'profiles': self._profiles})
+        try:
+            write_file_atomic(self.profiles_file, snapshot)
+        except Exception as e:
+            self.logger.warning(f"Could not save NTP network profiles: {e}")
+
+
+# ──────────────────────────────────────────────────────────
+# NTP monitoring time series
+# ──────────────────────────────────────────────────────────
+
+class RingBuffer:
+    """Кольцевой буфер чисел фиксированного размера на array('d'): память не растёт со временем"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array('d', bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+
+    def append(self, value: float) -> None:
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def values(self) -> List[float]:
+        """Значения от старых к новым"""
+        if self._size < self.capacity:
+            return self._data[:self._size].tolist()
+        return (self._data[self._next:] + self._data[:self._next]).tolist()
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Процентиль (p от 0 до 100) с линейной интерполяцией между соседними значениями"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class NTPServerSeries:
+    """
+    Временной ряд мониторинга одного сервера: время, RTT (NaN — потеря) и смещение
+    в кольцевых буферах, плюс почасовые счётчики, накопленные с последней выгрузки в историю.
+    """
+
+    def __init__(self, capacity: int = 2880):
+        self.times = RingBuffer(capacity)
+        self.rtts = RingBuffer(capacity)
+        self.offsets = RingBuffer(capacity)
+        self.hourly_samples = array('L', [0] * 24)
+        self.hourly_lost = array('L', [0] * 24)
+        self.hourly_rtt_sum = array('d', [0.0] * 24)
+
+    def add(self, timestamp: float, rtt: Optional[float], offset: Optional[float]) -> None:
+        self.times.append(timestamp)
+        self.rtts.append(rtt if rtt is not None else math.nan)
+        self.offsets.append(offset if offset is not None else math.nan)
+        hour = datetime.datetime.fromtimestamp(timestamp).hour
+        self.hourly_samples[hour] += 1
+        if rtt is None:
+            self.hourly_lost[hour] += 1
+        else:
+            self.hourly_rtt_sum[hour] += rtt
+
+    def summary(self, window: Optional[float] = None, now: Optional[float] = None) -> dict:
+        """Сводка по всем сохранённым замерам или только за последние window секунд:
+        число замеров, потери (%), перцентили RTT (мс) и джиттер смещения (мс)"""
+        cutoff = (now or time.time()) - window if window else float('-inf')
+        rtts = []
+        offsets = []
+        samples = 0
+        for timestamp, rtt, offset in zip(self.times.values(), self.rtts.values(), self.offsets.values()):
+            if timestamp < cutoff:
+                continue
+            samples += 1
+            if not math.isnan(rtt):
+                rtts.append(rtt)
+            if not math.isnan(offset):
+                offsets.append(offset)
+        return {
+            'samples': samples,
+            'loss': (samples - len(rtts)) / samples * 100 if samples else None,
+            'p50': percentile(rtts, 50),
+            'p95': percentile(rtts, 95),
+            'p99': percentile(rtts, 99),
+            'jitter': statistics.pstdev(offsets) * 1000 if len(offsets) > 1 else None,
+        }
+
+    def drain_hourly(self) -> List[Tuple[int, int, int, float]]:
+        """Забирает накопленные почасовые счётчики [(hour, samples, lost, rtt_sum)] и обнуляет их"""
+        rows = [
+            (hour, self.hourly_samples[hour], self.hourly_lost[hour], self.hourly_rtt_sum[hour])
+            for hour in range(24) if self.hourly_samples[hour]
+        ]
+        for hour, _samples, _lost, _rtt_sum in rows:
+            self.hourly_samples[hour] = 0
+            self.hourly_lost[hour] = 0
+            self.hourly_rtt_sum[hour] = 0.0
+        return rows
+
+
+# ──────────────────────────────────────────────────────────
+# NTP probe metrics
+# ──────────────────────────────────────────────────────────
+
+class LatencyHistogram:
+    """
+    Лог-линейная гистограмма задержек (мс) в духе HdrHistogram: каждый интервал
+    [2^k, 2^(k+1)) * min_value делится на sub_buckets равных частей. Относительная
+    погрешность перцентилей не больше 1/sub_buckets, память — только на занятые корзины.
+    """
+
+    def __init__(self, min_value: float = 0.01, sub_buckets: int = 8):
+        self.min_value = min_value
+        self.sub_buckets = sub_buckets
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def _index(self, value: float) -> int:
+        if value < self.min_value:
+            return 0
+        exponent = int(math.log2(value / self.min_value))
+        base = self.min_value * 2 ** exponent
+        sub = min(self.sub_buckets - 1, int((value / base - 1) * self.sub_buckets))
+        return 1 + exponent * self.sub_buckets + sub
+
+    def _bounds(self, index: int) -> Tuple[float, float]:
+        if index == 0:
+            return 0.0, self.min_value
+        exponent, sub = divmod(index - 1, self.sub_buckets)
+        base = self.min_value * 2 ** exponent
+        return base * (1 + sub / self.sub_buckets), base * (1 + (sub + 1) / self.sub_buckets)
+
+    def record(self, value: float) -> None:
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Оценка процентиля: середина корзины, в которую он попадает (в пределах min..max)"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min(max((low + high) / 2, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': [[*self._bounds(index), self.counts[index]] for index in sorted(self.counts)],
+        }
+
+
+class ProbeMetrics:
+    """Счётчики и гистограммы проверки NTP: одного сервера или всего запуска.
+    dns — время разрешения имени, pace — ожидание разрешения темпа отправки,
+    send — от разрешения темпа до передачи датаграммы ядру (включая открытие сокета),
+    reply — от отправки до получения ответа. Сервер и его DNS учитываются один раз за запуск,
+    даже если он проверяется повторно (финалисты глубокой проверки); IP-адреса в DNS не входят."""
+
+    COUNTERS = ('servers', 'dns_lookups', 'dns_cached', 'dns_failures', 'queries', 'replies',
+                'timeouts', 'protocol_errors', 'socket_errors', 'unsynced', 'kod', 'backoff_skipped',
+                'shared_probes')
+    HISTOGRAMS = ('dns', 'pace', 'send', 'reply')
+
+    def __init__(self):
+        self.counters: Dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+        self.histograms: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in self.HISTOGRAMS}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def observe(self, name: str, milliseconds: float) -> None:
+        self.histograms[name].record(milliseconds)
+
+    def merge(self, other: 'ProbeMetrics') -> None:
+        for name, value in other.counters.items():
+            self.counters[name] += value
+        for name, histogram in other.histograms.items():
+            self.histograms[name].merge(histogram)
+
+    def to_dict(self) -> dict:
+        return {'counters': dict(self.counters),
+                'latency_ms': {name: h.to_dict() for name, h in self.histograms.items()}}
+
+
+class NTPProbeRun:
+    """Метрики одного запуска проверки (пункт меню): по каждому серверу и суммарно"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.servers: Dict[str, ProbeMetrics] = {}
+
+    def server(self, server: str) -> ProbeMetrics:
+        metrics = self.servers.get(server)
+        if metrics is None:
+            metrics = self.servers.setdefault(server, ProbeMetrics())
+        return metrics
+
+    def totals(self) -> ProbeMetrics:
+        totals = ProbeMetrics()
+        for metrics in list(self.servers.values()):
+            totals.merge(metrics)
+        return totals
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            'label': self.label,
+            'started': self.started,
+            'elapsed': self.elapsed,
+            'totals': self.totals().to_dict(),
+            'servers': {server: metrics.to_dict() for server, metrics in self.servers.items()},
+        }
+
+
+# ──────────────────────────────────────────────────────────
+# NTP server catalog
+# ──────────────────────────────────────────────────────────
+
+@dataclass
+class NTPCatalogEntry:
+    """Сервер каталога: имя (host или host:port), регион, страна и теги"""
+    host: str
+    region: str = 'global'
+    country: Optional[str] = None
+    tags: Tuple[str, ...] = ()
+
+
+class NTPCatalog:
+    """
+    Каталог NTP-серверов из версионированного JSON-файла (src/ntp_catalog.json):
+    пулы pool.ntp.org всех стран и континентов, серверы производителей, национальных
+    служб времени и провайдеров с регионом и тегами. Файл читается при первом обращении,
+    тогда же строятся индексы по стране, региону и тегу.
+
+    Формат: {"version": 1, "countries": {"код": {"en", "ru", "region"}},
+             "servers": [{"host", "region", "country", "tags"}]}
+    Пути перебираются по порядку, используется первый корректный файл.
+    """
+
+    VERSION = 1
+
+    def __init__(self, paths: List[Path], logger: Optional[logging.Logger] = None):
+        self.paths = paths
+        self.logger = logger or logging.getLogger(__name__)
+        self.path: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._entries: Optional[List[NTPCatalogEntry]] = None
+        self._countries: Dict[str, dict] = {}
+        self._by_country: Dict[str, List[int]] = {}
+        self._by_region: Dict[str, List[int]] = {}
+        self._by_tag: Dict[str, List[int]] = {}
+        self._country_zones: Dict[str, str] = {}
+
+    def _read(self, path: Path) -> Tuple[Dict[str, dict], List[NTPCatalogEntry]]:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != self.VERSION:
+            raise ValueError(f"unsupported catalog version {data.get('version')!r}")
+        entries = [
+            NTPCatalogEntry(host=str(item['host']), region=str(item.get('region') or 'global'),
+                            country=item.get('country'), tags=tuple(item.get('tags') or ()))
+            for item in data.get('servers', [])
+        ]
+        return dict(data.get('countries') or {}), entries
+
+    def _load(self) -> List[NTPCatalogEntry]:
+        if self._entries is not None:
+            return self._entries
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+            countries: Dict[str, dict] = {}
+            entries: List[NTPCatalogEntry] = []
+            for path in self.paths:
+                try:
+                    countries, entries = self._read(path)
+                except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                    self.logger.warning(f"Could not load NTP catalog {path}: {e}")
+                    continue
+                self.path = path
+                self.logger.info(f"NTP catalog {path}: {len(entries)} servers, {len(countries)} countries")
+                break
+            for index, entry in enumerate(entries):
+                if entry.country:
+                    self._by_country.setdefault(entry.country, []).append(index)
+                    if 'country' in entry.tags:
+                        self._country_zones.setdefault(entry.country, entry.host)
+                self._by_region.setdefault(entry.region, []).append(index)
+                for tag in entry.tags:
+                    self._by_tag.setdefault(tag, []).append(index)
+            self._countries = countries
+            self._entries = entries
+            return entries
+
+    @property
+    def entries(self) -> List[NTPCatalogEntry]:
+        return self._load()
+
+    def select(self, country: Optional[str] = None, region: Optional[str] = None,
+               tags: Tuple[str, ...] = (), exclude: Tuple[str, ...] = ()) -> List[str]:
+        """Серверы, подходящие под все условия (страна, регион, все теги из tags и ни одного
+        из exclude), в порядке каталога"""
+        entries = self._load()
+        indexes = [self._by_tag.get(tag, []) for tag in tags]
+        if country:
+            indexes.append(self._by_country.get(country, []))
+        if region:
+            indexes.append(self._by_region.get(region, []))
+        if indexes:
+            selected = sorted(set.intersection(*(set(index) for index in indexes)))
+        else:
+            selected = range(len(entries))
+        excluded = set(exclude)
+        return [entries[i].host for i in selected if not excluded.intersection(entries[i].tags)]
+
+    def country_zones(self) -> Dict[str, str]:
+        """Пул каждой страны (сервер с тегом country): код страны → сервер"""
+        self._load()
+        return self._country_zones
+
+    def country_names(self) -> Dict[str, Tuple[str, str]]:
+        self._load()
+        return {code: (info.get('en', ''), info.get('ru', '')) for code, info in self._countries.items()}
+
+    def country_region(self, code: str) -> Optional[str]:
+        self._load()
+        return (self._countries.get(code) or {}).get('region')
+
+
 class AndroidTVTimeFixer:
     def __init__(self):
         self.current_path = Path.cwd()
@@ -268,6 +1762,10 @@ class AndroidTVTimeFixer:
         self.process_manager = ADBProcessManager(self._adb_path)
         self.device = None
         self.connected_ip = None
+        # Открытые ADB-соединения: повторное обращение к устройству (смена устройства в пункте 8,
+        # групповое обновление, автонастройка) не требует новой авторизации
+        self.adb_pool = ADBConnectionPool()
+        atexit.register(self.adb_pool.close_all)
         self.max_connection_retries = 5
         self.connection_retry_delay = 5
         self.connection_timeout = 120  # Таймаут ожидания подключения в секундах
@@ -275,212 +1773,59 @@ class AndroidTVTimeFixer:
         self.saved_servers = self.load_saved_servers()
         self.settings_file = self.current_path / 'settings.json'
         self.last_device_ip = self.load_last_ip()
-        self.ntp_servers = {
-            'at': 'at.pool.ntp.org',
-            'ba': 'ba.pool.ntp.org',
-            'be': 'be.pool.ntp.org',
-            'bg': 'bg.pool.ntp.org',
-            'by': 'by.pool.ntp.org',
-            'ch': 'ch.pool.ntp.org',
-            'cy': 'cy.pool.ntp.org',
-            'cz': 'cz.pool.ntp.org',
-            'de': 'de.pool.ntp.org',
-            'dk': 'dk.pool.ntp.org',
-            'ee': 'ee.pool.ntp.org',
-            'es': 'es.pool.ntp.org',
-            'fi': 'fi.pool.ntp.org',
-            'fr': 'fr.pool.ntp.org',
-            'gi': 'gi.pool.ntp.org',
-            'gr': 'gr.pool.ntp.org',
-            'hr': 'hr.pool.ntp.org',
-            'hu': 'hu.pool.ntp.org',
-            'ie': 'ie.pool.ntp.org',
-            'is': 'is.pool.ntp.org',
-            'it': 'it.pool.ntp.org',
-            'li': 'li.pool.ntp.org',
-            'lt': 'lt.pool.ntp.org',
-            'lu': 'lu.pool.ntp.org',
-            'lv': 'lv.pool.ntp.org',
-            'md': 'md.pool.ntp.org',
-            'mk': 'mk.pool.ntp.org',
-            'nl': 'nl.pool.ntp.org',
-            'no': 'no.pool.ntp.org',
-            'pl': 'pl.pool.ntp.org',
-            'pt': 'pt.pool.ntp.org',
-            'ro': 'ro.pool.ntp.org',
-            'rs': 'rs.pool.ntp.org',
-            'ru': 'ru.pool.ntp.org',
-            'se': 'se.pool.ntp.org',
-            'si': 'si.pool.ntp.org',
-            'sk': 'sk.pool.ntp.org',
-            'tr': 'tr.pool.ntp.org',
-            'uk': 'uk.pool.ntp.org',
-            'us': 'us.pool.ntp.org',
-            'ca': 'ca.pool.ntp.org',
-            'br': 'br.pool.ntp.org',
-            'au': 'au.pool.ntp.org',
-            'jp': 'jp.pool.ntp.org',
-            'kz': 'kz.pool.ntp.org',
-            'ae': 'ae.pool.ntp.org',
-            'am': 'am.pool.ntp.org',
-            'az': 'az.pool.ntp.org',
-            'bd': 'bd.pool.ntp.org',
-            'bh': 'bh.pool.ntp.org',
-            'cn': 'cn.pool.ntp.org',
-            'ge': 'ge.pool.ntp.org',
-            'hk': 'hk.pool.ntp.org',
-            'id': 'id.pool.ntp.org',
-            'il': 'il.pool.ntp.org',
-            'in': 'in.pool.ntp.org',
-            'ir': 'ir.pool.ntp.org',
-            'kg': 'kg.pool.ntp.org',
-            'kh': 'kh.pool.ntp.org',
-            'kr': 'kr.pool.ntp.org',
-            'lk': 'lk.pool.ntp.org',
-            'mn': 'mn.pool.ntp.org',
-            'mv': 'mv.pool.ntp.org',
-            'my': 'my.pool.ntp.org',
-            'np': 'np.pool.ntp.org',
-            'ph': 'ph.pool.ntp.org',
-            'pk': 'pk.pool.ntp.org',
-            'ps': 'ps.pool.ntp.org',
-            'qa': 'qa.pool.ntp.org',
-            'sa': 'sa.pool.ntp.org',
-            'sg': 'sg.pool.ntp.org',
-            'th': 'th.pool.ntp.org',
-            'tj': 'tj.pool.ntp.org',
-            'tw': 'tw.pool.ntp.org',
-            'uz': 'uz.pool.ntp.org',
-            'ua': 'ua.pool.ntp.org',
-            'vn': 'vn.pool.ntp.org'
-        }
-        # (en_name, ru_name) for each country code
-        self.country_names = {
-            'at': ('Austria', 'Австрия'),
-            'ba': ('Bosnia and Herzegovina', 'Босния и Герцеговина'),
-            'be': ('Belgium', 'Бельгия'),
-            'bg': ('Bulgaria', 'Болгария'),
-            'by': ('Belarus', 'Беларусь'),
-            'ch': ('Switzerland', 'Швейцария'),
-            'cy': ('Cyprus', 'Кипр'),
-            'cz': ('Czech Republic', 'Чехия'),
-            'de': ('Germany', 'Германия'),
-            'dk': ('Denmark', 'Дания'),
-            'ee': ('Estonia', 'Эстония'),
-            'es': ('Spain', 'Испания'),
-            'fi': ('Finland', 'Финляндия'),
-            'fr': ('France', 'Франция'),
-            'gi': ('Gibraltar', 'Гибралтар'),
-            'gr': ('Greece', 'Греция'),
-            'hr': ('Croatia', 'Хорватия'),
-            'hu': ('Hungary', 'Венгрия'),
-            'ie': ('Ireland', 'Ирландия'),
-            'is': ('Iceland', 'Исландия'),
-            'it': ('Italy', 'Италия'),
-            'li': ('Liechtenstein', 'Лихтенштейн'),
-            'lt': ('Lithuania', 'Литва'),
-            'lu': ('Luxembourg', 'Люксембург'),
-            'lv': ('Latvia', 'Латвия'),
-            'md': ('Moldova', 'Молдова'),
-            'mk': ('North Macedonia', 'Северная Македония'),
-            'nl': ('Netherlands', 'Нидерланды'),
-            'no': ('Norway', 'Норвегия'),
-            'pl': ('Poland', 'Польша'),
-            'pt': ('Portugal', 'Португалия'),
-            'ro': ('Romania', 'Румыния'),
-            'rs': ('Serbia', 'Сербия'),
-            'ru': ('Russia', 'Россия'),
-            'se': ('Sweden', 'Швеция'),
-            'si': ('Slovenia', 'Словения'),
-            'sk': ('Slovakia', 'Словакия'),
-            'tr': ('Turkey', 'Турция'),
-            'uk': ('United Kingdom', 'Великобритания'),
-            'us': ('United States', 'США'),
-            'ca': ('Canada', 'Канада'),
-            'br': ('Brazil', 'Бразилия'),
-            'au': ('Australia', 'Австралия'),
-            'cn': ('China', 'Китай'),
-            'jp': ('Japan', 'Япония'),
-            'kz': ('Kazakhstan', 'Казахстан'),
-            'ae': ('United Arab Emirates', 'ОАЭ'),
-            'am': ('Armenia', 'Армения'),
-            'az': ('Azerbaijan', 'Азербайджан'),
-            'bd': ('Bangladesh', 'Бангладеш'),
-            'bh': ('Bahrain', 'Бахрейн'),
-            'ge': ('Georgia', 'Грузия'),
-            'hk': ('Hong Kong', 'Гонконг'),
-            'id': ('Indonesia', 'Индонезия'),
-            'il': ('Israel', 'Израиль'),
-            'in': ('India', 'Индия'),
-            'ir': ('Iran', 'Иран'),
-            'kg': ('Kyrgyzstan', 'Кыргызстан'),
-            'kh': ('Cambodia', 'Камбоджа'),
-            'kr': ('Korea', 'Корея'),
-            'lk': ('Sri Lanka', 'Шри-Ланка'),
-            'mn': ('Mongolia', 'Монголия'),
-            'mv': ('Maldives', 'Мальдивы'),
-            'my': ('Malaysia', 'Малайзия'),
-            'np': ('Nepal', 'Непал'),
-            'ph': ('Philippines', 'Филиппины'),
-            'pk': ('Pakistan', 'Пакистан'),
-            'ps': ('Palestinian Territory', 'Палестина'),
-            'qa': ('Qatar', 'Катар'),
-            'sa': ('Saudi Arabia', 'Саудовская Аравия'),
-            'sg': ('Singapore', 'Сингапур'),
-            'th': ('Thailand', 'Таиланд'),
-            'tj': ('Tajikistan', 'Таджикистан'),
-            'tw': ('Taiwan', 'Тайвань'),
-            'uz': ('Uzbekistan', 'Узбекистан'),
-            'ua': ('Ukraine', 'Украина'),
-            'vn': ('Vietnam', 'Вьетнам'),
-        }
-        self.custom_ntp_servers = [
-            'time.windows.com',
-            'twc.trafficmanager.net',
-            '0.europe.pool.ntp.org',
-            '1.europe.pool.ntp.org',
-            '2.europe.pool.ntp.org',
-            '3.europe.pool.ntp.org',
-            '0.north-america.pool.ntp.org',
-            '1.north-america.pool.ntp.org',
-            '2.north-america.pool.ntp.org',
-            '3.north-america.pool.ntp.org',
-            '0.asia.pool.ntp.org',
-            '1.asia.pool.ntp.org',
-            '2.asia.pool.ntp.org',
-            '3.asia.pool.ntp.org',
-            '0.africa.pool.ntp.org',
-            '1.africa.pool.ntp.org',
-            '2.africa.pool.ntp.org',
-            '3.africa.pool.ntp.org',
-            '0.oceania.pool.ntp.org',
-            '1.oceania.pool.ntp.org',
-            '2.oceania.pool.ntp.org',
-            '3.oceania.pool.ntp.org',
-            '0.south-america.pool.ntp.org',
-            '1.south-america.pool.ntp.org',
-            '2.south-america.pool.ntp.org',
-            '3.south-america.pool.ntp.org',
-            'time.cloudflare.com',
-            'clock.isc.org',
-            'ntp1.vniiftri.ru',
-            'ntp2.vniiftri.ru',
-            'ntp3.vniiftri.ru',
-            'ntp4.vniiftri.ru',
-            'ntp21.vniiftri.ru',
-            'ntp1.niiftri.irkutsk.ru',
-            'ntp2.niiftri.irkutsk.ru',
-            'vniiftri.khv.ru',
-            'vniiftri2.khv.ru',
-            'ntp.sniim.ru',
-            'ntp1.ntp-servers.net',
-            'ntp0.ntp-servers.net',
-            'time.nist.gov',
-            'ntps1-1.cs.tu-berlin.de',
-            'ntp.ix.ru',
-            'time.google.com',
-            'time.android.com'
-        ]
+        self.ntp_resolver = NTPResolver(self.current_path / 'dns_cache.json')
+        self.ntp_probe_cache = NTPProbeCache(self.current_path / 'ntp_probe_cache.json')
+        self.ntp_history = NTPHistoryStore(self.current_path / 'ntp_history.sqlite3')
+        self.ntp_pacer = NTPPacer(self.current_path / 'ntp_backoff.json')
+        self.ntp_profiles = NTPNetworkProfiles(self.current_path / 'ntp_profiles.json')
+        self._profile_refresh: Optional[threading.Thread] = None
+        self._time_consensus: Optional[TimeConsensus] = None
+        # Текущий запуск метрик у каждого потока свой: фоновые проверки (обновление профиля сети,
+        # заблаговременная проверка) не смешиваются с запуском пункта меню
+        self._probe_run_local = threading.local()
+        self.probe_metrics_file = self.current_path / 'ntp_probe_metrics.json'
+        self._probe_metrics_lock = threading.Lock()
+        self._probe_refreshes: set = set()
+        self._probe_refresh_lock = threading.Lock()
+        self._ntp_prefetch: Dict[str, Future] = {}
+        self._network_key: Optional[Tuple[float, str]] = None
+        self.ntp_catalog = NTPCatalog(self._ntp_catalog_paths(), self.logger)
+
+    # Переменная окружения с путём к каталогу, который используется вместо встроенного
+    # (например, каталог фермы scripts/ntp_simulator.py для офлайн-измерений)
+    NTP_CATALOG_ENV = 'ANDROID_TV_TIME_FIXER_NTP_CATALOG'
+
+    def _ntp_catalog_paths(self) -> List[Path]:
+        """Каталог из NTP_CATALOG_ENV (если задан), затем встроенный ntp_catalog.json"""
+        if getattr(sys, 'frozen', False):
+            base_path = sys._MEIPASS
+        else:
+            base_path = os.path.abspath(os.path.dirname(__file__))
+        paths = [Path(base_path) / 'ntp_catalog.json']
+        override = os.environ.get(self.NTP_CATALOG_ENV)
+        if override:
+            paths.insert(0, Path(override))
+        return paths
+
+    @property
+    def ntp_servers(self) -> Dict[str, str]:
+        """Пулы стран из каталога: код страны → сервер"""
+        return self.ntp_catalog.country_zones()
+
+    @property
+    def custom_ntp_servers(self) -> List[str]:
+        """Альтернативные серверы: серверы основного набора, кроме пулов стран"""
+        return self.ntp_catalog.select(tags=('default',), exclude=('country',))
+
+    @property
+    def country_names(self) -> Dict[str, Tuple[str, str]]:
+        """(en_name, ru_name) для каждого кода страны"""
+        return self.ntp_catalog.country_names()
+
+    def _default_probe_servers(self) -> List[str]:
+        """Основной набор для проверки (пункты 6 и 9): пулы стран и альтернативные серверы,
+        отмеченные в каталоге тегом default"""
+        return self.ntp_catalog.select(tags=('default',))
 
     def _setup_logging(self) -> None:
         """Настраивает логирование для класса с выводом в файл и консоль"""
@@ -824,31 +2169,10 @@ class AndroidTVTimeFixer:
             # Хотя основное завершение происходит при командах exit/quit/q
             self.process_manager.cleanup()
 	
-    def _test_ntp_server(self, server: str, count: int = 2, timeout: int = 2) -> dict:
-        """Проверка NTP-сервера с несколькими попытками и детальной диагностикой ошибок.
-        Используется и в ping_ntp_servers (пункт 6), и в auto_setup_ntp (пункт 9).
-        Возвращает dict с метриками и статусом."""
-        rtts = []
-        offsets = []
-        last_error = None
-
-        for _ in range(count):
-            try:
-                ntp_client = ntplib.NTPClient()
-                start_time = time.time()
-                ntp_response = ntp_client.request(server, version=3, timeout=timeout)
-                rtt = (time.time() - start_time) * 1000
-                rtts.append(rtt)
-                offsets.append(ntp_response.offset)
-            except ntplib.NTPException as e:
-                last_error = f"NTP Protocol Error: {e}"
-            except socket.gaierror:
-                last_error = "DNS Resolution Error"
-            except socket.timeout:
-                last_error = "Timeout"
-            except Exception as e:
-                last_error = str(e)
-
+    @staticmethod
+    def _build_ntp_result(server: str, count: int, rtts: List[float], offsets: List[float],
+                          last_error: Optional[str]) -> dict:
+        """Собирает итоговый dict проверки сервера из результатов отдельных попыток"""
         if not rtts:
             return {
                 'server': server,
@@ -878,80 +2202,1177 @@ class AndroidTVTimeFixer:
             'color': Fore.GREEN if success_rate > 66 else Fore.YELLOW
         }
 
-    def ping_ntp_servers(self, timeout=2, count=3):
+    # Сколько адресов одного имени (например, *.pool.ntp.org) проверять отдельно
+    max_addresses_per_host = 8
+
+    async def _probe_ntp_address_async(self, client: AsyncSNTPClient, family: int, address: str,
+                                       count: int, timeout: float, port: int = NTP_PORT,
+                                       metrics: Optional[ProbeMetrics] = None) -> dict:
+        """Выполняет count последовательных попыток к одному IP-адресу (и порту).
+        Ответ несинхронизированного сервера (stratum 0/16+, leap = 3) считается неудачной попыткой.
+        Kiss-o'-Death (RATE/DENY/RSTR) прекращает запросы к адресу и ставит его на паузу;
+        пока пауза действует, адрес не опрашивается вовсе."""
+        sockaddr = (address, port)
+        address = format_ntp_target(address, port)
+        rtts = []
+        offsets = []
+        samples = []
+        unsynced = 0
+        last_error = None
+
+        backoff = self.ntp_pacer.blocked(address)
+        if backoff:
+            if metrics is not None:
+                metrics.incr('backoff_skipped')
+            remaining = backoff['until'] - time.time()
+            if backoff['code'] == BACKOFF_TIMEOUT:
+                # Адрес молчал несколько запросов подряд: это не ограничение, а недоступность
+                return {'address': address, 'rtts': [], 'offsets': [], 'samples': [], 'unsynced': 0,
+                        'kod': None, 'error': f"No replies, backing off for {remaining:.0f}s"}
+            return {'address': address, 'rtts': [], 'offsets': [], 'samples': [], 'unsynced': 0,
+                    'kod': backoff['code'],
+                    'error': f"Kiss-o'-Death {backoff['code']}, backing off for {remaining:.0f}s"}
+
+        for _ in range(count):
+            try:
+                response, t1, t4 = await client.query(family, sockaddr, timeout, metrics)
+                kiss_code = format_ref_id(response.ref_id, 0) if response.stratum == 0 else None
+                if kiss_code in KOD_CODES:
+                    if metrics is not None:
+                        metrics.incr('kod')
+                    backoff = self.ntp_pacer.kiss(address, kiss_code)
+                    self.logger.info(f"NTP server {address} sent Kiss-o'-Death {kiss_code}, "
+                                     f"backing off for {backoff['interval']:.0f}s")
+                    return {'address': address, 'rtts': rtts, 'offsets': offsets, 'samples': samples,
+                            'unsynced': unsynced, 'kod': kiss_code,
+                            'error': f"Kiss-o'-Death {kiss_code}"}
+                self.ntp_pacer.clear(address)
+                if response.leap == 3 or response.stratum == 0 or response.stratum >= 16:
+                    unsynced += 1
+                    if metrics is not None:
+                        metrics.incr('unsynced')
+                    last_error = f"Unsynchronized (stratum {response.stratum}, leap {response.leap})"
+                    continue
+                delay, offset = ntp_delay_offset(response, t1, t4)
+                rtts.append(delay * 1000)
+                offsets.append(offset)
+                samples.append({
+                    'stratum': response.stratum,
+                    'leap': response.leap,
+                    'root_delay': response.root_delay * 1000,
+                    'root_dispersion': response.root_dispersion * 1000,
+                    'ref_id': format_ref_id(response.ref_id, response.stratum),
+                })
+            except asyncio.TimeoutError:
+                last_error = "Timeout"
+                if metrics is not None:
+                    metrics.incr('timeouts')
+                backoff = self.ntp_pacer.timed_out(address)
+                if backoff:
+                    self.logger.info(f"NTP server {address} did not reply {self.ntp_pacer.timeout_limit} times "
+                                     f"in a row, backing off for {backoff['interval']:.0f}s")
+                    break
+            except SNTPError as e:
+                last_error = f"NTP Protocol Error: {e}"
+                if metrics is not None:
+                    metrics.incr('protocol_errors')
+            except Exception as e:
+                last_error = str(e)
+                if metrics is not None:
+                    metrics.incr('socket_errors')
+
+        return {'address': address, 'rtts': rtts, 'offsets': offsets, 'samples': samples,
+                'unsynced': unsynced, 'kod': None, 'error': last_error}
+
+    @staticmethod
+    def _ntp_quality_score(success_rate: float, distance_ms: float) -> float:
+        """Композитная оценка качества 0..100: доля ответов, делённая на корневое расстояние.
+        100 — все ответы при нулевом расстоянии, 50 — все ответы при расстоянии 100 мс."""
+        return success_rate * 100 / (100 + max(0.0, distance_ms))
+
+    def _apply_quality_metrics(self, result: dict, samples: List[dict], offsets: List[float]) -> None:
+        """Добавляет к результату stratum, root delay/dispersion, leap, ref id, джиттер смещения,
+        оценку корневого расстояния (RFC 5905: delay/2 + root delay/2 + root dispersion + jitter)
+        и итоговую оценку качества."""
+        if not samples or result['avg_rtt'] is None:
+            result.update(stratum=None, leap=None, root_delay=None, root_dispersion=None,
+                          ref_id=None, jitter=None, root_distance=None, score=0.0)
+            return
+
+        jitter = statistics.pstdev(offsets) * 1000 if len(offsets) > 1 else 0.0
+        root_delay = statistics.median(sample['root_delay'] for sample in samples)
+        root_dispersion = statistics.median(sample['root_dispersion'] for sample in samples)
+        distance = result['avg_rtt'] / 2 + root_delay / 2 + root_dispersion + jitter
+        result.update(
+            stratum=statistics.median_low(sample['stratum'] for sample in samples),
+            leap=max(sample['leap'] for sample in samples),
+            root_delay=root_delay,
+            root_dispersion=root_dispersion,
+            ref_id=statistics.mode(sample['ref_id'] for sample in samples),
+            jitter=jitter,
+            root_distance=distance,
+            score=self._ntp_quality_score(result['success_rate'], distance),
+        )
+
+    def _aggregate_address_results(self, server: str, count: int, ip_results: List[dict]) -> dict:
+        """Сводит результаты по отдельным IP одного имени в общий результат сервера.
+        Для имён с несколькими адресами avg_rtt — медиана средних RTT по адресам,
+        min_rtt/max_rtt — лучший и худший адрес (их разница — разброс пула)."""
+        rtts = [rtt for ip in ip_results for rtt in ip['rtts']]
+        offsets = [offset for ip in ip_results for offset in ip['offsets']]
+        errors = [ip['error'] for ip in ip_results if ip['error']]
+        result = self._build_ntp_result(server, count * len(ip_results), rtts, offsets,
+                                        errors[-1] if errors else None)
+
+        kod_codes = [ip['kod'] for ip in ip_results if ip['kod']]
+        result['kod'] = kod_codes[0] if kod_codes else None
+        if not rtts and kod_codes:
+            # Сервер просит не опрашивать его: это не сбой, а ограничение с его стороны
+            result.update(status='Rate limited' if KOD_RATE in kod_codes else 'Denied', color=Fore.MAGENTA)
+        elif not rtts and any(ip['unsynced'] for ip in ip_results):
+            # Сервер отвечает, но сам не синхронизирован — рекомендовать его нельзя
+            result.update(status='Unsynced')
+
+        per_ip = []
+        for ip in ip_results:
+            per_ip.append({
+                'address': ip['address'],
+                'avg_rtt': sum(ip['rtts']) / len(ip['rtts']) if ip['rtts'] else None,
+                'success_rate': len(ip['rtts']) / count * 100,
+                'offset': sum(ip['offsets']) / len(ip['offsets']) if ip['offsets'] else None,
+                'stratum': ip['samples'][0]['stratum'] if ip['samples'] else None,
+                'error': ip['error'],
+            })
+        per_ip.sort(key=lambda ip: (-ip['success_rate'], ip['avg_rtt'] if ip['avg_rtt'] is not None else float('inf')))
+        reachable = [ip for ip in per_ip if ip['avg_rtt'] is not None]
+
+        result['ip_results'] = per_ip
+        result['best_ip'] = reachable[0]['address'] if reachable else None
+        result['address'] = per_ip[0]['address'] if per_ip else None
+        if len(per_ip) > 1 and reachable:
+            ip_rtts = [ip['avg_rtt'] for ip in reachable]
+            result['avg_rtt'] = statistics.median(ip_rtts)
+            result['min_rtt'] = min(ip_rtts)
+            result['max_rtt'] = max(ip_rtts)
+        if result['avg_rtt'] is not None:
+            result['best_rtt'] = result['min_rtt']
+            result['median_rtt'] = result['avg_rtt']
+            result['rtt_spread'] = result['max_rtt'] - result['min_rtt']
+        self._apply_quality_metrics(result, [sample for ip in ip_results for sample in ip['samples']], offsets)
+        return result
+
+    async def _probe_ntp_server_async(self, client: AsyncSNTPClient, server: str,
+                                      count: int, timeout: float,
+                                      resolved: ResolvedHost,
+                                      progress: Optional[dict] = None,
+                                      metrics: Optional[ProbeMetrics] = None,
+                                      shared: Optional[Dict[Tuple[str, int], SharedAddressProbe]] = None,
+                                      max_addresses: Optional[int] = None) -> dict:
+        """Проверяет один сервер через общий SNTP-клиент: все адреса его имени (resolved —
+        пулы отдают по несколько, но не больше max_addresses или max_addresses_per_host
+        на семейство) проверяются параллельно по count попыток.
+        progress (если передан) заполняется ходом проверки: время старта и средний RTT
+        каждого завершённого адреса (inf, если были потери) — для досрочной остановки.
+        metrics (если передан) получает счётчики и задержки всех запросов к серверу.
+        shared (если передан) — общие проверки адресов запуска: адрес, который уже проверяется
+        или проверен для другого имени, повторно не опрашивается."""
+        host, port = split_ntp_target(server)
+        dns_info = {'dns_ms': resolved.dns_ms, 'dns_cached': resolved.cached}
+        if metrics is not None and not metrics.counters['servers']:
+            # Повторная проверка того же сервера в запуске (глубокая) счётчики не удваивает
+            metrics.incr('servers')
+            if resolved.cached and not resolved.literal:
+                metrics.incr('dns_cached')
+            elif not resolved.cached:
+                metrics.incr('dns_lookups')
+                metrics.observe('dns', resolved.dns_ms)
+            if not resolved.addresses:
+                metrics.incr('dns_failures')
+
+        if not resolved.addresses:
+            result = self._build_ntp_result(server, count, [], [], resolved.error or "DNS Resolution Error")
+            result.update(dns_info, address=None, best_ip=None, ip_results=[])
+            self._apply_quality_metrics(result, [], [])
+            return result
+
+        # Оба семейства адресов проверяются наперегонки в стиле Happy Eyeballs (RFC 8305):
+        # IPv6 стартует первым, IPv4 — с небольшой задержкой. Сломанный IPv6 не портит
+        # результат сервера: в зачёт идёт семейство-победитель, остальные дают свою статистику.
+        by_family: Dict[int, List[str]] = {}
+        for fam, address in resolved.addresses:
+            by_family.setdefault(fam, []).append(address)
+        families = sorted(by_family, key=lambda fam: fam != socket.AF_INET6)
+        targets = {fam: by_family[fam][:max_addresses or self.max_addresses_per_host] for fam in families}
+
+        if progress is None:
+            progress = {}
+        progress['probe_started'] = time.time()
+        progress['pace_wait'] = lambda address: client.pace_wait(format_ntp_target(address, port))
+        progress['addresses'] = {address: None for fam in families for address in targets[fam]}
+        progress['families'] = {fam: {'started': None, 'addresses': targets[fam]} for fam in families}
+
+        async def probe_address(family: int, address: str) -> dict:
+            if shared is None:
+                ip_result = await self._probe_ntp_address_async(client, family, address, count, timeout, port,
+                                                                metrics)
+            else:
+                probe = shared.get((address, port))
+                if probe is None or probe.task.cancelled():
+                    probe = shared[(address, port)] = SharedAddressProbe(asyncio.ensure_future(
+                        self._probe_ntp_address_async(client, family, address, count, timeout, port, metrics)
+                    ))
+                elif metrics is not None:
+                    metrics.incr('shared_probes')
+                ip_result = await probe.wait()
+            rtts = ip_result['rtts']
+            progress['addresses'][address] = sum(rtts) / len(rtts) if len(rtts) == count else float('inf')
+            return ip_result
+
+        async def probe_family(family: int, delay: float) -> List[dict]:
+            if delay:
+                await asyncio.sleep(delay)
+            progress['families'][family]['started'] = time.time()
+            return list(await asyncio.gather(*(probe_address(family, address) for address in targets[family])))
+
+        tasks = {
+            asyncio.ensure_future(probe_family(fam, index * self.happy_eyeballs_delay)): fam
+            for index, fam in enumerate(families)
+        }
+        family_results: Dict[int, List[dict]] = {}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    family_results[tasks[task]] = task.result()
+                if pending and any(ip['rtts'] for results in family_results.values() for ip in results):
+                    # Победитель определён: отстающему семейству — короткая фора, затем оно снимается
+                    done, pending = await asyncio.wait(pending, timeout=self.happy_eyeballs_delay)
+                    for task in done:
+                        family_results[tasks[task]] = task.result()
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        summaries = {fam: self._family_summary(family_results.get(fam), count) for fam in families}
+        answered = [fam for fam in families if summaries[fam]['success_rate']]
+        if answered:
+            winner = max(answered, key=lambda fam: (summaries[fam]['success_rate'], -summaries[fam]['avg_rtt']))
+            ip_results = family_results[winner]
+        else:
+            winner = None
+            ip_results = [ip for fam in families for ip in family_results.get(fam, [])]
+
+        result = self._aggregate_address_results(server, count, ip_results)
+        result.update(dns_info)
+        result['family'] = self._family_name(winner) if winner else None
+        result['families'] = {self._family_name(fam): summaries[fam] for fam in families}
+        return result
+
+    # Задержка старта IPv4 после IPv6 и фора отстающему семейству после победы другого (с)
+    happy_eyeballs_delay = 0.25
+
+    @staticmethod
+    def _family_name(family: int) -> str:
+        return 'IPv6' if family == socket.AF_INET6 else 'IPv4'
+
+    @staticmethod
+    def _format_family_stats(result: dict) -> str:
+        """'IPv6: 5.2ms 100% | IPv4: 6.1ms 100%' для имён с адресами обоих семейств"""
+        parts = []
+        for name, stats in (result.get('families') or {}).items():
+            if not stats['complete']:
+                parts.append(f"{name}: stopped")
+            elif stats['avg_rtt'] is None:
+                parts.append(f"{name}: no reply")
+            else:
+                parts.append(f"{name}: {stats['avg_rtt']:.1f}ms {stats['success_rate']:.0f}%")
+        return " | ".join(parts)
+
+    @staticmethod
+    def _family_summary(ip_results: Optional[List[dict]], count: int) -> dict:
+        """Статистика одного семейства адресов; complete=False — проверка снята после победы другого"""
+        if ip_results is None:
+            return {'complete': False, 'avg_rtt': None, 'success_rate': None, 'addresses': 0}
+        address_rtts = [sum(ip['rtts']) / len(ip['rtts']) for ip in ip_results if ip['rtts']]
+        replies = sum(len(ip['rtts']) for ip in ip_results)
+        return {
+            'complete': True,
+            'avg_rtt': statistics.median(address_rtts) if address_rtts else None,
+            'success_rate': replies / (count * len(ip_results)) * 100 if ip_results else 0.0,
+            'addresses': len(ip_results),
+        }
+
+    async def _probe_ntp_servers_async(self, servers: List[str], count: int, timeout: float,
+                                       max_in_flight: int,
+                                       on_result: Optional[Callable[[dict], None]],
+                                       stop_when: Optional[Callable[[List[dict], Dict[str, dict], float], bool]],
+                                       max_addresses: Optional[int] = None) -> List[dict]:
+        client = AsyncSNTPClient(pacer=self.ntp_pacer)
+        semaphore = asyncio.Semaphore(max(1, max_in_flight))
+        results: List[dict] = []
+        # Ход проверки серверов, которые уже начали проверяться, но ещё не завершились
+        in_flight: Dict[str, dict] = {}
+        # Все имена каталога разрешаются параллельно сразу при старте, вне лимита одновременных
+        # проверок; проверка каждого сервера начинается, как только готов его адрес
+        loop = asyncio.get_running_loop()
+        hosts = list(dict.fromkeys(split_ntp_target(server)[0] for server in servers))
+        resolver_pool = ThreadPoolExecutor(max_workers=max(1, min(self.ntp_resolver.max_workers, len(hosts))))
+        resolving = {host: loop.run_in_executor(resolver_pool, self.ntp_resolver.resolve, host) for host in hosts}
+        # Метрики пишутся, только пока пункт меню ведёт запуск (_probe_metrics_run)
+        probe_run = self._probe_run
+        # Каждый адрес опрашивается один раз за запуск, сколько бы имён в него ни разрешилось
+        shared: Dict[Tuple[str, int], SharedAddressProbe] = {}
+
+        async def run(server: str) -> None:
+            resolved = await asyncio.shield(resolving[split_ntp_target(server)[0]])
+            async with semaphore:
+                progress = in_flight[server] = {'started': time.time()}
+                try:
+                    result = await self._probe_ntp_server_async(
+                        client, server, count, timeout, resolved, progress,
+                        probe_run.server(server) if probe_run else None, shared, max_addresses
+                    )
+                finally:
+                    in_flight.pop(server, None)
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+        tasks = {asyncio.ensure_future(run(server)) for server in servers}
+        try:
+            pending = tasks
+            while pending:
+                # Проверяем условие остановки и по приходу результатов, и по времени:
+                # незавершённые проверки со временем сами перестают быть конкурентами
+                done, pending = await asyncio.wait(pending, timeout=0.05 if stop_when else None)
+                for task in done:
+                    task.result()
+                if pending and stop_when and stop_when(results, in_flight, time.time()):
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    break
+        finally:
+            # Проверки адресов, которые после досрочной остановки уже никто не ждёт
+            orphaned = [probe.task for probe in shared.values() if not probe.task.done()]
+            for task in orphaned:
+                task.cancel()
+            if orphaned:
+                await asyncio.gather(*orphaned, return_exceptions=True)
+            for future in resolving.values():
+                future.cancel()
+            client.close()
+            resolver_pool.shutdown(wait=False)
+        return results
+
+    def _probe_ntp_servers(self, servers: List[str], count: int = 2, timeout: float = 2,
+                           max_in_flight: int = 256,
+                           on_result: Optional[Callable[[dict], None]] = None,
+                           stop_when: Optional[Callable[[List[dict], Dict[str, dict], float], bool]] = None,
+                           cache_results: bool = True,
+                           max_addresses: Optional[int] = None) -> List[dict]:
+        """Параллельно проверяет список NTP-серверов из одного потока (asyncio, общий UDP-сокет).
+        on_result вызывается для каждого сервера по мере готовности результата.
+        stop_when(results, in_flight, now) позволяет досрочно завершить проверку: оставшиеся
+        проверки отменяются и в результат не попадают.
+        cache_results=False не записывает результаты в кэш проверок для выбора сервера;
+        max_addresses ограничивает число проверяемых адресов одного имени.
+        Возвращает результаты в порядке завершения."""
+        try:
+            results = asyncio.run(
+                self._probe_ntp_servers_async(servers, count, timeout, max_in_flight, on_result, stop_when,
+                                              max_addresses)
+            )
+        finally:
+            self.ntp_resolver.save()
+            self.ntp_pacer.save()
+
+        # Ответы нескольких серверов, полученные одновременно, дают оценку точного времени
+        self._update_time_consensus(results)
+
+        if not cache_results:
+            return results
+
+        # Свежие измерения доступных серверов переиспользуются при проверке перед установкой
+        network_key = self._get_network_key()
+        checked_at = time.time()
+        for result in results:
+            if result['status'] == 'Reachable':
+                self.ntp_probe_cache.put(network_key, dict(result, checked_at=checked_at))
+        self.ntp_probe_cache.save()
+        return results
+
+    # Быстрый проход: один запрос к каждому серверу с коротким таймаутом (с)
+    ntp_sweep_timeout = 1.0
+    # Сколько лучших по быстрому проходу серверов проверяются повторными запросами
+    ntp_deep_probe_finalists = 15
+
+    def _probe_ntp_servers_tiered(self, servers: List[str], count: int = 3, timeout: float = 2,
+                                  finalists: Optional[int] = None, max_in_flight: int = 256,
+                                  rank_key: Optional[Callable[[dict], tuple]] = None,
+                                  on_sweep_result: Optional[Callable[[dict], None]] = None,
+                                  on_result: Optional[Callable[[dict], None]] = None,
+                                  stop_when: Optional[Callable[[List[dict], Dict[str, dict], float], bool]] = None,
+                                  race_sweep: bool = False) -> Tuple[List[dict], List[dict]]:
+        """Двухэтапная проверка каталога. Сначала каждому серверу отправляется один запрос
+        с коротким таймаутом: недоступные и заведомо медленные серверы отсеиваются за один пакет.
+        Затем лучшие finalists серверов (порядок — rank_key) проверяются count попытками,
+        что даёт джиттер и долю ответов. on_result/stop_when относятся ко второму этапу.
+        race_sweep завершает быстрый проход, как только финалисты определены и никакой
+        ещё не ответивший сервер не может их обойти.
+        Итоговые результаты дополняются историей прошлых запусков и записываются в неё.
+        Возвращает (результаты быстрого прохода, результаты углублённой проверки);
+        у первых finalist=False, у вторых finalist=True."""
+        finalists = finalists or self.ntp_deep_probe_finalists
+        network_key = self._get_network_key()
+        history = self.ntp_history.stats(network_key)
+        sweep_timeout = min(timeout, self.ntp_sweep_timeout)
+
+        def sweep_decided(done: List[dict], in_flight: Dict[str, dict], now: float) -> bool:
+            scores = sorted((r['score'] for r in done if r['status'] == 'Reachable'), reverse=True)
+            if len(scores) < finalists:
+                return False
+            # Оценка сверху для ожидающих: корневое расстояние не меньше RTT/2,
+            # запас 0.9 покрывает региональный бонус ранжирования
+            return all(
+                self._ntp_quality_score(
+                    100, 0.9 * self._pending_rtt_lower_bound(progress, 1, sweep_timeout, now) / 2
+                ) < scores[finalists - 1]
+                for progress in in_flight.values()
+            )
+
+        sweep = self._probe_ntp_servers(
+            servers, count=1, timeout=sweep_timeout, max_in_flight=max_in_flight,
+            on_result=on_sweep_result, stop_when=sweep_decided if race_sweep else None, cache_results=False
+        )
+        for result in sweep:
+            result['finalist'] = False
+
+        candidates = sorted((r for r in sweep if r['status'] == 'Reachable'),
+                            key=rank_key or self._ntp_result_sort_key)
+        candidates = candidates[:finalists]
+        deep = []
+        if candidates:
+            deep = self._probe_ntp_servers(
+                [r['server'] for r in candidates], count=count, timeout=timeout, max_in_flight=max_in_flight,
+                on_result=on_result, stop_when=stop_when
+            )
+            for result in deep:
+                result['finalist'] = True
+
+        final = {r['server']: r for r in sweep}
+        final.update((r['server'], r) for r in deep)
+        self._annotate_history(list(final.values()), history)
+        # Запуск, в котором не ответил ни один сервер, говорит о сети, а не о серверах
+        if any(r['status'] == 'Reachable' for r in final.values()):
+            self.ntp_history.record(network_key, list(final.values()))
+        return sweep, deep
+
+    # Сколько последних запусков хранится в ntp_probe_metrics.json
+    probe_metrics_history = 20
+
+    @property
+    def _probe_run(self) -> Optional[NTPProbeRun]:
+        """Запуск метрик, который ведёт текущий поток (None вне _probe_metrics_run)"""
+        return getattr(self._probe_run_local, 'run', None)
+
+    @_probe_run.setter
+    def _probe_run(self, probe_run: Optional[NTPProbeRun]) -> None:
+        self._probe_run_local.run = probe_run
+
+    @contextmanager
+    def _probe_metrics_run(self, label: str):
+        """Собирает метрики всех проверок NTP внутри блока в один запуск NTPProbeRun.
+        Вложенный блок в том же потоке продолжает уже идущий запуск."""
+        if self._probe_run is not None:
+            yield self._probe_run
+            return
+        probe_run = self._probe_run = NTPProbeRun(label)
+        try:
+            yield probe_run
+        finally:
+            self._probe_run = None
+            probe_run.finished = time.time()
+
+    def export_probe_metrics(self, probe_run: NTPProbeRun) -> Optional[Path]:
+        """Добавляет запуск в ntp_probe_metrics.json (последние probe_metrics_history запусков).
+        Фоновые проверки выгружают свои запуски одновременно с основной, поэтому чтение
+        и запись файла идут под блокировкой, а сама запись — атомарно."""
+        try:
+            with self._probe_metrics_lock:
+                try:
+                    with open(self.probe_metrics_file, 'r', encoding='utf-8') as f:
+                        runs = json.load(f).get('runs', [])
+                except (OSError, ValueError, AttributeError):
+                    runs = []
+                runs = (runs + [probe_run.to_dict()])[-self.probe_metrics_history:]
+                write_file_atomic(self.probe_metrics_file, json.dumps({'version': 1, 'runs': runs}))
+        except Exception as e:
+            self.logger.warning(f"Could not save NTP probe metrics: {e}")
+            return None
+        return self.probe_metrics_file
+
+    def show_probe_metrics(self, probe_run: NTPProbeRun, slowest: int = 5) -> None:
+        """Печатает сводку метрик запуска: счётчики, перцентили задержек по этапам
+        и серверы с самым долгим ответом; затем выгружает запуск в JSON"""
+        totals = probe_run.totals()
+        counters = totals.counters
+
+        def ms(value: Optional[float]) -> str:
+            return f"{value:.1f}" if value is not None else "-"
+
+        print(Fore.GREEN + "\n" + locales.get("probe_metrics_title", label=probe_run.label,
+                                               seconds=probe_run.elapsed))
+        print(Fore.WHITE + "  " + locales.get("probe_metrics_counters", **counters))
+        for name in ProbeMetrics.HISTOGRAMS:
+            histogram = totals.histograms[name]
+            print(Fore.WHITE + "  " + locales.get(
+                "probe_metrics_latency", stage=locales.get(f"probe_metrics_stage_{name}"), count=histogram.count,
+                p50=ms(histogram.percentile(50)), p90=ms(histogram.percentile(90)),
+                p99=ms(histogram.percentile(99)), max=ms(histogram.max)
+            ))
+        ranked = sorted(
+            ((metrics.histograms['reply'].percentile(90), server) for server, metrics in probe_run.servers.items()
+             if metrics.histograms['reply'].count),
+            reverse=True
+        )[:slowest]
+        if ranked:
+            print(Fore.WHITE + "  " + locales.get("probe_metrics_slowest") + " " +
+                  ", ".join(f"{server} {p90:.1f}ms" for p90, server in ranked))
+        path = self.export_probe_metrics(probe_run)
+        if path:
+            print(Fore.WHITE + "  " + locales.get("probe_metrics_exported", path=path))
+        self.logger.info(f"NTP probe metrics ({probe_run.label}): {counters}")
+
+    def _plan_ntp_probe(self, servers: List[str]) -> Tuple[List[str], List[str]]:
+        """Порядок проверки по истории этой сети: сначала серверы, хорошо отвечавшие раньше.
+        Серверы, подряд не отвечавшие в нескольких запусках, пропускаются до периодической
+        перепроверки. Возвращает (серверы для проверки, пропущенные серверы)."""
+        planned, skipped = self.ntp_history.plan(servers, self.ntp_history.stats(self._get_network_key()))
+        if not planned:
+            # Давно не отвечает ни один сервер — скорее всего, дело было в сети, проверяем всё
+            return list(servers), []
+        return planned, skipped
+
+    @staticmethod
+    def _annotate_history(results: List[dict], history: Dict[str, dict]) -> None:
+        """Добавляет к результатам историю прошлых запусков: history_runs, history_successes
+        и rtt_trend — изменение RTT (%) относительно медианы последних успешных проверок"""
+        for result in results:
+            entry = history.get(result['server'])
+            result['history_runs'] = entry['runs'] if entry else 0
+            result['history_successes'] = entry['successes'] if entry else 0
+            previous = entry['rtts'][:5] if entry else []
+            if previous and result['avg_rtt'] is not None:
+                baseline = statistics.median(previous)
+                result['rtt_trend'] = (result['avg_rtt'] - baseline) / baseline * 100 if baseline else 0.0
+            else:
+                result['rtt_trend'] = None
+
+    @staticmethod
+    def _pending_rtt_lower_bound(progress: dict, count: int, timeout: float, now: float) -> float:
+        """Нижняя граница итогового RTT (мс) ещё не завершённой проверки сервера.
+        Попытки к адресу идут последовательно, поэтому адрес, не ответивший за elapsed,
+        получит средний RTT не меньше elapsed / count. Ожидание темпа в RTT не входит
+        и из elapsed вычитается (progress['pace_wait']). Для пула граница — медиана по адресам,
+        для имени с IPv4 и IPv6 — лучшая из границ семейств.
+        Имя, не разрешившееся за timeout, считается неконкурентоспособным."""
+        families = progress.get('families')
+        if families is None:
+            return float('inf') if now - progress['started'] > timeout else 0.0
+        if not families:
+            return float('inf')
+        # Сервер может выиграть на любом семействе адресов — берём лучшую из границ
+        addresses = progress['addresses']
+        pace_wait = progress.get('pace_wait', lambda address: 0.0)
+        bounds = []
+        for family in families.values():
+            if family['started'] is None:
+                return 0.0
+            elapsed = now - family['started']
+            bounds.append(statistics.median(
+                addresses[address] if addresses[address] is not None
+                else max(0.0, elapsed - pace_wait(address)) * 1000 / count
+                for address in family['addresses']
+            ))
+        return min(bounds)
+
+    def _refresh_probe_in_background(self, server: str, count: int, timeout: float) -> None:
+        """Запускает фоновую перепроверку сервера (не более одной одновременно на сервер)"""
+        with self._probe_refresh_lock:
+            if server in self._probe_refreshes:
+                return
+            self._probe_refreshes.add(server)
+
+        def refresh() -> None:
+            try:
+                self._test_ntp_server(server, count=count, timeout=timeout)
+            except Exception as e:
+                self.logger.debug(f"Background NTP refresh of {server} failed: {e}")
+            finally:
+                with self._probe_refresh_lock:
+                    self._probe_refreshes.discard(server)
+
+        threading.Thread(target=refresh, name=f"ntp-refresh-{server}", daemon=True).start()
+
+    def _get_ntp_probe_result(self, server: str, count: int = 3, timeout: float = 3) -> dict:
+        """Результат проверки сервера с учётом кэша: свежий возвращается сразу, устаревший —
+        тоже сразу, но с фоновым обновлением. Блокирующая проверка выполняется только если
+        данных нет. Неудачные результаты не кэшируются: сбой мог быть временным."""
+        cached, fresh = self.ntp_probe_cache.get(self._get_network_key(), server)
+        if cached and cached['status'] == 'Reachable':
+            age = time.time() - cached['checked_at']
+            if not fresh:
+                self._refresh_probe_in_background(server, count, timeout)
+            print(Fore.CYAN + locales.get("ntp_verify_cached", seconds=int(age)))
+            return cached
+        prefetched = self._take_prefetched_ntp_result(server, wait_s=count * timeout + 5)
+        if prefetched:
+            print(Fore.CYAN + locales.get("ntp_verify_prefetched",
+                                          seconds=int(time.time() - prefetched['prefetched_at'])))
+            return prefetched
+        return self._test_ntp_server(server, count=count, timeout=timeout)
+
+    # Сколько предсказанных серверов проверяется заранее, пока идёт подключение к устройству
+    ntp_prefetch_limit = 6
+    # Сколько секунд результат заблаговременной проверки (в том числе неудачный) заменяет проверку
+    ntp_prefetch_max_age = 180
+
+    def prefetch_ntp_verification(self, servers: Optional[List[str]] = None,
+                                  count: int = 3, timeout: float = 3) -> None:
+        """Запускает проверку серверов-кандидатов в фоне, пока идёт подключение к устройству
+        (ожидание разрешения отладки на ТВ длится до connection_timeout секунд).
+        verify_ntp_server берёт готовый результат или дожидается идущей проверки вместо новой.
+        Без servers кандидаты предсказываются уже в фоновом потоке: определение сети
+        запускает route/ARP и не должно задерживать подключение."""
+        def prefetch() -> None:
+            try:
+                self._prefetch_ntp_servers(self._predicted_ntp_servers() if servers is None else servers,
+                                           count, timeout)
+            except Exception as e:
+                self.logger.debug(f"NTP prefetch failed: {e}")
+
+        threading.Thread(target=prefetch, name="ntp-prefetch", daemon=True).start()
+
+    def _prefetch_ntp_servers(self, servers: List[str], count: int, timeout: float) -> None:
+        """Проверка для prefetch_ntp_verification (в фоновом потоке): будущие результаты
+        регистрируются до начала проверки и заполняются по мере ответа каждого сервера"""
+        network_key = self._get_network_key()
+        now = time.time()
+        with self._probe_refresh_lock:
+            for server, future in list(self._ntp_prefetch.items()):
+                if future.done() and (not future.result()
+                                      or now - future.result()['prefetched_at'] > self.ntp_prefetch_max_age):
+                    del self._ntp_prefetch[server]
+            # Серверы со свежим результатом в кэше проверять заранее незачем
+            pending = [
+                server for server in dict.fromkeys(servers)
+                if server not in self._ntp_prefetch and not self.ntp_probe_cache.get(network_key, server)[1]
+            ]
+            futures = {server: Future() for server in pending}
+            self._ntp_prefetch.update(futures)
+        if not pending:
+            return
+
+        def resolve(result: dict) -> None:
+            # Каждый сервер готов, как только получен его результат, не дожидаясь остальных
+            future = futures.get(result['server'])
+            if future and not future.done():
+                future.set_result(dict(result, prefetched_at=time.time()))
+
+        self.logger.info(f"Prefetching NTP verification of {', '.join(pending)}")
+        try:
+            self._probe_ntp_servers(pending, count=count, timeout=timeout, on_result=resolve)
+        finally:
+            for future in futures.values():
+                if not future.done():
+                    future.set_result(None)
+
+    def _take_prefetched_ntp_result(self, server: str, wait_s: float) -> Optional[dict]:
+        """Результат заблаговременной проверки сервера (ждёт не дольше wait_s, если она ещё идёт)"""
+        with self._probe_refresh_lock:
+            future = self._ntp_prefetch.get(server)
+        if future is None:
+            return None
+        if not future.done():
+            print(Fore.CYAN + locales.get("ntp_verify_prefetch_wait"))
+        try:
+            result = future.result(timeout=wait_s)
+        except TimeoutError:
+            return None
+        with self._probe_refresh_lock:
+            if self._ntp_prefetch.get(server) is future:
+                del self._ntp_prefetch[server]
+        if not result or time.time() - result['prefetched_at'] > self.ntp_prefetch_max_age:
+            return None
+        return result
+
+    def _predicted_ntp_servers(self) -> List[str]:
+        """Серверы, которые вероятнее всего будут установлены: избранные, лучшие из профиля
+        текущей сети и пулы стран региона пользователя"""
+        predicted = list(self.saved_servers.get('favorite_servers', []))
+        profile = self.ntp_profiles.get(self._get_network_fingerprint())
+        if profile:
+            predicted += [result['server'] for result in profile['servers'][:3]]
+        priority_servers, _region_info = self._detect_user_region()
+        predicted += priority_servers[:3]
+        return list(dict.fromkeys(predicted))[:self.ntp_prefetch_limit]
+
+    # Сколько секунд консенсус точного времени считается действительным
+    time_consensus_ttl = 600
+    # Допустимое расхождение сервера с консенсусом (с)
+    time_consensus_tolerance = 1.0
+
+    def _update_time_consensus(self, results: List[dict]) -> None:
+        consensus = build_time_consensus(results)
+        if consensus:
+            self._time_consensus = consensus
+            self.logger.debug(
+                f"Time consensus: PC clock offset {consensus.offset:+.3f}s "
+                f"(±{(consensus.high - consensus.low) / 2:.3f}s, {consensus.agreeing}/{consensus.total} servers)"
+            )
+
+    def _get_time_consensus(self) -> Optional[TimeConsensus]:
+        """Действующий консенсус точного времени: из последней проверки серверов или,
+        если её не было, из свежих результатов кэша этой сети. Новых запросов не делает."""
+        consensus = self._time_consensus
+        if consensus and time.time() - consensus.measured_at <= self.time_consensus_ttl:
+            return consensus
+        consensus = build_time_consensus(self.ntp_probe_cache.fresh_results(self._get_network_key()))
+        if consensus:
+            self._time_consensus = consensus
+        return consensus
+
+    def _consensus_deviation(self, result: dict, consensus: TimeConsensus) -> float:
+        """Насколько интервал правильности сервера не достаёт до пересечения консенсуса (с)"""
+        margin = (result.get('root_distance') or 0.0) / 1000
+        if result['offset'] + margin < consensus.low:
+            return consensus.low - (result['offset'] + margin)
+        if result['offset'] - margin > consensus.high:
+            return (result['offset'] - margin) - consensus.high
+        return 0.0
+
+    def _offset_acceptable(self, result: dict) -> bool:
+        """Время сервера правдоподобно: согласуется с консенсусом, а без него — с часами ПК (до 60 с)"""
+        if result['offset'] is None:
+            return False
+        consensus = self._get_time_consensus()
+        if consensus:
+            return self._consensus_deviation(result, consensus) <= self.time_consensus_tolerance
+        return abs(result['offset']) <= 60
+
+    def _test_ntp_server(self, server: str, count: int = 2, timeout: int = 2) -> dict:
+        """Проверка NTP-сервера с несколькими попытками и детальной диагностикой ошибок.
+        Используется в verify_ntp_server; пункты 6 и 9 проверяют весь каталог через _probe_ntp_servers.
+        Возвращает dict с метриками и статусом."""
+        return self._probe_ntp_servers([server], count=count, timeout=timeout)[0]
+
+    @staticmethod
+    def _ntp_result_sort_key(result: dict) -> tuple:
+        """Reachable servers first, falsetickers (disagreeing with the time consensus) last among them,
+        deep-probed finalists before sweep-only results, then by quality score and avg RTT"""
+        return (result['status'] != 'Reachable', result.get('falseticker') is not None,
+                not result.get('finalist', True),
+                -(result.get('score') or 0.0), result['avg_rtt'] or float('inf'))
+
+    @staticmethod
+    def _format_ntp_result_row(result: dict) -> str:
+        server_display = result['server'][:30] + '..' if len(result['server']) > 32 else result['server']
+
+        if result['avg_rtt'] is not None:
+            rtt_display = f"{result['avg_rtt']:.1f}ms"
+            minmax_display = f"{result['min_rtt']:.1f}/{result['max_rtt']:.1f}"
+        else:
+            rtt_display = "N/A"
+            minmax_display = "N/A"
+
+        ip_results = result.get('ip_results') or []
+        if len(ip_results) > 1:
+            reachable_ips = sum(1 for ip in ip_results if ip['avg_rtt'] is not None)
+            ips_display = f"{reachable_ips}/{len(ip_results)}"
+        else:
+            ips_display = "1" if ip_results else "-"
+
+        success_display = f"{result['success_rate']:.0f}%"
+        # По одному запросу быстрого прохода джиттер не определить
+        jitter_display = (f"{result['jitter']:.1f}ms"
+                          if result.get('jitter') is not None and result.get('finalist', True) else "-")
+        stratum_display = str(result['stratum']) if result.get('stratum') is not None else "-"
+        score_display = f"{result['score']:.0f}" if result.get('score') else "-"
+
+        if result.get('history_runs'):
+            history_display = f"{result['history_successes']}/{result['history_runs']}"
+        else:
+            history_display = "new" if 'history_runs' in result else "-"
+        trend_display = f"{round(result['rtt_trend']):+d}%" if result.get('rtt_trend') is not None else "-"
+
+        if result.get('address') == result['server']:
+            dns_display = "-"
+        elif result.get('dns_cached'):
+            dns_display = "cache"
+        elif result.get('dns_ms') is not None:
+            dns_display = f"{result['dns_ms']:.0f}ms"
+        else:
+            dns_display = "N/A"
+
+        # Доступный сервер, чьё время расходится с консенсусом, ставить на устройство нельзя
+        status_display = 'Falseticker' if result.get('falseticker') is not None else result['status']
+
+        return (
+            result['color'] +
+            f"{server_display:<32} {status_display:<12} {rtt_display:<9} {minmax_display:<13} "
+            f"{success_display:<8} {jitter_display:<8} {stratum_display:<4} {score_display:<6} "
+            f"{ips_display:<5} {dns_display:<7} {history_display:<7} {trend_display:<6}"
+        )
+
+    @staticmethod
+    def _ntp_table_header() -> List[str]:
+        return [
+            Fore.YELLOW + f"{'Server':<32} {'Status':<12} {'Avg RTT':<9} {'Min/Max':<13} {'Success':<8} "
+                          f"{'Jitter':<8} {'Str':<4} {'Score':<6} {'IPs':<5} {'DNS':<7} {'Hist':<7} {'Trend':<6}",
+            "-" * 128,
+        ]
+
+    def _render_live_ntp_table(self, results: List[dict], progress: str,
+                               prev_lines: int, max_rows: int = 15) -> int:
+        """Перерисовывает живую таблицу лучших серверов поверх предыдущей.
+        Возвращает число выведенных строк (для следующей перерисовки)."""
+        ranked = sorted(results, key=self._ntp_result_sort_key)[:max_rows]
+        lines = [Fore.CYAN + progress]
+        lines.extend(self._ntp_table_header())
+        lines.extend(self._format_ntp_result_row(r) for r in ranked)
+
+        if prev_lines:
+            # Курсор на начало предыдущей таблицы и очистка до конца экрана
+            sys.stdout.write(f"\033[{prev_lines}A\r\033[J")
+        sys.stdout.write("\n".join(lines) + Style.RESET_ALL + "\n")
+        sys.stdout.flush()
+        return len(lines)
+
+    def ping_ntp_servers(self, timeout=2, count=3, max_in_flight=256, finalists=None):
         """
-        Check NTP servers reliability using ntplib with enhanced error handling
+        Check NTP servers reliability with the built-in SNTP client.
+        Every server first gets a single quick probe; only the best finalists
+        are then probed repeatedly for jitter and stability. The table of best
+        servers is redrawn live as results arrive.
 
         Args:
             timeout (int): Timeout for NTP server connection in seconds
-            count (int): Number of attempts to connect to each server
+            count (int): Number of attempts to connect to each finalist
+            max_in_flight (int): Maximum number of servers probed at the same time
+            finalists (int): Number of servers probed repeatedly after the quick sweep
         """
         self.logger.info("Starting NTP servers ping test")
         print(Fore.GREEN + locales.get("ping_ntp_servers_start"))
 
-        # Combine country NTP servers and custom NTP servers, removing duplicates
-        all_servers = list(dict.fromkeys(
-            list(self.ntp_servers.values()) + self.custom_ntp_servers
-        ))
+        # Country pools and alternative servers from the catalog's default set
+        all_servers = self._default_probe_servers()
+        # Historically good servers first; long-dead ones wait for a periodic recheck
+        all_servers, skipped = self._plan_ntp_probe(all_servers)
 
         total_servers = len(all_servers)
-        self.logger.info(f"Total NTP servers to check: {total_servers}")
-
-        server_ping_results = []
-        reachable_count = 0
-        unreachable_count = 0
-
-        for idx, server in enumerate(all_servers, 1):
-            progress = f"[{idx}/{total_servers}]"
-            print(Fore.CYAN + f"\r{progress} Checking: {server:<40}", end="", flush=True)
-
-            result = self._test_ntp_server(server, count=count, timeout=timeout)
-            server_ping_results.append(result)
+        self.logger.info(f"Total NTP servers to check: {total_servers}, skipped by history: {len(skipped)}")
+
+        # Результат углублённой проверки заменяет результат быстрого прохода того же сервера
+        results_by_server: Dict[str, dict] = {}
+        swept = 0
+        deep_checked = 0
+        deep_total = 0
+
+        live = sys.stdout.isatty()
+        table_lines = 0
+        last_render = 0.0
+        started = time.time()
+
+        def progress_line() -> str:
+            if deep_total:
+                return locales.get("ping_deep_progress", checked=deep_checked, total=deep_total)
+            reachable = sum(1 for r in results_by_server.values() if r['status'] == 'Reachable')
+            return locales.get("ping_live_progress", checked=swept, total=total_servers, found=reachable)
+
+        def show_progress(final: bool) -> None:
+            nonlocal table_lines, last_render
+            if live:
+                # Ограничиваем частоту перерисовки, чтобы не мерцать на сотнях ответов
+                now = time.time()
+                if now - last_render >= 0.1 or final:
+                    table_lines = self._render_live_ntp_table(
+                        list(results_by_server.values()), progress_line(), table_lines
+                    )
+                    last_render = now
+            else:
+                print(Fore.CYAN + "\r" + progress_line(), end="", flush=True)
+
+        def handle_sweep_result(result: dict) -> None:
+            nonlocal swept, deep_total
+            swept += 1
+            results_by_server[result['server']] = result
+            show_progress(swept == total_servers)
+            if swept == total_servers:
+                deep_total = min(finalists or self.ntp_deep_probe_finalists,
+                                 sum(1 for r in results_by_server.values() if r['status'] == 'Reachable'))
+
+        def handle_deep_result(result: dict) -> None:
+            nonlocal deep_checked
+            deep_checked += 1
+            results_by_server[result['server']] = result
+            server = result['server']
             if result['status'] == 'Reachable':
-                reachable_count += 1
                 self.logger.debug(f"Server {server}: Reachable, avg RTT={result['avg_rtt']:.2f}ms, success={result['success_rate']:.0f}%")
             else:
-                unreachable_count += 1
-                self.logger.debug(f"Server {server}: Unreachable, error={result.get('error')}")
+                self.logger.debug(f"Server {server}: {result['status']}, error={result.get('error')}")
+            show_progress(deep_checked == deep_total)
+
+        with self._probe_metrics_run('ping') as probe_run:
+            self._probe_ntp_servers_tiered(all_servers, count=count, timeout=timeout, finalists=finalists,
+                                           max_in_flight=max_in_flight,
+                                           on_sweep_result=handle_sweep_result, on_result=handle_deep_result)
+
+        if not live:
+            # Clear progress line
+            print("\r" + " " * 80 + "\r", end="")
+
+        # Candidates are judged against the time consensus of the servers, as in verify and auto setup
+        consensus = self._get_time_consensus()
+        falsetickers = []
+        if consensus:
+            for result in results_by_server.values():
+                if result['status'] != 'Reachable' or result['offset'] is None:
+                    continue
+                deviation = self._consensus_deviation(result, consensus)
+                if deviation > self.time_consensus_tolerance:
+                    result['falseticker'] = deviation
+                    result['color'] = Fore.MAGENTA
+                    falsetickers.append(result)
 
-        # Clear progress line
-        print("\r" + " " * 60 + "\r", end="")
-
-        # Sort results: reachable servers first, sorted by success rate and avg RTT
-        server_ping_results.sort(
-            key=lambda x: (x['status'] != 'Reachable', -x['success_rate'], x['avg_rtt'] or float('inf'))
-        )
+        # Sort results: reachable finalists first, sorted by quality score
+        server_ping_results = sorted(results_by_server.values(), key=self._ntp_result_sort_key)
+        reachable_count = sum(1 for r in server_ping_results if r['status'] == 'Reachable')
+        unreachable_count = len(server_ping_results) - reachable_count
 
         # Display summary
         print(Fore.GREEN + f"\n{locales.get('ping_results_summary')}")
         print(Fore.WHITE + f"  {locales.get('total_servers')}: {total_servers}")
         print(Fore.GREEN + f"  {locales.get('reachable_servers')}: {reachable_count}")
         print(Fore.RED + f"  {locales.get('unreachable_servers')}: {unreachable_count}")
+        rate_limited = [r for r in server_ping_results if r.get('kod') and r['status'] != 'Reachable']
+        if rate_limited:
+            print(Fore.MAGENTA + "  " + locales.get("ping_rate_limited", count=len(rate_limited)))
+        if falsetickers:
+            print(Fore.MAGENTA + "  " + locales.get(
+                "ping_falsetickers", count=len(falsetickers), agreeing=consensus.agreeing,
+                tolerance=self.time_consensus_tolerance
+            ))
+            for result in sorted(falsetickers, key=lambda r: -r['falseticker']):
+                print(Fore.MAGENTA + "    " + locales.get(
+                    "ping_falseticker_row", server=result['server'], offset=result['offset'],
+                    deviation=result['falseticker']
+                ))
+        if skipped:
+            print(Fore.WHITE + "  " + locales.get(
+                "ping_history_skipped", count=len(skipped), failures=self.ntp_history.max_failures,
+                hours=self.ntp_history.recheck_interval / 3600
+            ))
+        print(Fore.WHITE + "  " + locales.get(
+            "ping_deep_summary", finalists=sum(1 for r in server_ping_results if r.get('finalist')), count=count
+        ))
+        print(Fore.WHITE + "  " + locales.get("ping_elapsed", seconds=time.time() - started))
+        # Те же счётчики, что и в сводке метрик ниже: каждое имя учитывается один раз за запуск
+        totals = probe_run.totals()
+        dns_histogram = totals.histograms['dns']
+        print(Fore.WHITE + "  " + locales.get(
+            "ping_dns_summary",
+            resolved=totals.counters['dns_lookups'], cached=totals.counters['dns_cached'],
+            avg=(dns_histogram.total / dns_histogram.count) if dns_histogram.count else 0.0,
+            max=dns_histogram.max or 0.0
+        ))
         print()
 
         # Display results table
-        print(Fore.YELLOW + f"{'Server':<35} {'Status':<12} {'Avg RTT':<12} {'Min/Max RTT':<15} {'Success':<10}")
-        print("-" * 85)
+        for line in self._ntp_table_header():
+            print(line)
+
+        for result in server_ping_results:
+            print(self._format_ntp_result_row(result))
+
+        pool_results = [r for r in server_ping_results if len(r.get('ip_results') or []) > 1 and r['best_ip']]
+        if pool_results:
+            # Для пулов — лучший конкретный адрес, его можно закрепить на устройстве вместо имени
+            print(Fore.GREEN + "\n" + locales.get("ping_pool_best_ips"))
+            for result in pool_results:
+                best = result['ip_results'][0]
+                print(Fore.WHITE + f"  {result['server']:<35} {best['address']:<40} {best['avg_rtt']:.1f}ms  "
+                      f"(spread {result['rtt_spread']:.1f}ms)")
+
+        dual_stack = [r for r in server_ping_results if len(r.get('families') or {}) > 1]
+        if dual_stack:
+            # Семейство-победитель — его адрес стоит закреплять на устройстве
+            print(Fore.GREEN + "\n" + locales.get("ping_dual_stack_title"))
+            for result in dual_stack:
+                winner = result['family'] or '-'
+                print(Fore.WHITE + f"  {result['server']:<35} {winner:<5} {result['best_ip'] or '-':<40} "
+                      f"{self._format_family_stats(result)}")
+
+        self.show_probe_metrics(probe_run)
+        self.logger.info(f"NTP ping test completed: {reachable_count} reachable, {unreachable_count} unreachable")
+	
+    def _monitor_servers(self) -> List[str]:
+        """Серверы мониторинга: избранные и пулы стран основного набора"""
+        return list(dict.fromkeys(
+            self.saved_servers.get('favorite_servers', []) + self.ntp_catalog.select(tags=('default', 'country'))
+        ))
+
+    # Сколько адресов одного имени (пула) опрашивать в каждом раунде мониторинга
+    monitor_addresses_per_host = 2
+
+    def monitor_ntp_servers(self, interval: float = 60, timeout: float = 2,
+                            window: float = 900, capacity: int = 2880) -> None:
+        """
+        Непрерывный мониторинг NTP-серверов: раз в interval секунд каждому серверу отправляется
+        один запрос. Замеры хранятся в кольцевых буферах на capacity значений (память постоянна),
+        таблица показывает перцентили RTT и потери за всё время и за последние window секунд.
+        Почасовая статистика копится в истории сети; Ctrl+C останавливает мониторинг и
+        показывает, в какие часы суток серверы работают хуже.
+        Замеры мониторинга в кэш проверок для выбора сервера не попадают, а у пулов
+        опрашивается не больше monitor_addresses_per_host адресов, чтобы долгий мониторинг
+        с многих ПК не нагружал серверы пула.
+        """
+        servers = self._monitor_servers()
+        if not servers:
+            print(Fore.YELLOW + locales.get("monitor_no_servers"))
+            return
 
-        for result in server_ping_results:
-            server_display = result['server'][:33] + '..' if len(result['server']) > 35 else result['server']
+        self.logger.info(f"NTP monitor started: {len(servers)} servers every {interval}s")
+        series = {server: NTPServerSeries(capacity) for server in servers}
+        network_key = self._get_network_key()
+        live = sys.stdout.isatty()
+        table_lines = 0
+        rounds = 0
 
-            if result['avg_rtt'] is not None:
-                rtt_display = f"{result['avg_rtt']:.1f}ms"
-                minmax_display = f"{result['min_rtt']:.1f}/{result['max_rtt']:.1f}ms"
-            else:
-                rtt_display = "N/A"
-                minmax_display = "N/A"
+        # Ctrl+C здесь завершает только мониторинг, а не всё приложение
+        previous_handler = signal.signal(signal.SIGINT, signal.default_int_handler)
+        try:
+            while True:
+                started = time.time()
+                results = self._probe_ntp_servers(servers, count=1, timeout=timeout, cache_results=False,
+                                                  max_addresses=self.monitor_addresses_per_host)
+                measured_at = time.time()
+                for result in results:
+                    reachable = result['status'] == 'Reachable'
+                    series[result['server']].add(measured_at, result['avg_rtt'] if reachable else None,
+                                                 result['offset'] if reachable else None)
+                rounds += 1
+                self.ntp_history.add_hourly(network_key, [
+                    (server, *row) for server, data in series.items() for row in data.drain_hourly()
+                ])
+
+                lines = [Fore.CYAN + locales.get("monitor_status", count=len(servers), interval=interval,
+                                                 rounds=rounds, window=window / 60)]
+                lines.extend(self._format_monitor_table(series, window, measured_at))
+                if live and table_lines:
+                    sys.stdout.write(f"\033[{table_lines}A\r\033[J")
+                sys.stdout.write("\n".join(lines) + Style.RESET_ALL + "\n")
+                sys.stdout.flush()
+                table_lines = len(lines)
+
+                time.sleep(max(0.0, interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            print(Fore.YELLOW + "\n" + locales.get("monitor_stopped", rounds=rounds))
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+            self.ntp_history.add_hourly(network_key, [
+                (server, *row) for server, data in series.items() for row in data.drain_hourly()
+            ])
 
-            success_display = f"{result['success_rate']:.0f}%"
+        self.logger.info(f"NTP monitor stopped after {rounds} rounds")
+        self.show_hourly_ntp_profile(servers)
 
-            print(
-                result['color'] +
-                f"{server_display:<35} {result['status']:<12} {rtt_display:<12} {minmax_display:<15} {success_display:<10}"
+    @staticmethod
+    def _format_monitor_table(series: Dict[str, NTPServerSeries], window: float, now: float,
+                              max_rows: int = 25) -> List[str]:
+        def ms(value: Optional[float]) -> str:
+            return f"{value:.1f}" if value is not None else "-"
+
+        def pct(value: Optional[float]) -> str:
+            return f"{value:.0f}%" if value is not None else "-"
+
+        rows = []
+        for server, data in series.items():
+            overall = data.summary()
+            recent = data.summary(window, now)
+            rows.append((server, overall, recent))
+        # Сначала серверы с ответами, по медиане RTT за последнее окно
+        rows.sort(key=lambda row: (row[2]['p50'] is None, row[2]['p50'] or 0.0))
+
+        lines = [
+            Fore.YELLOW + f"{'Server':<32} {'Samples':<8} {'Loss':<6} {'p50':<8} {'p95':<8} {'p99':<8} "
+                          f"{'Jitter':<8} {'Win p50':<8} {'Win p95':<8} {'Win loss':<8}",
+            "-" * 110,
+        ]
+        for server, overall, recent in rows[:max_rows]:
+            server_display = server[:30] + '..' if len(server) > 32 else server
+            color = Fore.GREEN if recent['p50'] is not None and not recent['loss'] else (
+                Fore.YELLOW if recent['p50'] is not None else Fore.RED)
+            lines.append(
+                color +
+                f"{server_display:<32} {overall['samples']:<8} {pct(overall['loss']):<6} {ms(overall['p50']):<8} "
+                f"{ms(overall['p95']):<8} {ms(overall['p99']):<8} {ms(overall['jitter']):<8} "
+                f"{ms(recent['p50']):<8} {ms(recent['p95']):<8} {pct(recent['loss']):<8}"
             )
+        return lines
+
+    def show_hourly_ntp_profile(self, servers: Optional[List[str]] = None) -> None:
+        """Показывает по накопленной истории сети, в какие часы суток серверы работают хуже:
+        '.' — нет данных, '-' — норма, '+' — средний RTT в 1.5+ раза выше обычного для сервера,
+        '!' — потери больше 5%"""
+        hourly = self.ntp_history.hourly(self._get_network_key())
+        if servers is not None:
+            hourly = {server: hours for server, hours in hourly.items() if server in servers}
+        if not hourly:
+            print(Fore.YELLOW + locales.get("monitor_no_hourly"))
+            return
+
+        print(Fore.GREEN + "\n" + locales.get("monitor_hourly_title"))
+        print(Fore.WHITE + locales.get("monitor_hourly_legend"))
+        print(Fore.YELLOW + f"{'Server':<32} " + "".join(str(hour % 10) for hour in range(24)))
+        degraded = []
+        for server in sorted(hourly):
+            hours = hourly[server]
+            means = {hour: rtt_sum / (samples - lost) for hour, (samples, lost, rtt_sum) in hours.items()
+                     if samples > lost}
+            typical = statistics.median(means.values()) if means else None
+            marks = []
+            for hour in range(24):
+                if hour not in hours:
+                    marks.append('.')
+                    continue
+                samples, lost, _rtt_sum = hours[hour]
+                loss = lost / samples * 100
+                mean = means.get(hour)
+                if loss > 5:
+                    marks.append('!')
+                elif mean is not None and typical and mean > typical * 1.5:
+                    marks.append('+')
+                else:
+                    marks.append('-')
+                if marks[-1] != '-':
+                    degraded.append((server, hour, loss, mean, typical))
+            server_display = server[:30] + '..' if len(server) > 32 else server
+            print(Fore.WHITE + f"{server_display:<32} " + "".join(marks))
+
+        if degraded:
+            print(Fore.YELLOW + "\n" + locales.get("monitor_degraded_title"))
+            for server, hour, loss, mean, typical in degraded:
+                print(Fore.WHITE + "  " + locales.get(
+                    "monitor_degraded_row", server=server, hour=hour, loss=loss,
+                    rtt=f"{mean:.1f}" if mean is not None else "-",
+                    typical=f"{typical:.1f}" if typical is not None else "-"
+                ))
 
-        self.logger.info(f"NTP ping test completed: {reachable_count} reachable, {unreachable_count} unreachable")
-	
     def load_saved_servers(self) -> dict:
         """Загружает сохраненные серверы из файла"""
         if self.servers_file.exists():
@@ -1051,10 +3472,10 @@ class AndroidTVTimeFixer:
     @staticmethod
     def validate_ntp_server(server: str) -> bool:
         """
-        Проверяет валидность NTP сервера (доменное имя или IP адрес)
+        Проверяет валидность NTP сервера (доменное имя, IPv4 или IPv6 адрес)
 
         Args:
-            server: Строка с адресом NTP сервера
+            server: Строка с адресом NTP сервера; IPv6 может быть в квадратных скобках
 
         Returns:
             bool: True если формат валидный, False в противном случае
@@ -1062,11 +3483,15 @@ class AndroidTVTimeFixer:
         if not server:
             return False
 
-        # Проверка на IP адрес
-        ip_pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-        if re.match(ip_pattern, server):
-            octets = server.split('.')
-            return all(0 <= int(octet) <= 255 for octet in octets)
+        # Проверка на IP адрес (IPv6 — в том числе победитель проверки по семействам адресов).
+        # Адрес с зоной (fe80::1%eth0) отвергается: зона относится к интерфейсу ПК, а не ТВ
+        literal = server[1:-1] if server.startswith('[') and server.endswith(']') else server
+        try:
+            address = ipaddress.ip_address(literal)
+        except ValueError:
+            pass
+        else:
+            return not getattr(address, 'scope_id', None)
 
         # Проверка на валидное доменное имя
         # Доменное имя может содержать буквы, цифры, дефисы и точки
@@ -1114,7 +3539,8 @@ class AndroidTVTimeFixer:
             print(Fore.YELLOW + "5. " + locales.get("remove_server_from_favorites"))
             print(Fore.YELLOW + "6. " + locales.get("ping_ntp_menu"))
             print(Fore.YELLOW + "7. " + locales.get("export_import_menu"))
-            print(Fore.YELLOW + "8. " + locales.get("return_to_main_menu"))
+            print(Fore.YELLOW + "8. " + locales.get("monitor_ntp_menu"))
+            print(Fore.YELLOW + "9. " + locales.get("return_to_main_menu"))
 
             choice = input(Fore.GREEN + locales.get("select_action") + " " + Fore.WHITE).strip()
 
@@ -1198,13 +3624,40 @@ class AndroidTVTimeFixer:
                 self.export_import_menu()
 
             elif choice == '8':
+                self.logger.info("Submenu: Monitor NTP servers")
+                raw = input(Fore.GREEN + locales.get("monitor_interval_prompt") + Fore.WHITE).strip()
+                try:
+                    interval = float(raw) if raw else 60.0
+                except ValueError:
+                    print(Fore.RED + locales.get("enter_valid_number"))
+                    continue
+                # Не чаще раза в 15 секунд: минимальный интервал опроса SNTP-клиента (RFC 4330)
+                self.monitor_ntp_servers(interval=max(15.0, interval))
+
+            elif choice == '9':
                 break
             else:
                 print(Fore.RED + locales.get("invalid_choice"))
 
     @staticmethod
     def parse_ip_port(address: str) -> Tuple[str, int]:
-        """Разбирает адрес вида 'ip' или 'ip:port'. Возвращает (ip, port), порт по умолчанию 5555."""
+        """Разбирает адрес вида 'ip', 'ip:port', 'ipv6%iface' или '[ipv6%iface]:port'.
+        Возвращает (ip, port), порт по умолчанию 5555."""
+        address = address.strip()
+        if address.startswith('['):
+            host, _, rest = address[1:].partition(']')
+            port = 5555
+            if rest.startswith(':'):
+                try:
+                    port = int(rest[1:])
+                    if not (1 <= port <= 65535):
+                        port = 5555
+                except ValueError:
+                    port = 5555
+            return host.strip(), port
+        if address.count(':') > 1:
+            # IPv6 без квадратных скобок — порт указать нельзя
+            return address, 5555
         if ':' in address:
             parts = address.rsplit(':', 1)
             ip = parts[0]
@@ -1221,8 +3674,20 @@ class AndroidTVTimeFixer:
         return ip.strip(), port
 
     @staticmethod
-    def validate_ip(ip: str) -> bool:
-        """Проверяет IP-адрес, допускает формат ip или ip:port"""
+    def format_ip_port(host: str, port: int) -> str:
+        """Собирает адрес 'ip:port', IPv6-адрес оборачивается в квадратные скобки."""
+        return f"[{host}]:{port}" if ':' in host else f"{host}:{port}"
+
+    @classmethod
+    def validate_ip(cls, ip: str) -> bool:
+        """Проверяет IP-адрес, допускает формат ip, ip:port, ipv6%iface или [ipv6%iface]:port"""
+        if ip.startswith('[') or ip.count(':') > 1:
+            host, _port = cls.parse_ip_port(ip)
+            try:
+                ipaddress.IPv6Address(host)
+                return True
+            except ValueError:
+                return False
         # Отделяем порт если есть
         if ':' in ip:
             ip = ip.rsplit(':', 1)[0]
@@ -1318,26 +3783,31 @@ class AndroidTVTimeFixer:
         print(result.stdout)
     
     def connect_or_reuse(self, ip: str) -> None:
-        """Подключается к устройству или переиспользует существующее соединение"""
+        """Подключается к устройству или переиспользует открытое соединение из пула"""
         host, port = self.parse_ip_port(ip)
-        normalized = f"{host}:{port}"
-        if self.device and self.connected_ip == normalized:
-            try:
-                # Проверяем, что соединение ещё активно
-                self.device.shell('echo ok')
-                self.logger.info(f"Reusing existing connection to {normalized}")
-                print(Fore.GREEN + locales.get("connection_reused", ip=normalized))
-                return
-            except Exception:
-                # Соединение потеряно, переподключаемся
-                self.device = None
-                self.connected_ip = None
+        normalized = self.format_ip_port(host, port)
+        # Пул проверяет, что соединение ещё активно; потерянное закрывается, и подключение идёт заново
+        device = self.adb_pool.get(normalized)
+        if device:
+            self.logger.info(f"Reusing existing connection to {normalized}")
+            self._use_device(device, host, port, reused=True)
+            print(Fore.GREEN + locales.get("connection_reused", ip=normalized))
+            return
+        self._drop_device(normalized)
         self.connect(ip)
 
+    def _drop_device(self, key: str) -> None:
+        """Закрывает соединение host:port и убирает его из пула; текущее устройство сбрасывается,
+        если это оно (соединение сломалось или больше не нужно)"""
+        self.adb_pool.discard(key)
+        if self.connected_ip == key:
+            self.device = None
+            self.connected_ip = None
+
     def verify_ntp_server(self, server: str, count: int = 3, timeout: int = 3) -> bool:
         """Проверяет что NTP-сервер действительно синхронизирует время (не просто доступен)"""
         print(Fore.CYAN + locales.get("ntp_verify_before_apply"))
-        result = self._test_ntp_server(server, count=count, timeout=timeout)
+        result = self._get_ntp_probe_result(server, count=count, timeout=timeout)
 
         if result['status'] != 'Reachable':
             print(Fore.RED + locales.get("ntp_verify_failed", server=server))
@@ -1355,7 +3825,23 @@ class AndroidTVTimeFixer:
             self.logger.warning(f"NTP server {server} rejected: missing offset")
             return False
 
-        if abs(avg_offset) > 60:
+        # Если есть консенсус нескольких серверов, сравниваем с ним, а не с часами ПК:
+        # неверные часы ПК не должны отсеивать хорошие серверы и пропускать плохие
+        consensus = self._get_time_consensus()
+        if consensus:
+            if abs(consensus.offset) > 60:
+                print(Fore.YELLOW + locales.get("ntp_verify_pc_clock_off", offset=consensus.offset,
+                                                agreeing=consensus.agreeing, total=consensus.total))
+            deviation = self._consensus_deviation(result, consensus)
+            if deviation > self.time_consensus_tolerance:
+                print(Fore.RED + locales.get("ntp_verify_consensus_mismatch", server=server, deviation=deviation,
+                                             agreeing=consensus.agreeing))
+                self.logger.warning(
+                    f"NTP server {server} rejected: {deviation:.3f}s away from consensus of "
+                    f"{consensus.agreeing}/{consensus.total} servers"
+                )
+                return False
+        elif abs(avg_offset) > 60:
             print(Fore.RED + locales.get("ntp_verify_bad_offset", server=server, offset=avg_offset))
             self.logger.warning(
                 f"NTP server {server} rejected: bad offset {avg_offset}"
@@ -1373,9 +3859,26 @@ class AndroidTVTimeFixer:
             raise AndroidTVTimeFixerError(locales.get("invalid_ip_format"))
 
         host, port = self.parse_ip_port(ip)
-
+        self._use_device(self._open_adb_device(host, port), host, port)
+
+    def _use_device(self, device: AdbDeviceTcp, host: str, port: int, reused: bool = False) -> None:
+        """Делает подключённое устройство текущим (соединение остаётся в пуле для повторного использования)"""
+        self.device = device
+        self.connected_ip = self.format_ip_port(host, port)
+        self.process_manager.device_ip = self.connected_ip
+        self.adb_pool.put(self.connected_ip, device)
+        self.adb_pool.pinned = self.connected_ip
+        if not reused:
+            self.logger.info(locales.get_en('connection_success', ip=host, port=port))
+
+    def _open_adb_device(self, host: str, port: int, cancel: Optional[threading.Event] = None,
+                         quiet: bool = False) -> AdbDeviceTcp:
+        """Открывает ADB-соединение, ожидая разрешения отладки на ТВ до connection_timeout секунд.
+        Текущее устройство не меняет, поэтому может выполняться в фоне (quiet — без вывода);
+        cancel прерывает ожидание."""
         # Проверяем доступность порта перед попыткой подключения
-        print(Fore.CYAN + locales.get("checking_port", ip=host, port=port))
+        if not quiet:
+            print(Fore.CYAN + locales.get("checking_port", ip=host, port=port))
         if not self._check_port_available(host, port):
             raise AndroidTVTimeFixerError(locales.get("port_not_available", ip=host, port=port))
 
@@ -1383,39 +3886,44 @@ class AndroidTVTimeFixer:
         signer = PythonRSASigner(pub, priv)
 
         start_time = time.time()
-        connection_established = False
+        device = None
         last_error = None
 
-        print(locales.get("waiting_for_connection", remaining_time=self.connection_timeout))
-        print(locales.get("confirm_connection"))
+        if not quiet:
+            print(locales.get("waiting_for_connection", remaining_time=self.connection_timeout))
+            print(locales.get("confirm_connection"))
 
-        while True:
+        while not (cancel and cancel.is_set()):
             remaining_time = int(self.connection_timeout - (time.time() - start_time))
             if remaining_time <= 0:
                 break
             try:
-                self.device = AdbDeviceTcp(host, port, default_transport_timeout_s=9.)
-                self.device.connect(rsa_keys=[signer], auth_timeout_s=min(15, remaining_time))
-                connection_established = True
-                self.connected_ip = f"{host}:{port}"
-                self.process_manager.device_ip = f"{host}:{port}"
-                self.logger.info(locales.get_en('connection_success', ip=host, port=port))
+                candidate = AdbDeviceTcp(host, port, default_transport_timeout_s=9.)
+                candidate.connect(rsa_keys=[signer], auth_timeout_s=min(15, remaining_time))
+                device = candidate
                 break
             except Exception as e:
                 last_error = str(e)
                 remaining_time = max(0, int(self.connection_timeout - (time.time() - start_time)))
-                print(locales.get("waiting_for_connection", remaining_time=remaining_time), end='')
+                if not quiet:
+                    print(locales.get("waiting_for_connection", remaining_time=remaining_time), end='')
                 if remaining_time > 0:
                     time.sleep(1)
 
-        print()  # Новая строка после завершения ожидания
+        if not quiet:
+            print()  # Новая строка после завершения ожидания
 
-        if not connection_established:
+        if device and cancel and cancel.is_set():
+            # Подключение завершилось уже после отмены: устройство не понадобилось
+            device.close()
+            device = None
+        if not device:
             raise AndroidTVTimeFixerError(
                 locales.get("connection_failed", timeout=self.connection_timeout) + "\n" +
                 locales.get("ensure_steps") + "\n" +
                 locales.get("last_error", error=last_error)
             )
+        return device
 
     def get_current_ntp(self) -> str:
         if not self.device:
@@ -1460,11 +3968,18 @@ class AndroidTVTimeFixer:
 
     @staticmethod
     def _check_port_available(ip: str, port: int, timeout: float = 2.0) -> bool:
-        """Проверяет, открыт ли указанный порт на IP-адресе"""
+        """Проверяет, открыт ли указанный порт на IP-адресе (IPv4 или IPv6 с %scope)"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if ':' in ip:
+                # getaddrinfo превращает 'fe80::1%eth0' в sockaddr с scope_id
+                family, _type, _proto, _name, sockaddr = socket.getaddrinfo(
+                    ip, port, socket.AF_INET6, socket.SOCK_STREAM
+                )[0]
+            else:
+                family, sockaddr = socket.AF_INET, (ip, port)
+            sock = socket.socket(family, socket.SOCK_STREAM)
             sock.settimeout(timeout)
-            result = sock.connect_ex((ip, port))
+            result = sock.connect_ex(sockaddr)
             sock.close()
             return result == 0
         except Exception:
@@ -1537,54 +4052,94 @@ class AndroidTVTimeFixer:
     @classmethod
     def _get_default_route_local_ips(cls) -> List[str]:
         """Определяет local IP интерфейса основного маршрута без подключения к внешнему хосту."""
-        detected = []
+        detected = [local_ip for local_ip, _gateway, _iface in cls._get_default_routes()]
+        return [ip for ip in dict.fromkeys(detected) if cls._is_scannable_local_ip(ip)]
+
+    @classmethod
+    def _get_default_routes(cls) -> List[Tuple[str, str, str]]:
+        """Основные маршруты ОС: [(local IP, шлюз, интерфейс)], лучший первым.
+        Шлюз пустой для маршрута без next hop (on-link, PPP)."""
         try:
             if sys.platform == 'win32':
-                detected.extend(cls._get_windows_default_route_ips())
-            elif sys.platform == 'darwin':
-                detected.extend(cls._get_macos_default_route_ips())
-            else:
-                detected.extend(cls._get_linux_default_route_ips())
+                return cls._get_windows_default_routes()
+            if sys.platform == 'darwin':
+                return cls._get_macos_default_routes()
+            return cls._get_linux_default_routes()
         except Exception:
-            pass
-        return [ip for ip in dict.fromkeys(detected) if cls._is_scannable_local_ip(ip)]
+            return []
+
+    def _get_network_key(self) -> str:
+        """Ключ текущей локальной сети (подсети интерфейсов основного маршрута).
+        Используется для кэшей, чьи результаты зависят от того, откуда выполнялась проверка.
+        Значение переопределяется не чаще раза в 30 секунд."""
+        now = time.time()
+        if self._network_key and now - self._network_key[0] < 30:
+            return self._network_key[1]
+
+        networks = []
+        for ip in self._get_default_route_local_ips():
+            network = self._detect_interface_network(ip)
+            networks.append(str(network) if network else ip)
+        key = ','.join(sorted(set(networks))) or 'unknown'
+        self._network_key = (now, key)
+        return key
+
+    def _get_network_fingerprint(self) -> dict:
+        """Отпечаток текущей сети для профилей рекомендаций: подсеть и интерфейс основного
+        маршрута плюс MAC шлюза. MAC различает объекты с одинаковой частной подсетью
+        (192.168.1.0/24 у большинства роутеров); если его нет в ARP-таблице, берётся IP шлюза."""
+        routes = [route for route in self._get_default_routes() if self._is_scannable_local_ip(route[0])]
+        if not routes:
+            return {'key': 'unknown', 'subnet': '', 'interface': '', 'gateway': '', 'gateway_mac': ''}
+        local_ip, gateway, iface = routes[0]
+        network = self._detect_interface_network(local_ip)
+        subnet = str(network) if network else local_ip
+        gateway_mac = ''
+        if gateway:
+            gateway_mac = dict(self._get_neighbor_table(socket.AF_INET)).get(gateway, '')
+        return {
+            'key': '|'.join((subnet, gateway_mac or gateway or '-', iface or '-')),
+            'subnet': subnet,
+            'interface': iface,
+            'gateway': gateway,
+            'gateway_mac': gateway_mac,
+        }
 
     @classmethod
-    def _get_linux_default_route_ips(cls) -> List[str]:
+    def _get_linux_default_routes(cls) -> List[Tuple[str, str, str]]:
         result = subprocess.run(
             ['ip', '-4', 'route', 'show', 'default'],
             capture_output=True, text=True, timeout=3
         )
-        ips = []
+        routes = []
         for line in result.stdout.splitlines():
-            src_match = re.search(r'\bsrc\s+(\d{1,3}(?:\.\d{1,3}){3})', line)
-            if src_match:
-                ips.append(src_match.group(1))
-                continue
             dev_match = re.search(r'\bdev\s+(\S+)', line)
-            if dev_match:
-                ip = cls._get_interface_ipv4(dev_match.group(1))
-                if ip:
-                    ips.append(ip)
-        return ips
+            via_match = re.search(r'\bvia\s+(\d{1,3}(?:\.\d{1,3}){3})', line)
+            src_match = re.search(r'\bsrc\s+(\d{1,3}(?:\.\d{1,3}){3})', line)
+            iface = dev_match.group(1) if dev_match else ''
+            ip = src_match.group(1) if src_match else (cls._get_interface_ipv4(iface) if iface else '')
+            if ip:
+                routes.append((ip, via_match.group(1) if via_match else '', iface))
+        return routes
 
     @classmethod
-    def _get_macos_default_route_ips(cls) -> List[str]:
+    def _get_macos_default_routes(cls) -> List[Tuple[str, str, str]]:
         result = subprocess.run(
             ['route', '-n', 'get', 'default'],
             capture_output=True, text=True, timeout=3
         )
-        iface = ''
+        iface = gateway = ''
         for line in result.stdout.splitlines():
             stripped = line.strip()
             if stripped.startswith('interface:'):
                 iface = stripped.split(':', 1)[1].strip()
-                break
+            elif stripped.startswith('gateway:'):
+                gateway = stripped.split(':', 1)[1].strip()
         ip = cls._get_interface_ipv4(iface) if iface else ''
-        return [ip] if ip else []
+        return [(ip, gateway, iface)] if ip else []
 
     @staticmethod
-    def _get_windows_default_route_ips() -> List[str]:
+    def _get_windows_default_routes() -> List[Tuple[str, str, str]]:
         result = subprocess.run(
             ['route', 'PRINT', '-4', '0.0.0.0'],
             capture_output=True, text=True, timeout=5
@@ -1600,8 +4155,10 @@ class AndroidTVTimeFixer:
                 metric = int(parts[4])
             except ValueError:
                 metric = 0
-            routes.append((metric, parts[3]))
-        return [ip for _metric, ip in sorted(routes)]
+            # Для маршрута в сети интерфейса вместо шлюза стоит "On-link"; интерфейс задан своим IP
+            gateway = parts[2] if re.match(r'^\d{1,3}(?:\.\d{1,3}){3}$', parts[2]) else ''
+            routes.append((metric, parts[3], gateway))
+        return [(ip, gateway, ip) for _metric, ip, gateway in sorted(routes)]
 
     @staticmethod
     def _get_interface_ipv4(iface_name: str) -> str:
@@ -1711,8 +4268,10 @@ class AndroidTVTimeFixer:
 
         return networks
 
-    def _scan_networks(self, networks: List[ipaddress.IPv4Network]) -> List[str]:
-        """Сканирует список сетей на наличие устройств с открытым ADB-портом 5555."""
+    def _scan_networks(self, networks: List[ipaddress.IPv4Network],
+                       on_found: Optional[Callable[[str], None]] = None) -> List[str]:
+        """Сканирует список сетей на наличие устройств с открытым ADB-портом 5555.
+        on_found вызывается для каждого устройства сразу, как только оно найдено."""
         hosts_set: set = set()
         for net in networks:
             for h in net.hosts():
@@ -1755,6 +4314,8 @@ class AndroidTVTimeFixer:
                     checked += 1
                     if result:
                         found.append(result)
+                        if on_found:
+                            on_found(result)
                     if checked % 200 == 0 or checked == total:
                         print(
                             Fore.CYAN + "\r  " +
@@ -1870,13 +4431,244 @@ class AndroidTVTimeFixer:
             print(Fore.RED + locales.get("invalid_input"))
         return selected
 
-    def scan_network_for_android_devices(self) -> List[str]:
+    # ──────────────────────────────────────────────────────────
+    # IPv6 neighbor discovery
+    # ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _get_local_ipv6_interfaces() -> List[Tuple[str, str]]:
+        """Возвращает (имя интерфейса, scope) для поднятых интерфейсов с link-local IPv6."""
+        interfaces = []
+        try:
+            stats = psutil.net_if_stats()
+            for iface_name, addrs in psutil.net_if_addrs().items():
+                iface_stats = stats.get(iface_name)
+                if iface_stats and not iface_stats.isup:
+                    continue
+                for addr in addrs:
+                    if addr.family != socket.AF_INET6:
+                        continue
+                    address, _, scope = addr.address.partition('%')
+                    try:
+                        parsed = ipaddress.IPv6Address(address)
+                    except ValueError:
+                        continue
+                    if not parsed.is_link_local:
+                        continue
+                    # Windows отдаёт scope как индекс интерфейса, Linux/macOS — как имя
+                    interfaces.append((iface_name, scope or iface_name))
+                    break
+        except Exception:
+            pass
+        return interfaces
+
+    @staticmethod
+    def _get_local_ipv6_addresses() -> set:
+        addresses = set()
+        try:
+            for addrs in psutil.net_if_addrs().values():
+                for addr in addrs:
+                    if addr.family == socket.AF_INET6:
+                        addresses.add(addr.address.partition('%')[0].lower())
+        except Exception:
+            pass
+        return addresses
+
+    @staticmethod
+    def _solicit_ipv6_neighbors(scopes: List[str]) -> None:
+        """Пингует all-nodes multicast (ff02::1), чтобы заполнить кэш соседей ОС.
+        Заменяет перебор /64: отвечают только реально присутствующие узлы."""
+        def ping(scope: str) -> None:
+            target = f"ff02::1%{scope}"
+            if sys.platform == 'win32':
+                cmd = ['ping', '-6', '-n', '2', '-w', '1000', target]
+            elif sys.platform == 'darwin':
+                cmd = ['ping6', '-c', '2', '-i', '1', target]
+            else:
+                cmd = ['ping', '-6', '-c', '2', '-w', '2', target]
+            try:
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5)
+            except Exception:
+                pass
+
+        if not scopes:
+            return
+        with ThreadPoolExecutor(max_workers=len(scopes)) as executor:
+            list(executor.map(ping, scopes))
+
+    @classmethod
+    def _get_neighbor_table(cls, family: int) -> List[Tuple[str, str]]:
+        """Читает таблицу соседей ОС (ARP для IPv4, NDP для IPv6). Возвращает [(ip, mac)]."""
+        try:
+            if sys.platform == 'win32':
+                return cls._get_windows_neighbors(family)
+            if sys.platform == 'darwin':
+                return cls._get_macos_neighbors(family)
+            return cls._get_linux_neighbors(family)
+        except Exception:
+            return []
+
+    @staticmethod
+    def _normalize_mac(mac: str) -> str:
+        mac = mac.strip().lower().replace('-', ':')
+        if not re.match(r'^([0-9a-f]{1,2}:){5}[0-9a-f]{1,2}$', mac):
+            return ''
+        return ':'.join(part.zfill(2) for part in mac.split(':'))
+
+    @classmethod
+    def _get_linux_neighbors(cls, family: int) -> List[Tuple[str, str]]:
+        result = subprocess.run(
+            ['ip', '-6' if family == socket.AF_INET6 else '-4', 'neigh', 'show'],
+            capture_output=True, text=True, timeout=3
+        )
+        neighbors = []
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) < 3 or parts[-1] in ('FAILED', 'INCOMPLETE'):
+                continue
+            dev_match = re.search(r'\bdev\s+(\S+)', line)
+            mac_match = re.search(r'\blladdr\s+(\S+)', line)
+            ip = parts[0]
+            if family == socket.AF_INET6 and ip.lower().startswith('fe80:') and dev_match:
+                ip = f"{ip}%{dev_match.group(1)}"
+            neighbors.append((ip, cls._normalize_mac(mac_match.group(1)) if mac_match else ''))
+        return neighbors
+
+    @classmethod
+    def _get_macos_neighbors(cls, family: int) -> List[Tuple[str, str]]:
+        if family == socket.AF_INET6:
+            result = subprocess.run(['ndp', '-an'], capture_output=True, text=True, timeout=3)
+            neighbors = []
+            for line in result.stdout.splitlines()[1:]:
+                parts = line.split()
+                if len(parts) < 3 or parts[1] == '(incomplete)':
+                    continue
+                neighbors.append((parts[0], cls._normalize_mac(parts[1])))
+            return neighbors
+
+        result = subprocess.run(['arp', '-an'], capture_output=True, text=True, timeout=3)
+        neighbors = []
+        for line in result.stdout.splitlines():
+            match = re.search(r'\((\d{1,3}(?:\.\d{1,3}){3})\)\s+at\s+(\S+)', line)
+            if match:
+                neighbors.append((match.group(1), cls._normalize_mac(match.group(2))))
+        return neighbors
+
+    @classmethod
+    def _get_windows_neighbors(cls, family: int) -> List[Tuple[str, str]]:
+        if family == socket.AF_INET6:
+            result = subprocess.run(
+                ['netsh', 'interface', 'ipv6', 'show', 'neighbors'],
+                capture_output=True, text=True, timeout=5
+            )
+            neighbors = []
+            scope = ''
+            for line in result.stdout.splitlines():
+                iface_match = re.match(r'^\S.*?\s(\d+)\s*:', line)
+                if iface_match:
+                    scope = iface_match.group(1)
+                    continue
+                parts = line.split()
+                if len(parts) < 3 or ':' not in parts[0]:
+                    continue
+                mac = cls._normalize_mac(parts[1])
+                if not mac or parts[-1].lower() in ('unreachable', 'incomplete'):
+                    continue
+                ip = parts[0]
+                if ip.lower().startswith('fe80:') and '%' not in ip and scope:
+                    ip = f"{ip}%{scope}"
+                neighbors.append((ip, mac))
+            return neighbors
+
+        result = subprocess.run(['arp', '-a'], capture_output=True, text=True, timeout=5)
+        neighbors = []
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and re.match(r'^\d{1,3}(?:\.\d{1,3}){3}$', parts[0]):
+                mac = cls._normalize_mac(parts[1])
+                if mac:
+                    neighbors.append((parts[0], mac))
+        return neighbors
+
+    def _scan_ipv6_neighbors(self) -> List[Tuple[str, str]]:
+        """Ищет ADB-устройства среди IPv6-соседей (NDP) без перебора /64.
+        Возвращает [(ipv6%scope, mac)] для адресов с открытым портом 5555."""
+        interfaces = self._get_local_ipv6_interfaces()
+        if not interfaces:
+            return []
+
+        print(Fore.CYAN + locales.get(
+            "scan_ipv6_start", interfaces=", ".join(name for name, _scope in interfaces)
+        ))
+        self._solicit_ipv6_neighbors([scope for _name, scope in interfaces])
+
+        own = self._get_local_ipv6_addresses()
+        candidates = {}
+        for ip, mac in self._get_neighbor_table(socket.AF_INET6):
+            address = ip.partition('%')[0]
+            try:
+                parsed = ipaddress.IPv6Address(address)
+            except ValueError:
+                continue
+            if parsed.is_multicast or parsed.is_loopback or address.lower() in own:
+                continue
+            # Link-local без scope недоступен — подставляем интерфейс, если он один
+            if parsed.is_link_local and '%' not in ip:
+                if len(interfaces) != 1:
+                    continue
+                ip = f"{address}%{interfaces[0][1]}"
+            candidates.setdefault(ip, mac)
+
+        found: List[Tuple[str, str]] = []
+        if candidates:
+            with ThreadPoolExecutor(max_workers=min(64, len(candidates))) as executor:
+                futures = {
+                    executor.submit(self._check_port_available, ip, 5555, 0.5): ip
+                    for ip in candidates
+                }
+                for future in as_completed(futures):
+                    ip = futures[future]
+                    try:
+                        if future.result():
+                            found.append((ip, candidates[ip]))
+                    except Exception:
+                        continue
+
+        print(Fore.CYAN + locales.get("scan_ipv6_result", checked=len(candidates), found=len(found)))
+        return found
+
+    def _merge_ipv6_devices(self, found: List[str], found_v6: List[Tuple[str, str]]) -> List[str]:
+        """Добавляет IPv6-устройства к списку IPv4. Устройство, уже найденное по IPv4
+        (совпадает MAC-адрес), повторно не добавляется; один MAC — один IPv6-адрес."""
+        if not found_v6:
+            return found
+        v4_macs = {mac for ip, mac in self._get_neighbor_table(socket.AF_INET) if mac and ip in found}
+        merged = list(found)
+        seen_macs = set(v4_macs)
+        # Глобальные/ULA адреса предпочтительнее link-local: их не нужно привязывать к интерфейсу
+        for ip, mac in sorted(found_v6, key=lambda item: '%' in item[0]):
+            if mac and mac in seen_macs:
+                continue
+            if mac:
+                seen_macs.add(mac)
+            merged.append(ip)
+        return merged
+
+    def scan_network_for_android_devices(self, on_found: Optional[Callable[[str], None]] = None) -> List[str]:
         """Сканирует локальные подсети в поисках устройств с открытым ADB-портом 5555.
-        Автоматически определяет подсеть через psutil, fallback на /16."""
+        Автоматически определяет подсеть через psutil, fallback на /16.
+        on_found вызывается для каждого найденного IPv4-устройства, не дожидаясь конца сканирования."""
         interfaces = self._get_local_interface_networks()
         if not interfaces:
-            print(Fore.RED + locales.get("scan_local_ip_error"))
-            return []
+            # IPv6-only сеть: IPv4 сканировать нечего, но соседи по NDP могут быть
+            found = self._merge_ipv6_devices([], self._scan_ipv6_neighbors())
+            if not found:
+                print(Fore.RED + locales.get("scan_local_ip_error"))
+                return []
+            print(Fore.GREEN + locales.get("scan_found", count=len(found)))
+            for i, ip in enumerate(found, 1):
+                print(Fore.WHITE + f"  {i}. {ip}")
+            return found
 
         default_ips = self._get_default_route_local_ips()
         primary = [item for item in interfaces if item[1] in default_ips]
@@ -1899,14 +4691,15 @@ class AndroidTVTimeFixer:
             hosts_count = self._network_hosts_count(network)
             print(Fore.GREEN + locales.get("scan_net_detected", network=str(network), hosts=hosts_count))
 
-        found = self._scan_networks(primary_networks)
+        found = self._scan_networks(primary_networks, on_found)
+        found = self._merge_ipv6_devices(found, self._scan_ipv6_neighbors())
         scanned_networks = list(primary_networks)
 
         if not found and additional:
             print(Fore.YELLOW + locales.get("scan_none"))
             selected_additional = self._choose_additional_networks(additional)
             if selected_additional:
-                found = self._scan_networks(selected_additional)
+                found = self._scan_networks(selected_additional, on_found)
                 scanned_networks.extend(selected_additional)
 
         wide_scan_offered = False
@@ -1921,7 +4714,7 @@ class AndroidTVTimeFixer:
             ))
             answer = input(Fore.WHITE).strip().lower()
             if answer in ('y', 'yes', 'д', 'да'):
-                found = self._scan_networks(wide_candidates)
+                found = self._scan_networks(wide_candidates, on_found)
 
         if found:
             print(Fore.GREEN + locales.get("scan_found", count=len(found)))
@@ -1961,12 +4754,18 @@ class AndroidTVTimeFixer:
 
         for idx, ip in enumerate(ip_list, 1):
             print(Fore.CYAN + locales.get("batch_connecting", idx=idx, total=total, ip=ip))
+            key = None
             try:
                 host, port = self.parse_ip_port(ip)
                 if not self.validate_ip(ip) or not self.validate_ntp_server(ntp_server):
                     raise AndroidTVTimeFixerError(locales.get("invalid_input"))
-                device = AdbDeviceTcp(host, port, default_transport_timeout_s=9.)
-                device.connect(rsa_keys=[signer], auth_timeout_s=15)
+                key = self.format_ip_port(host, port)
+                # Устройство, с которым уже работали, не требует нового подключения и авторизации
+                device = self.adb_pool.get(key)
+                if device is None:
+                    device = AdbDeviceTcp(host, port, default_transport_timeout_s=9.)
+                    device.connect(rsa_keys=[signer], auth_timeout_s=15)
+                    self.adb_pool.put(key, device)
                 device.shell(f'settings put global ntp_server {shlex.quote(ntp_server)}')
                 confirmed = device.shell('settings get global ntp_server').strip()
                 if ntp_server in confirmed:
@@ -1978,6 +4777,9 @@ class AndroidTVTimeFixer:
             except Exception as e:
                 print(Fore.RED + locales.get("batch_failed", ip=ip, error=str(e)))
                 failed += 1
+                # Соединение могло сломаться во время команд: следующее обращение подключится заново
+                if key:
+                    self._drop_device(key)
 
         print(Fore.CYAN + locales.get("batch_summary", success=success, failed=failed, total=total))
 
@@ -1996,10 +4798,18 @@ class AndroidTVTimeFixer:
             device_timestamp = int(timestamp_str)
             device_time = datetime.datetime.fromtimestamp(device_timestamp)
             pc_time = datetime.datetime.now()
-            diff = abs((pc_time - device_time).total_seconds())
+            # Сравниваем с точным временем по консенсусу NTP-серверов, если он есть
+            consensus = self._get_time_consensus()
+            reference_time = pc_time
+            if consensus:
+                reference_time = pc_time + datetime.timedelta(seconds=consensus.offset)
+            diff = abs((reference_time - device_time).total_seconds())
 
             print(Fore.WHITE + locales.get("device_time", time=device_time.strftime("%Y-%m-%d %H:%M:%S")))
             print(Fore.WHITE + locales.get("pc_time",     time=pc_time.strftime("%Y-%m-%d %H:%M:%S")))
+            if consensus:
+                print(Fore.WHITE + locales.get("consensus_time", time=reference_time.strftime("%Y-%m-%d %H:%M:%S"),
+                                               agreeing=consensus.agreeing, total=consensus.total))
 
             if diff < 60:
                 print(Fore.GREEN + locales.get("time_in_sync"))
@@ -2133,6 +4943,8 @@ class AndroidTVTimeFixer:
                 if not self.validate_ntp_server(ntp_server):
                     print(Fore.RED + locales.get("invalid_ntp_server_format"))
                     continue
+                # Сервер известен: проверка идёт, пока вводятся адреса устройств
+                self.prefetch_ntp_verification([ntp_server])
 
                 ip_raw = input(
                     Fore.GREEN + locales.get("batch_enter_ips", count=len(discovered)) + Fore.WHITE
@@ -2294,21 +5106,15 @@ class AndroidTVTimeFixer:
     }
 
     # Маппинг континентов из timezone на региональные пулы
-    _tz_region_pools = {
-        'Europe': ['0.europe.pool.ntp.org', '1.europe.pool.ntp.org',
-                    '2.europe.pool.ntp.org', '3.europe.pool.ntp.org'],
-        'America': ['0.north-america.pool.ntp.org', '1.north-america.pool.ntp.org',
-                     '2.north-america.pool.ntp.org', '3.north-america.pool.ntp.org',
-                     '0.south-america.pool.ntp.org', '1.south-america.pool.ntp.org',
-                     '2.south-america.pool.ntp.org', '3.south-america.pool.ntp.org'],
-        'Asia': ['0.asia.pool.ntp.org', '1.asia.pool.ntp.org',
-                  '2.asia.pool.ntp.org', '3.asia.pool.ntp.org'],
-        'Australia': ['0.oceania.pool.ntp.org', '1.oceania.pool.ntp.org',
-                       '2.oceania.pool.ntp.org', '3.oceania.pool.ntp.org'],
-        'Pacific': ['0.oceania.pool.ntp.org', '1.oceania.pool.ntp.org',
-                      '2.oceania.pool.ntp.org', '3.oceania.pool.ntp.org'],
-        'Africa': ['0.africa.pool.ntp.org', '1.africa.pool.ntp.org',
-                    '2.africa.pool.ntp.org', '3.africa.pool.ntp.org'],
+    # Континент из IANA timezone → регионы каталога (зоны pool.ntp.org)
+    _tz_continent_regions = {
+        'Europe': ['europe'],
+        'America': ['north-america', 'south-america'],
+        'Asia': ['asia'],
+        'Australia': ['oceania'],
+        'Pacific': ['oceania'],
+        'Africa': ['africa'],
+        'Antarctica': ['antarctica'],
     }
 
     def _detect_user_region(self) -> Tuple[List[str], List[str]]:
@@ -2381,7 +5187,10 @@ class AndroidTVTimeFixer:
 
             # 2. Региональные пулы по континенту из timezone
             continent = tz_key.split('/')[0] if '/' in tz_key else ''
-            region_pools = self._tz_region_pools.get(continent, [])
+            region_pools = [
+                pool for region in self._tz_continent_regions.get(continent, [])
+                for pool in self.ntp_catalog.select(region=region, tags=('continent',))
+            ]
             for pool in region_pools:
                 if pool not in priority:
                     priority.append(pool)
@@ -2399,89 +5208,403 @@ class AndroidTVTimeFixer:
         except Exception:
             return [], []
 
-    def auto_setup_ntp(self) -> None:
-        """Полная автоматизация: сканирование → подключение → выбор лучшего NTP → установка"""
-        # Шаг 1: Сканирование сети
-        print(Fore.CYAN + locales.get("auto_scanning_network"))
-        found = self.scan_network_for_android_devices()
+    # Сколько лучших по проверке с ПК серверов перепроверяются с самого устройства
+    device_probe_candidates = 10
 
-        if not found:
-            print(Fore.RED + locales.get("auto_no_devices"))
-            return
+    @staticmethod
+    def _device_ntp_probe_script(targets: List[Tuple[str, int]], timeout: int) -> str:
+        """Shell-скрипт для устройства: все серверы проверяются параллельно фоновыми заданиями.
+        SNTP-запрос отправляется через nc (toybox) и даёт метки времени устройства до отправки
+        и после получения ответа; без nc проверяется только ICMP-доступность через ping.
+        Строки вывода: 'NTP i t1_ns hex_ответа t4_ns' или 'PING i min/avg/max... = a/b/c/d'."""
+        packet = ''.join(f'\\{byte:03o}' for byte in encode_sntp_request(_unix_to_ntp(time.time())))
+        lines = [
+            f"p() {{ s=$(date +%s%N); r=$( {{ printf '{packet}'; sleep {timeout}; }} | "
+            f"nc -u -w {timeout} \"$2\" \"$3\" 2>/dev/null | "
+            f"{{ head -c 48 | od -An -tx1 -v | tr -d ' \\n'; echo \" $(date +%s%N)\"; }} ); "
+            f"echo \"NTP $1 $s $r\"; }}",
+            f"q() {{ r=$(ping -c 2 -W {timeout} \"$2\" 2>/dev/null | grep -o 'min/avg/max.*'); "
+            f"echo \"PING $1 $r\"; }}",
+            "if command -v nc >/dev/null 2>&1; then P=p; else P=q; fi",
+        ]
+        lines += [f"$P {index} {shlex.quote(host)} {port} &" for index, (host, port) in enumerate(targets)]
+        lines.append("wait")
+        return '\n'.join(lines)
 
-        # Шаг 2: Выбор устройства
-        if len(found) == 1:
-            target_ip = found[0]
-            print(Fore.GREEN + locales.get("auto_found_device", count=1, ip=target_ip))
-        else:
-            print(Fore.GREEN + locales.get("scan_found", count=len(found)))
-            for i, ip in enumerate(found, 1):
-                print(Fore.WHITE + f"  {i}. {ip}")
-            raw = input(Fore.GREEN + locales.get("auto_select_device") + Fore.WHITE).strip()
-            try:
-                idx = int(raw)
-                if 1 <= idx <= len(found):
-                    target_ip = found[idx - 1]
+    @staticmethod
+    def _parse_device_ntp_probe(output: str, servers: List[str]) -> Dict[str, dict]:
+        """Разбирает вывод _device_ntp_probe_script: {server: {method, reachable, rtt, offset,
+        stratum, error}}. rtt — мс (для SNTP — верхняя оценка: включает запуск nc на устройстве),
+        offset — поправка к часам устройства по этому серверу, с."""
+        probes: Dict[str, dict] = {}
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) < 2 or parts[0] not in ('NTP', 'PING') or not parts[1].isdigit():
+                continue
+            index = int(parts[1])
+            if index >= len(servers):
+                continue
+            probe = {'method': 'sntp' if parts[0] == 'NTP' else 'icmp', 'reachable': False,
+                     'rtt': None, 'offset': None, 'stratum': None, 'error': 'Timeout'}
+            if parts[0] == 'NTP' and len(parts) == 5:
+                try:
+                    response = decode_sntp_packet(bytes.fromhex(parts[3]))
+                except (ValueError, SNTPError) as e:
+                    probe['error'] = f"NTP Protocol Error: {e}"
                 else:
-                    print(Fore.RED + locales.get("invalid_input"))
-                    return
-            except ValueError:
-                print(Fore.RED + locales.get("invalid_input"))
-                return
-
-        # Шаг 3: Подключение к устройству
-        print(Fore.CYAN + locales.get("auto_confirm_tv"))
+                    probe['stratum'] = response.stratum
+                    if response.leap == 3 or response.stratum == 0 or response.stratum >= 16:
+                        probe['error'] = f"Unsynchronized (stratum {response.stratum}, leap {response.leap})"
+                    else:
+                        probe.update(reachable=True, error=None)
+                        if parts[2].isdigit() and parts[4].isdigit():
+                            delay, offset = ntp_delay_offset(response, int(parts[2]) / 1e9, int(parts[4]) / 1e9)
+                            probe.update(rtt=delay * 1000, offset=offset)
+            elif parts[0] == 'PING' and '=' in line:
+                try:
+                    probe.update(reachable=True, error=None,
+                                 rtt=float(line.rsplit('=', 1)[1].strip().split('/')[1]))
+                except (IndexError, ValueError):
+                    pass
+            probes[servers[index]] = probe
+        return probes
+
+    def probe_ntp_from_device(self, servers: List[str], timeout: int = 2) -> Dict[str, dict]:
+        """Проверяет серверы из сети самого устройства через ADB shell (сеть ТВ может отличаться
+        от сети ПК: отдельный VLAN, гостевая сеть с фильтрацией провайдера).
+        Возвращает {server: результат}, пустой словарь, если проверить не удалось."""
+        if not self.device or not servers:
+            return {}
+        script = self._device_ntp_probe_script([split_ntp_target(server) for server in servers], timeout)
         try:
-            self.connect_or_reuse(target_ip)
-            self.save_last_ip(target_ip)
-        except AndroidTVTimeFixerError as e:
-            print(Fore.RED + locales.get("error_message", error=str(e)))
-            return
+            output = self.device.shell(script, timeout_s=timeout + 15, read_timeout_s=timeout + 10)
+        except Exception as e:
+            self.logger.warning(f"Device-side NTP probe failed: {e}")
+            return {}
+        probes = self._parse_device_ntp_probe(output, servers)
+        self.logger.info(
+            f"Device-side NTP probe: {sum(1 for p in probes.values() if p['reachable'])}/{len(servers)} reachable"
+        )
+        return probes
 
-        # Шаг 4: Определение локации и проверка NTP-серверов
-        priority_servers, region_info = self._detect_user_region()
-        if region_info:
-            print(Fore.GREEN + locales.get("auto_region_detected",
-                                           timezone=region_info[0], region=region_info[1]))
-            print(Fore.CYAN + locales.get("auto_priority_count", count=len(priority_servers)))
+    def _rank_with_device_probes(self, results: List[dict], probes: Dict[str, dict],
+                                 priority_servers: List[str]) -> List[dict]:
+        """Объединяет проверку с ПК и с устройства: недоступные с устройства серверы уходят
+        в конец, а RTT устройства заменяет RTT ПК в корневом расстоянии оценки"""
+        priority_set = set(priority_servers)
 
-        print(Fore.CYAN + locales.get("auto_checking_ntp"))
-        all_servers = list(dict.fromkeys(
-            list(self.ntp_servers.values()) + self.custom_ntp_servers
-        ))
+        def key(result: dict) -> tuple:
+            probe = result.get('device')
+            distance = result['root_distance']
+            if probe and probe['rtt'] is not None:
+                distance = max(0.0, distance + (probe['rtt'] - result['avg_rtt']) / 2)
+            if result['server'] in priority_set:
+                distance *= 0.9
+            return (bool(probe) and not probe['reachable'],
+                    -self._ntp_quality_score(result['success_rate'], distance))
+
+        for result in results:
+            result['device'] = probes.get(result['server'])
+        return sorted(results, key=key)
+
+    # Сколько подтверждённых лучших серверов нужно, чтобы досрочно завершить проверку
+    auto_race_top_k = 5
+
+    def _auto_select_ntp_servers(self, priority_servers: List[str], quiet: bool = False) -> List[dict]:
+        """Этап выбора сервера автонастройки: двухэтапная проверка основного набора каталога
+        и серверов региона с досрочной остановкой, когда лучшие определены.
+        Возвращает подходящие серверы (доступные и согласные с консенсусом), лучшие первыми.
+        quiet — без вывода (фоновое обновление профиля сети)."""
+        results, summary = self._run_auto_selection(priority_servers, quiet=quiet)
+        if not quiet:
+            self._show_auto_selection_summary(summary)
+        return results
+
+    def _run_auto_selection(self, priority_servers: List[str], quiet: bool = False) -> Tuple[List[dict], dict]:
+        """Проверка для _auto_select_ntp_servers. Возвращает (подходящие серверы, сводка проверки);
+        сводку печатает _show_auto_selection_summary. quiet — без строки прогресса."""
+        # Основной набор каталога плюс серверы региона пользователя, которых в нём нет
+        all_servers = list(dict.fromkeys(self._default_probe_servers() + priority_servers))
+        # Сначала серверы, хорошо отвечавшие в этой сети раньше; давно не отвечающие пропускаются
+        all_servers, _skipped = self._plan_ntp_probe(all_servers)
 
         results: List[dict] = []
         total = len(all_servers)
+        swept = 0
+        finalists = 0
+        checked = 0
+        attempts = 3
+        probe_timeout = 2
+        # Региональные серверы получают лёгкий бонус: -10% к корневому расстоянию
+        priority_set = set(priority_servers)
+
+        def effective_score(server: str, success_rate: float, distance: float) -> float:
+            return self._ntp_quality_score(success_rate, distance * (0.9 if server in priority_set else 1.0))
+
+        def race_decided(_done: List[dict], in_flight: Dict[str, dict], now: float) -> bool:
+            """Топ-K определён, если K подходящих серверов ответили на все попытки, а ни одна
+            незавершённая проверка уже не может получить оценку выше K-го из них.
+            Корневое расстояние не меньше RTT/2, поэтому нижняя граница RTT ограничивает оценку сверху."""
+            confirmed = sorted(
+                (effective_score(r['server'], r['success_rate'], r['root_distance'])
+                 for r in results if r['success_rate'] >= 100),
+                reverse=True
+            )
+            if len(confirmed) < self.auto_race_top_k:
+                return False
+            kth_score = confirmed[self.auto_race_top_k - 1]
+            return all(
+                effective_score(
+                    server, 100, self._pending_rtt_lower_bound(progress, attempts, probe_timeout, now) / 2
+                ) < kth_score
+                for server, progress in in_flight.items()
+            )
+
+        def acceptable(result: dict) -> bool:
+            # Только доступные, чьё время согласуется с консенсусом серверов (без него — с часами ПК)
+            return result['status'] == 'Reachable' and self._offset_acceptable(result)
+
+        def handle_sweep_result(result: dict) -> None:
+            nonlocal swept, finalists
+            swept += 1
+            if acceptable(result):
+                finalists += 1
+            if quiet:
+                return
+            if swept % 10 == 0 or swept == total:
+                print(
+                    Fore.CYAN + "\r" +
+                    locales.get("auto_checking_progress", checked=swept, total=total, found=finalists),
+                    end="", flush=True
+                )
+
+        def handle_result(result: dict) -> None:
+            nonlocal checked
+            checked += 1
+            if acceptable(result):
+                results.append(result)
+
+        def rank_finalists(result: dict) -> tuple:
+            # Слишком большое смещение исключает сервер ещё до углублённой проверки
+            return (not acceptable(result),
+                    -effective_score(result['server'], result['success_rate'], result['root_distance']))
+
+        deep_count = self.auto_race_top_k * 3
+        race_started = time.time()
+        with self._probe_metrics_run('auto_setup') as probe_run:
+            sweep, deep = self._probe_ntp_servers_tiered(
+                all_servers, count=attempts, timeout=probe_timeout, finalists=deep_count, rank_key=rank_finalists,
+                on_sweep_result=handle_sweep_result, on_result=handle_result, stop_when=race_decided,
+                race_sweep=True
+            )
+        if not quiet:
+            print()  # новая строка после прогресса
+        # Сортировка по оценке качества (доля ответов, корневое расстояние) с региональным бонусом
+        results.sort(key=lambda x: -effective_score(x['server'], x['success_rate'], x['root_distance']))
+        deep_total = min(deep_count, sum(1 for r in sweep if r['status'] == 'Reachable'))
+        summary = {
+            'probe_run': probe_run,
+            'deep_total': deep_total,
+            'attempts': attempts,
+            'stopped': (total - swept) + (deep_total - checked),
+            'race_seconds': time.time() - race_started,
+        }
+        return results, summary
+
+    def _show_auto_selection_summary(self, summary: dict) -> None:
+        """Печатает итог выбора сервера: углублённая проверка, досрочная остановка, метрики"""
+        print(Fore.CYAN + locales.get("auto_deep_probe", finalists=summary['deep_total'], attempts=summary['attempts']))
+        if summary['stopped']:
+            print(Fore.CYAN + locales.get("auto_race_stopped", seconds=summary['race_seconds'],
+                                          skipped=summary['stopped']))
+        self.show_probe_metrics(summary['probe_run'])
+
+    def _refresh_network_profile_in_background(self, fingerprint: dict, priority_servers: List[str]) -> None:
+        """Перепроверяет серверы в фоне и обновляет профиль сети (не более одной проверки одновременно)"""
+        with self._probe_refresh_lock:
+            if self._profile_refresh and self._profile_refresh.is_alive():
+                return
 
-        with ThreadPoolExecutor(max_workers=50) as executor:
-            futures = {executor.submit(self._test_ntp_server, s, 2, 2): s for s in all_servers}
-            checked = 0
-            for future in as_completed(futures):
-                result = future.result()
-                checked += 1
-                # Фильтруем: только доступные с адекватным offset (<60 сек)
-                if result['status'] == 'Reachable' and (result['offset'] is None or abs(result['offset']) <= 60):
-                    results.append(result)
-                if checked % 10 == 0 or checked == total:
-                    print(
-                        Fore.CYAN + "\r" +
-                        locales.get("auto_checking_progress",
-                                    checked=checked, total=total, found=len(results)),
-                        end="", flush=True
+            def refresh() -> None:
+                try:
+                    results = self._auto_select_ntp_servers(priority_servers, quiet=True)
+                    if results:
+                        self.ntp_profiles.put(fingerprint, results)
+                        self.ntp_profiles.save()
+                    # Фоновый поток не печатает в консоль поверх запроса ввода
+                    self.logger.debug(
+                        f"NTP profile of network {fingerprint['key']} refreshed: {len(results)} servers"
                     )
-        print()  # новая строка
+                except Exception as e:
+                    self.logger.debug(f"Background NTP profile refresh failed: {e}")
+
+            self._profile_refresh = threading.Thread(target=refresh, name="ntp-profile-refresh", daemon=True)
+            self._profile_refresh.start()
+
+    def _auto_select_for_network(self) -> dict:
+        """Выбор NTP-сервера автонастройки без вывода (идёт параллельно со сканированием и подключением):
+        регион пользователя, затем профиль известной сети или полная проверка для новой."""
+        started = time.time()
+        priority_servers, region_info = self._detect_user_region()
+        fingerprint = self._get_network_fingerprint()
+        profile = self.ntp_profiles.get(fingerprint) if fingerprint['key'] != 'unknown' else None
+        if profile:
+            # Известная сеть: рекомендация сразу из профиля, перепроверка — в фоне
+            results = profile['servers']
+            self.ntp_profiles.touch(fingerprint)
+            # Один из лучших будет устанавливаться: его проверка перед установкой готовится заранее
+            self.prefetch_ntp_verification([result['server'] for result in results[:3]])
+            self._refresh_network_profile_in_background(fingerprint, priority_servers)
+            summary = None
+        else:
+            # Итог проверки печатается после подключения, чтобы не смешиваться с выводом сканирования
+            results, summary = self._run_auto_selection(priority_servers, quiet=True)
+            if fingerprint['key'] != 'unknown':
+                self.ntp_profiles.put(fingerprint, results)
+                self.ntp_profiles.save()
+        return {
+            'results': results,
+            'priority_servers': priority_servers,
+            'region_info': region_info,
+            'fingerprint': fingerprint,
+            'profile': profile,
+            'summary': summary,
+            'elapsed': time.time() - started,
+        }
+
+    def _auto_setup_pipeline(self) -> Optional[Tuple[List[dict], List[str]]]:
+        """Сканирование, подключение и выбор NTP-сервера автонастройки конвейером: выбор сервера
+        начинается сразу и идёт параллельно со сканированием, а подключение к первому найденному
+        устройству — не дожидаясь конца сканирования. Общее время близко к самому долгому этапу.
+        Возвращает (подходящие серверы, серверы региона) или None, если подключиться не удалось."""
+        started = time.time()
+        pipeline = ThreadPoolExecutor(max_workers=2, thread_name_prefix='auto-setup')
+        selection = pipeline.submit(self._auto_select_for_network)
+        early: Dict[str, Tuple[Future, threading.Event]] = {}
+
+        def connect_early(ip: str) -> None:
+            host, port = self.parse_ip_port(ip)
+            # Устройство с открытым соединением в пуле переподключать незачем
+            if early or self.format_ip_port(host, port) in self.adb_pool:
+                return
+            cancel = threading.Event()
+            early[ip] = (pipeline.submit(self._open_adb_device, host, port, cancel, True), cancel)
+            print(Fore.CYAN + "\r" + locales.get("auto_early_connect", ip=ip))
+
+        try:
+            # Шаг 1: Сканирование сети
+            print(Fore.CYAN + locales.get("auto_scanning_network"))
+            found = self.scan_network_for_android_devices(on_found=connect_early)
+
+            if not found:
+                print(Fore.RED + locales.get("auto_no_devices"))
+                return None
+
+            # Шаг 2: Выбор устройства
+            if len(found) == 1:
+                target_ip = found[0]
+                print(Fore.GREEN + locales.get("auto_found_device", count=1, ip=target_ip))
+            else:
+                print(Fore.GREEN + locales.get("scan_found", count=len(found)))
+                for i, ip in enumerate(found, 1):
+                    print(Fore.WHITE + f"  {i}. {ip}")
+                raw = input(Fore.GREEN + locales.get("auto_select_device") + Fore.WHITE).strip()
+                try:
+                    idx = int(raw)
+                    if 1 <= idx <= len(found):
+                        target_ip = found[idx - 1]
+                    else:
+                        print(Fore.RED + locales.get("invalid_input"))
+                        return None
+                except ValueError:
+                    print(Fore.RED + locales.get("invalid_input"))
+                    return None
+
+            # Шаг 3: Подключение к устройству (к первому найденному оно уже идёт)
+            print(Fore.CYAN + locales.get("auto_confirm_tv"))
+            try:
+                if target_ip in early:
+                    host, port = self.parse_ip_port(target_ip)
+                    self._use_device(early.pop(target_ip)[0].result(), host, port)
+                    print(Fore.GREEN + locales.get("auto_connected", ip=self.connected_ip))
+                else:
+                    self.connect_or_reuse(target_ip)
+                self.save_last_ip(target_ip)
+            except AndroidTVTimeFixerError as e:
+                print(Fore.RED + locales.get("error_message", error=str(e)))
+                return None
+
+            # Шаг 4: Результат выбора NTP-сервера (обычно уже готов)
+            if not selection.done():
+                print(Fore.CYAN + locales.get("auto_checking_ntp"))
+            try:
+                choice = selection.result()
+            except Exception as e:
+                self.logger.error(f"Auto setup NTP selection failed: {e}")
+                return [], []
+        finally:
+            # Подключение к устройству, которое не выбрали, прерывается, а уже установленное
+            # остаётся в пуле (в том числе если оно завершится после выхода из конвейера)
+            for ip, (future, cancel) in early.items():
+                cancel.set()
+                future.add_done_callback(
+                    lambda done, key=self.format_ip_port(*self.parse_ip_port(ip)): self._pool_unused_connection(key, done)
+                )
+            pipeline.shutdown(wait=False)
+
+        priority_servers, region_info = choice['priority_servers'], choice['region_info']
+        if region_info:
+            print(Fore.GREEN + locales.get("auto_region_detected",
+                                           timezone=region_info[0], region=region_info[1]))
+            print(Fore.CYAN + locales.get("auto_priority_count", count=len(priority_servers)))
+        fingerprint, profile = choice['fingerprint'], choice['profile']
+        if profile:
+            age_hours = (time.time() - profile['updated_at']) / 3600
+            print(Fore.GREEN + locales.get("auto_profile_known", subnet=fingerprint['subnet'],
+                                           hours=age_hours, count=len(profile['servers'])))
+        elif fingerprint['key'] != 'unknown':
+            print(Fore.CYAN + locales.get("auto_profile_unknown", subnet=fingerprint['subnet']))
+        if choice['summary']:
+            self._show_auto_selection_summary(choice['summary'])
+        print(Fore.CYAN + locales.get("auto_pipeline_ready", seconds=time.time() - started,
+                                      selection=choice['elapsed'], count=len(choice['results'])))
+        return choice['results'], priority_servers
+
+    def _pool_unused_connection(self, key: str, future: Future) -> None:
+        """Кладёт в пул соединение фонового подключения, которое не понадобилось"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.adb_pool.put(key, future.result())
 
+    def auto_setup_ntp(self) -> None:
+        """Полная автоматизация: сканирование → подключение → выбор лучшего NTP → установка.
+        Первые этапы выполняются конвейером (см. _auto_setup_pipeline)."""
+        pipeline = self._auto_setup_pipeline()
+        if pipeline is None:
+            return
+        results, priority_servers = pipeline
         if not results:
             print(Fore.RED + locales.get("auto_no_reachable_servers"))
             return
 
-        # Сортировка: success_rate (убыв.) → avg_rtt (возр.)
-        # Региональные серверы получают лёгкий бонус: -10% к RTT при равном success_rate
-        priority_set = set(priority_servers)
-        results.sort(key=lambda x: (
-            -x['success_rate'],
-            x['avg_rtt'] * (0.9 if x['server'] in priority_set else 1.0)
-        ))
+        # Сеть телевизора может отличаться от сети ПК: лучшие кандидаты проверяются с устройства
+        candidates = [r['server'] for r in results[:self.device_probe_candidates]]
+        print(Fore.CYAN + locales.get("auto_device_probe", count=len(candidates)))
+        probes = self.probe_ntp_from_device(candidates)
+        if probes:
+            reachable = sum(1 for probe in probes.values() if probe['reachable'])
+            method = next(iter(probes.values()))['method'].upper()
+            print(Fore.CYAN + locales.get("auto_device_probe_summary", reachable=reachable,
+                                          total=len(candidates), method=method))
+            for server in candidates:
+                if server in probes and not probes[server]['reachable']:
+                    print(Fore.YELLOW + "  " + locales.get("auto_device_unreachable", server=server,
+                                                           error=probes[server]['error']))
+            results = self._rank_with_device_probes(results, probes, priority_servers)
+            if not any(probe['reachable'] for probe in probes.values()):
+                print(Fore.YELLOW + locales.get("auto_device_probe_none"))
+        else:
+            print(Fore.YELLOW + locales.get("auto_device_probe_failed"))
 
         # Шаг 5: Показать топ-5
         print(Fore.GREEN + locales.get("auto_top_servers"))
@@ -2494,22 +5617,49 @@ class AndroidTVTimeFixer:
                 f"  {i}. {r['server']:<40} "
                 f"RTT: {r['avg_rtt']:.1f}ms  "
                 f"{locales.get('auto_server_success')}: {r['success_rate']:.0f}%  "
-                f"Offset: {r['offset']:.3f}s{marker}"
+                f"Offset: {r['offset']:.3f}s  "
+                f"Stratum: {r['stratum']}  Jitter: {r['jitter']:.1f}ms  "
+                f"{locales.get('auto_server_score')}: {r['score']:.0f}{marker}"
             )
+            probe = r.get('device')
+            if probe:
+                if not probe['reachable']:
+                    device_line = locales.get("auto_device_result_unreachable", error=probe['error'])
+                elif probe['rtt'] is not None:
+                    device_line = locales.get("auto_device_result_rtt", rtt=probe['rtt'], method=probe['method'].upper())
+                else:
+                    device_line = locales.get("auto_device_result_reachable", method=probe['method'].upper())
+                print(Fore.WHITE + "       " + device_line)
+            if len(r.get('ip_results') or []) > 1 and r.get('best_ip'):
+                print(Fore.WHITE + "       " + locales.get(
+                    "auto_best_ip", ip=r['best_ip'], rtt=r['ip_results'][0]['avg_rtt'], spread=r['rtt_spread']
+                ))
+            if len(r.get('families') or {}) > 1 and r.get('best_ip'):
+                print(Fore.WHITE + "       " + locales.get(
+                    "auto_family_winner", family=r['family'], ip=r['best_ip'], stats=self._format_family_stats(r)
+                ))
 
         best = top5[0]
         print(Fore.GREEN + locales.get("auto_best_server", server=best['server'], rtt=best['avg_rtt']))
 
         # Шаг 6: Выбор из топа или подтверждение рекомендации
-        raw = input(Fore.GREEN + locales.get("auto_choose_from_top") + Fore.WHITE).strip()
-        best_server = best['server']
+        raw = input(Fore.GREEN + locales.get("auto_choose_from_top") + Fore.WHITE).strip().lower()
+        # Суффикс 'p' (например, "1p") закрепляет лучший IP-адрес пула вместо имени
+        pin = raw.endswith('p')
+        raw = raw.rstrip('p').strip()
+        chosen = best
         if raw:
             try:
                 idx = int(raw)
                 if 1 <= idx <= len(top5):
-                    best_server = top5[idx - 1]['server']
+                    chosen = top5[idx - 1]
             except ValueError:
                 pass
+        best_server = chosen['server']
+        # Закрепляется только адрес, который можно записать на устройство
+        # (адрес с нестандартным портом, как у локальной фермы, — нельзя)
+        if pin and chosen.get('best_ip') and self.validate_ntp_server(chosen['best_ip']):
+            best_server = chosen['best_ip']
 
         # Шаг 7: Подтверждение и установка
         confirm = input(
@@ -2766,6 +5916,8 @@ def main():
                 ip = fixer.get_device_ip_input()
                 fixer.logger.info(f"User entered IP: {ip}")
                 if fixer.validate_ip(ip):
+                    # Вероятные серверы проверяются, пока идёт подключение и ожидание разрешения на ТВ
+                    fixer.prefetch_ntp_verification()
                     try:
                         fixer.connect_or_reuse(ip)
                         fixer.save_last_ip(ip)
@@ -2817,6 +5969,8 @@ def main():
                 ip = fixer.get_device_ip_input()
                 fixer.logger.info(f"User entered IP: {ip}")
                 if fixer.validate_ip(ip):
+                    # Вероятные серверы проверяются, пока идёт подключение и ожидание разрешения на ТВ
+                    fixer.prefetch_ntp_verification()
                     try:
                         fixer.connect_or_reuse(ip)
                         fixer.save_last_ip(ip)
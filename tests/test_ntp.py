@@ -0,0 +1,439 @@
+"""Проверки NTP-части android_time_fixer: пакеты SNTP, расчёты по меткам времени,
+оценка серверов, консенсус, метрики, каталог и проверка на ферме scripts/ntp_simulator.py"""
+import asyncio
+import atexit
+import importlib.util
+import json
+import signal
+import socket
+import struct
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'src'))
+
+import android_time_fixer as atf  # noqa: E402
+
+# Формат пакета NTP (RFC 5905, 7.3) — независимо от модуля, чтобы проверка не повторяла код
+NTP_PACKET = struct.Struct('!BBbbII4sQQQQ')
+
+
+def to_ntp(timestamp: float) -> int:
+    return int((timestamp + 2208988800) * 2 ** 32)
+
+
+def server_reply(origin: int, receive: float, transmit: float, stratum: int = 2, leap: int = 0,
+                 ref_id: bytes = bytes([10, 0, 0, 1]), root_delay: float = 0.010,
+                 root_dispersion: float = 0.020) -> bytes:
+    """Ответ сервера (mode 4) на запрос с меткой origin"""
+    return NTP_PACKET.pack(
+        (leap << 6) | (4 << 3) | 4, stratum, 6, -20,
+        int(root_delay * 2 ** 16), int(root_dispersion * 2 ** 16), ref_id,
+        to_ntp(receive - 16), origin, to_ntp(receive), to_ntp(transmit)
+    )
+
+
+# ──────────────────────────────────────────────────────────
+# Пакеты SNTP
+# ──────────────────────────────────────────────────────────
+
+def test_sntp_request_round_trip():
+    token = to_ntp(1_700_000_000.25)
+    request = atf.encode_sntp_request(token, version=4)
+    first, stratum, _poll, _precision, _delay, _dispersion, _ref_id, _ref, _orig, _recv, transmit = \
+        NTP_PACKET.unpack(request)
+    assert len(request) == 48
+    assert first & 0x7 == 3 and (first >> 3) & 0x7 == 4
+    assert stratum == 0
+    assert transmit == token
+
+    response = atf.decode_sntp_packet(server_reply(transmit, 1_700_000_000.3, 1_700_000_000.301))
+    assert (response.mode, response.version, response.stratum, response.leap) == (4, 4, 2, 0)
+    assert response.orig_time == pytest.approx(1_700_000_000.25, abs=1e-6)
+    assert response.recv_time == pytest.approx(1_700_000_000.3, abs=1e-6)
+    assert response.tx_time == pytest.approx(1_700_000_000.301, abs=1e-6)
+    assert response.root_delay == pytest.approx(0.010, abs=2 ** -16)
+    assert response.root_dispersion == pytest.approx(0.020, abs=2 ** -16)
+    assert atf.format_ref_id(response.ref_id, response.stratum) == '10.0.0.1'
+
+
+@pytest.mark.parametrize('packet', [
+    b'\x24' * 20,
+    atf.encode_sntp_request(to_ntp(1_700_000_000.0)),
+    NTP_PACKET.pack((4 << 3) | 4, 2, 6, -20, 0, 0, b'\0' * 4, 0, 1, 1, 0),
+], ids=['short', 'client-mode', 'no-transmit'])
+def test_decode_rejects_non_replies(packet):
+    with pytest.raises(atf.SNTPError):
+        atf.decode_sntp_packet(packet)
+
+
+def test_ntp_target_split_and_format():
+    assert atf.split_ntp_target('pool.ntp.org') == ('pool.ntp.org', 123)
+    assert atf.split_ntp_target('127.0.0.1:12300') == ('127.0.0.1', 12300)
+    assert atf.split_ntp_target('2001:db8::1') == ('2001:db8::1', 123)
+    assert atf.split_ntp_target('[2001:db8::1]:12300') == ('2001:db8::1', 12300)
+    assert atf.format_ntp_target('2001:db8::1', 12300) == '[2001:db8::1]:12300'
+    assert atf.format_ntp_target('time.google.com') == 'time.google.com'
+
+
+# ──────────────────────────────────────────────────────────
+# Задержка и смещение по четырём меткам
+# ──────────────────────────────────────────────────────────
+
+def response_at(receive: float, transmit: float) -> 'atf.SNTPResponse':
+    return atf.SNTPResponse(leap=0, version=4, mode=4, stratum=2, poll=6, precision=-20,
+                            root_delay=0.0, root_dispersion=0.0, ref_id=b'\0' * 4, ref_time=0.0,
+                            orig_time=0.0, recv_time=receive, tx_time=transmit)
+
+
+def test_delay_offset_symmetric_path():
+    # Часы сервера впереди на 50 мс, по 10 мс в каждую сторону, 1 мс на обработку
+    delay, offset = atf.ntp_delay_offset(response_at(1000.060, 1000.061), 1000.000, 1000.021)
+    assert delay == pytest.approx(0.020)
+    assert offset == pytest.approx(0.050)
+
+
+def test_delay_offset_asymmetric_path():
+    # Туда 10 мс, обратно 20 мс: ошибка смещения — половина разницы путей (-5 мс)
+    delay, offset = atf.ntp_delay_offset(response_at(1000.060, 1000.061), 1000.000, 1000.031)
+    assert delay == pytest.approx(0.030)
+    assert offset == pytest.approx(0.045)
+
+
+def test_delay_never_negative():
+    # Сервер заявил обработку дольше, чем заняла вся попытка
+    delay, _offset = atf.ntp_delay_offset(response_at(1000.000, 1000.050), 1000.000, 1000.010)
+    assert delay == 0.0
+
+
+# ──────────────────────────────────────────────────────────
+# Оценка качества сервера
+# ──────────────────────────────────────────────────────────
+
+def sample(stratum: int = 2, root_delay: float = 10.0, root_dispersion: float = 5.0) -> dict:
+    return {'stratum': stratum, 'leap': 0, 'root_delay': root_delay, 'root_dispersion': root_dispersion,
+            'ref_id': '10.0.0.1'}
+
+
+def test_quality_score_scale():
+    score = atf.AndroidTVTimeFixer._ntp_quality_score
+    assert score(100, 0) == pytest.approx(100)
+    assert score(100, 100) == pytest.approx(50)
+    assert score(50, 0) == pytest.approx(50)
+    assert score(100, 10) > score(100, 20) > score(66.7, 20)
+
+
+def test_quality_metrics_root_distance():
+    fixer = atf.AndroidTVTimeFixer.__new__(atf.AndroidTVTimeFixer)
+    offsets = [0.010, 0.012, 0.014]
+    result = atf.AndroidTVTimeFixer._build_ntp_result('a', 3, [20.0, 20.0, 20.0], offsets, None)
+    fixer._apply_quality_metrics(result, [sample(), sample(), sample(stratum=3)], offsets)
+    # RFC 5905: delay/2 + root delay/2 + root dispersion + jitter (мс)
+    jitter = 1.633
+    assert result['jitter'] == pytest.approx(jitter, abs=1e-3)
+    assert result['root_distance'] == pytest.approx(10 + 5 + 5 + jitter, abs=1e-3)
+    assert result['stratum'] == 2
+    assert result['score'] == pytest.approx(100 * 100 / (100 + 10 + 5 + 5 + jitter), abs=1e-3)
+
+
+def test_quality_prefers_close_low_stratum_source():
+    fixer = atf.AndroidTVTimeFixer.__new__(atf.AndroidTVTimeFixer)
+    near = atf.AndroidTVTimeFixer._build_ntp_result('near', 2, [30.0, 30.0], [0.0, 0.0], None)
+    fixer._apply_quality_metrics(near, [sample(root_delay=1.0, root_dispersion=1.0)] * 2, [0.0, 0.0])
+    # Сервер ближе по сети, но сам далеко от источника точного времени
+    far = atf.AndroidTVTimeFixer._build_ntp_result('far', 2, [10.0, 10.0], [0.0, 0.0], None)
+    fixer._apply_quality_metrics(far, [sample(stratum=4, root_delay=200.0, root_dispersion=50.0)] * 2,
+                                 [0.0, 0.0])
+    assert near['score'] > far['score']
+
+
+# ──────────────────────────────────────────────────────────
+# Kiss-o'-Death и темп запросов
+# ──────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize('code', atf.KOD_CODES)
+def test_kiss_of_death_code(code):
+    response = atf.decode_sntp_packet(server_reply(1, 1_700_000_000.0, 1_700_000_000.0, stratum=0,
+                                                   ref_id=code.encode('ascii')))
+    assert response.stratum == 0
+    assert atf.format_ref_id(response.ref_id, response.stratum) == code
+
+
+def test_pacer_backoff_doubles_and_persists(tmp_path):
+    pacer = atf.NTPPacer(tmp_path / 'backoff.json')
+    assert pacer.kiss('a', atf.KOD_RATE)['interval'] == pacer.base_backoff
+    assert pacer.kiss('a', atf.KOD_RATE)['interval'] == 2 * pacer.base_backoff
+    assert pacer.kiss('b', 'DENY')['interval'] == pacer.max_backoff
+    pacer.clear('a')
+    assert pacer.blocked('a') is None
+    pacer.save()
+
+    reloaded = atf.NTPPacer(tmp_path / 'backoff.json')
+    assert reloaded.blocked('a') is None
+    assert reloaded.blocked('b')['code'] == 'DENY'
+
+
+def test_pacer_backs_off_after_repeated_timeouts():
+    pacer = atf.NTPPacer(timeout_limit=3)
+    assert pacer.timed_out('a') is None
+    assert pacer.timed_out('a') is None
+    # Ответ между таймаутами обрывает серию
+    pacer.clear('a')
+    assert pacer.timed_out('a') is None
+    assert pacer.timed_out('a') is None
+    pause = pacer.timed_out('a')
+    assert pause['code'] == atf.BACKOFF_TIMEOUT and pause['interval'] == pacer.base_backoff
+    assert pacer.blocked('a')['code'] == atf.BACKOFF_TIMEOUT
+
+
+async def acquire_at(pacer: 'atf.NTPPacer', address: str) -> float:
+    await pacer.acquire(address)
+    return atf.time.monotonic()
+
+
+def test_pacer_spaces_requests_to_one_address():
+    pacer = atf.NTPPacer(min_interval=0.1)
+
+    async def send_three():
+        sent = []
+        for _ in range(3):
+            await pacer.acquire('a')
+            sent.append(atf.time.monotonic())
+        # Одновременные запросы тоже расходятся: очередь бронируется до ожидания
+        concurrent = await atf.asyncio.gather(*(acquire_at(pacer, 'b') for _ in range(3)))
+        return sent, sorted(concurrent)
+
+    sent, concurrent = atf.asyncio.run(send_three())
+    for times in (sent, concurrent):
+        assert all(later - earlier >= 0.095 for earlier, later in zip(times, times[1:]))
+
+
+# ──────────────────────────────────────────────────────────
+# Консенсус (алгоритм Марзулло)
+# ──────────────────────────────────────────────────────────
+
+def test_marzullo_majority_ignores_falseticker():
+    intervals = [(0.00, 0.10), (0.05, 0.15), (0.08, 0.20), (5.00, 5.10)]
+    assert atf.marzullo_intersection(intervals) == (3, pytest.approx(0.08), pytest.approx(0.10))
+
+
+def test_marzullo_touching_intervals_intersect():
+    assert atf.marzullo_intersection([(0.0, 1.0), (1.0, 2.0)]) == (2, 1.0, 1.0)
+
+
+def reachable(server: str, offset: float, root_distance: float) -> dict:
+    return {'server': server, 'address': server, 'status': 'Reachable', 'offset': offset,
+            'root_distance': root_distance}
+
+
+def test_time_consensus_flags_falseticker():
+    results = [reachable('a', 0.050, 50.0), reachable('b', 0.100, 50.0), reachable('c', 0.130, 50.0),
+               reachable('liar', 120.0, 50.0)]
+    consensus = atf.build_time_consensus(results)
+    assert (consensus.agreeing, consensus.total) == (3, 4)
+    assert consensus.servers == ['a', 'b', 'c']
+    assert consensus.low == pytest.approx(0.080) and consensus.high == pytest.approx(0.100)
+    assert consensus.offset == pytest.approx(0.090)
+
+    fixer = atf.AndroidTVTimeFixer.__new__(atf.AndroidTVTimeFixer)
+    assert fixer._consensus_deviation(results[0], consensus) == 0.0
+    assert fixer._consensus_deviation(results[3], consensus) == pytest.approx(120.0 - 0.050 - 0.100)
+
+
+def test_time_consensus_needs_majority():
+    # Два источника против двух — правильное время не определить
+    split = [reachable('a', 0.0, 10.0), reachable('b', 0.001, 10.0),
+             reachable('c', 30.0, 10.0), reachable('d', 30.001, 10.0)]
+    assert atf.build_time_consensus(split) is None
+    # Один адрес под разными именами — один источник
+    aliases = [dict(reachable(name, 0.0, 10.0), address='10.0.0.1') for name in 'abc']
+    assert atf.build_time_consensus(aliases) is None
+
+
+# ──────────────────────────────────────────────────────────
+# Гистограммы задержек
+# ──────────────────────────────────────────────────────────
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = atf.LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(float(value))
+    error = 1 / histogram.sub_buckets
+    for p in (50, 90, 99, 100):
+        assert histogram.percentile(p) == pytest.approx(p, rel=error)
+    # Середина корзины не выходит за наблюдавшиеся значения
+    assert histogram.percentile(0) == 1.0
+    assert (histogram.count, histogram.min, histogram.max) == (100, 1.0, 100.0)
+    assert histogram.to_dict()['mean'] == pytest.approx(50.5)
+
+
+def test_histogram_merge_matches_single_recording():
+    values = [0.005, 0.4, 3.0, 12.5, 12.7, 80.0, 250.0, 1900.0]
+    whole = atf.LatencyHistogram()
+    halves = atf.LatencyHistogram(), atf.LatencyHistogram()
+    for index, value in enumerate(values):
+        whole.record(value)
+        halves[index % 2].record(value)
+    halves[0].merge(halves[1])
+    assert halves[0].to_dict() == whole.to_dict()
+
+
+def test_empty_histogram():
+    histogram = atf.LatencyHistogram()
+    histogram.merge(atf.LatencyHistogram())
+    assert histogram.percentile(50) is None
+    assert histogram.to_dict()['mean'] is None and histogram.to_dict()['buckets'] == []
+
+
+# ──────────────────────────────────────────────────────────
+# Каталог NTP-серверов
+# ──────────────────────────────────────────────────────────
+
+CATALOG = {
+    'version': 1,
+    'countries': {'de': {'en': 'Germany', 'ru': 'Германия', 'region': 'europe'},
+                  'jp': {'en': 'Japan', 'ru': 'Япония', 'region': 'asia'}},
+    'servers': [
+        {'host': 'pool.ntp.org', 'region': 'global', 'tags': ['pool', 'global']},
+        {'host': 'de.pool.ntp.org', 'region': 'europe', 'country': 'de', 'tags': ['pool', 'country']},
+        {'host': 'ptbtime1.ptb.de', 'region': 'europe', 'country': 'de', 'tags': ['national', 'nts']},
+        {'host': 'jp.pool.ntp.org', 'region': 'asia', 'country': 'jp', 'tags': ['pool', 'country']},
+        {'host': 'ntp.nict.jp', 'region': 'asia', 'country': 'jp', 'tags': ['national']},
+    ],
+}
+
+
+def write_catalog(path: Path, data: dict) -> Path:
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return path
+
+
+def test_catalog_select(tmp_path):
+    catalog = atf.NTPCatalog([write_catalog(tmp_path / 'catalog.json', CATALOG)])
+    assert len(catalog.entries) == 5
+    assert catalog.select(country='de') == ['de.pool.ntp.org', 'ptbtime1.ptb.de']
+    assert catalog.select(region='asia', tags=('national',)) == ['ntp.nict.jp']
+    assert catalog.select(tags=('pool',), exclude=('country',)) == ['pool.ntp.org']
+    assert catalog.select(country='de', region='asia') == []
+    assert catalog.select(tags=('missing',)) == []
+    assert catalog.country_zones() == {'de': 'de.pool.ntp.org', 'jp': 'jp.pool.ntp.org'}
+    assert catalog.country_region('jp') == 'asia' and catalog.country_region('xx') is None
+    assert catalog.country_names()['de'] == ('Germany', 'Германия')
+
+
+def test_catalog_falls_back_to_next_path(tmp_path):
+    future = write_catalog(tmp_path / 'future.json', dict(CATALOG, version=2))
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{', encoding='utf-8')
+    good = write_catalog(tmp_path / 'catalog.json', CATALOG)
+    catalog = atf.NTPCatalog([tmp_path / 'missing.json', future, broken, good])
+    assert catalog.select(country='jp') == ['jp.pool.ntp.org', 'ntp.nict.jp']
+    assert catalog.path == good
+
+
+def test_bundled_catalog_loads():
+    catalog = atf.NTPCatalog([ROOT / 'src' / 'ntp_catalog.json'])
+    assert catalog.entries and catalog.path is not None
+    zones = catalog.country_zones()
+    assert zones and all(catalog.country_region(code) for code in zones)
+
+
+# ──────────────────────────────────────────────────────────
+# Проверка каталога на ферме фейковых серверов
+# ──────────────────────────────────────────────────────────
+
+def load_simulator():
+    spec = importlib.util.spec_from_file_location('ntp_simulator', ROOT / 'scripts' / 'ntp_simulator.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['ntp_simulator'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_udp_ports(count: int) -> list:
+    sockets = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(count)]
+    try:
+        for sock in sockets:
+            sock.bind(('127.0.0.1', 0))
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+@pytest.fixture
+def ntp_farm(tmp_path, monkeypatch):
+    """Ферма scripts/ntp_simulator.py в фоновом потоке: три исправных сервера с разной
+    задержкой, KoD RATE, несинхронизированный (stratum 16) и фальшивые часы (+120 с)"""
+    simulator = load_simulator()
+    ports = iter(free_udp_ports(6))
+    specs = [
+        simulator.ResponderSpec('near', next(ports), delay_ms=5),
+        simulator.ResponderSpec('middle', next(ports), delay_ms=30),
+        simulator.ResponderSpec('far', next(ports), delay_ms=80),
+        simulator.ResponderSpec('kod', next(ports), kod='RATE'),
+        simulator.ResponderSpec('unsynced', next(ports), stratum=16),
+        simulator.ResponderSpec('liar', next(ports), delay_ms=15, offset=120.0),
+    ]
+    farm = simulator.NTPFarm(specs, seed=1)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(farm.start(), loop).result(timeout=5)
+
+    catalog = write_catalog(tmp_path / 'farm_catalog.json', farm.catalog())
+    monkeypatch.setenv(atf.AndroidTVTimeFixer.NTP_CATALOG_ENV, str(catalog))
+    monkeypatch.chdir(tmp_path)
+    try:
+        yield {spec.name: spec.target for spec in specs}
+    finally:
+        loop.call_soon_threadsafe(farm.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+
+class FarmFixer(atf.AndroidTVTimeFixer):
+    def get_adb_path(self) -> str:
+        return ''
+
+
+def make_fixer() -> atf.AndroidTVTimeFixer:
+    """Экземпляр приложения без ADB, как в scripts/ntp_benchmark.py"""
+    handlers = signal.getsignal(signal.SIGINT), signal.getsignal(signal.SIGTERM)
+    fixer = FarmFixer()
+    atexit.unregister(fixer.process_manager.terminate_adb_processes)
+    signal.signal(signal.SIGINT, handlers[0])
+    signal.signal(signal.SIGTERM, handlers[1])
+    # Ферма на localhost: паузы между запросами к одному адресу только замедлили бы проверку
+    fixer.ntp_pacer.min_interval = 0.05
+    return fixer
+
+
+def test_tiered_probe_on_farm(ntp_farm):
+    fixer = make_fixer()
+    sweep, deep = fixer._probe_ntp_servers_tiered(list(ntp_farm.values()), count=3, timeout=1, finalists=4)
+    by_name = {name: result for name in ntp_farm for result in sweep + deep
+               if result['server'] == ntp_farm[name]}
+
+    assert len(sweep) == 6
+    assert by_name['kod']['status'] == 'Rate limited' and by_name['kod']['kod'] == 'RATE'
+    assert by_name['unsynced']['status'] == 'Unsynced'
+    assert sorted(r['server'] for r in deep) == sorted(ntp_farm[name] for name in ('near', 'middle', 'far', 'liar'))
+    assert all(r['finalist'] and r['status'] == 'Reachable' for r in deep)
+
+    # Как в пункте 6: сверка с консенсусом, затем сортировка
+    consensus = atf.build_time_consensus(deep)
+    assert (consensus.agreeing, consensus.total) == (3, 4)
+    for result in deep:
+        deviation = fixer._consensus_deviation(result, consensus)
+        if deviation > fixer.time_consensus_tolerance:
+            result['falseticker'] = deviation
+    ranked = [r['server'] for r in sorted(deep, key=fixer._ntp_result_sort_key)]
+    assert ranked == [ntp_farm[name] for name in ('near', 'middle', 'far', 'liar')]
+    assert by_name['liar']['falseticker'] == pytest.approx(120.0, abs=0.5)